@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Load test for the review API (src/api.py): requests/sec and latency for
+GET /human-review/pending and POST /human-review/decision.
+
+A ReviewServer is started in-process on a free port against a temporary
+database seeded with `--pending` paused checkpoints (plus one more per
+decision request). `--clients` threads each send requests, either reusing
+one keep-alive connection or opening a new connection per request.
+
+Usage:
+    python -m benchmarks.bench_api --pending 50 --clients 8 --requests 400
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_pipeline import save_result
+from benchmarks.generator import generate_invoices
+from src.api import ReviewServer
+from src.store import open_store
+
+
+def _pct(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def seed_checkpoints(db_path: str, count: int, seed: int) -> list:
+    invoices, _ = generate_invoices(count, seed=seed, vendors=20)
+    store = open_store(db_path)
+    try:
+        ids = []
+        for inv in invoices:
+            cp = str(uuid.uuid4())
+            store.save_checkpoint(cp, inv['invoice_id'], {'invoice': inv, 'match_score': 0.4})
+            ids.append(cp)
+        return ids
+    finally:
+        store.close()
+
+
+def load(port: int, clients: int, requests, keep_alive: bool) -> dict:
+    """Send `requests` ((method, path, body) tuples) from `clients` threads; latency per request."""
+    latencies, lock = [], threading.Lock()
+    per_client = [requests[i::clients] for i in range(clients)]
+    headers = {'Accept-Encoding': 'gzip', 'Content-Type': 'application/json'}
+
+    def client(batch):
+        conn = None
+        mine = []
+        for method, path, body in batch:
+            if conn is None:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            started = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            mine.append(time.perf_counter() - started)
+            if resp.status != 200:
+                raise RuntimeError(f'{method} {path}: HTTP {resp.status}')
+            if not keep_alive:
+                conn.close()
+                conn = None
+        if conn is not None:
+            conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, per_client))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {'requests': len(latencies), 'elapsed_s': round(elapsed, 3),
+            'req_per_sec': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(_pct(latencies, 0.50) * 1000, 2), 'p95_ms': round(_pct(latencies, 0.95) * 1000, 2)}
+
+
+def run(pending: int = 50, clients: int = 8, requests: int = 400, pool_size: int = 8, seed: int = 42) -> dict:
+    tmp = tempfile.mkdtemp(prefix='invoice-bench-')
+    rows = []
+    try:
+        for keep_alive in (True, False):
+            db_path = os.path.join(tmp, f"api-{'ka' if keep_alive else 'nc'}.db")
+            seed_checkpoints(db_path, pending, seed)
+            to_decide = seed_checkpoints(db_path, requests, seed + 1)
+            server = ReviewServer(('127.0.0.1', 0), db_path, pool_size, log_requests=False)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                port = server.server_address[1]
+                # The pending list grows with the decision checkpoints until they are decided
+                gets = [('GET', '/human-review/pending', None)] * requests
+                posts = [('POST', '/human-review/decision',
+                          json.dumps({'checkpoint_id': cp, 'decision': 'ACCEPT', 'reviewer_id': 'bench'}))
+                         for cp in to_decide]
+                for endpoint, batch in (('pending', gets), ('decision', posts)):
+                    row = {'endpoint': endpoint, 'connections': 'keep-alive' if keep_alive else 'per-request'}
+                    row.update(load(port, clients, batch, keep_alive))
+                    rows.append(row)
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        'benchmark': 'api',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'pending': pending, 'clients': clients, 'requests': requests, 'pool_size': pool_size,
+                   'seed': seed, 'cpu_count': os.cpu_count()},
+        'results': rows,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--pending', type=int, default=50, help='paused checkpoints listed by every GET')
+    ap.add_argument('--clients', type=int, default=8)
+    ap.add_argument('--requests', type=int, default=400, help='requests per endpoint and connection mode')
+    ap.add_argument('--pool-size', type=int, default=8)
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    result = run(args.pending, args.clients, args.requests, args.pool_size, args.seed)
+    print(f"{'endpoint':<10}{'connections':<14}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in result['results']:
+        print(f"{row['endpoint']:<10}{row['connections']:<14}{row['req_per_sec']:>10.1f}"
+              f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
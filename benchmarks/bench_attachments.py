@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+OCR of a large multi-page attachment: page by page vs. pages in parallel.
+
+Writes one scanned-style PDF of `--pages` pages (`--page-kb` of image data
+each), gives the mock OCR `--ocr-latency` seconds per page, and runs
+src.attachments.ocr_attachments with 1..N page workers. Also reports the
+Python heap peak (tracemalloc) of splitting the file into pages on a
+memory map against reading it into memory first.
+
+Usage:
+    python -m benchmarks.bench_attachments --pages 200 --page-kb 100 --ocr-latency 0.02 --workers 1,4,8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_pipeline import save_result
+from benchmarks.generator import write_scanned_pdf
+from src import attachments
+from src import mcp_clients
+from src.mcp_clients import AtlasClient
+
+
+def _heap_peak_kb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def _read_whole(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return len(attachments._PDF_PAGE.findall(data))
+
+
+def run(pages: int = 200, page_kb: int = 100, ocr_latency: float = 0.02, workers=(1, 4, 8)) -> dict:
+    tmp = tempfile.mkdtemp(prefix='invoice-bench-')
+    old_latency = dict(mcp_clients.MOCK_LATENCY)
+    try:
+        path = os.path.join(tmp, 'scan.pdf')
+        write_scanned_pdf(path, pages, page_kb)
+        mcp_clients.set_mock_latency({'ocr': ocr_latency})
+        atlas = AtlasClient(hedge=False)
+        runs = []
+        for n in workers:
+            started = time.perf_counter()
+            text = attachments.ocr_attachments([path], atlas.ocr_page, n)
+            elapsed = time.perf_counter() - started
+            assert text.count(attachments.PAGE_SEPARATOR) == pages - 1
+            runs.append({'workers': n, 'seconds': round(elapsed, 3), 'pages_per_sec': round(pages / elapsed, 1)})
+        memory = {'file_kb': round(os.path.getsize(path) / 1024, 1),
+                  'mmap_split_heap_peak_kb': _heap_peak_kb(lambda: list(attachments.iter_pages([path]))),
+                  'read_whole_heap_peak_kb': _heap_peak_kb(lambda: _read_whole(path))}
+    finally:
+        mcp_clients.set_mock_latency(old_latency)
+        shutil.rmtree(tmp, ignore_errors=True)
+    base = runs[0]['seconds']
+    for r in runs:
+        r['speedup'] = round(base / r['seconds'], 2)
+    return {
+        'benchmark': 'attachments',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'pages': pages, 'page_kb': page_kb, 'ocr_latency': ocr_latency},
+        'runs': runs,
+        'memory': memory,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--pages', type=int, default=200)
+    ap.add_argument('--page-kb', type=int, default=100, help='image bytes per page, in KiB')
+    ap.add_argument('--ocr-latency', type=float, default=0.02, help='mock OCR seconds per page')
+    ap.add_argument('--workers', default='1,4,8', help='comma-separated page worker counts')
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    result = run(args.pages, args.page_kb, args.ocr_latency, [int(w) for w in args.workers.split(',')])
+    print(f"{'workers':>8}{'seconds':>10}{'pages/s':>10}{'speedup':>9}")
+    for r in result['runs']:
+        print(f"{r['workers']:>8}{r['seconds']:>10.3f}{r['pages_per_sec']:>10.1f}{r['speedup']:>8.2f}x")
+    m = result['memory']
+    print(f"file {m['file_kb'] / 1024:.1f} MiB; heap peak to split pages: mmap {m['mmap_split_heap_peak_kb']:.1f} KiB, "
+          f"read whole file {m['read_whole_heap_peak_kb'] / 1024:.1f} MiB")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Throughput of CPU-bound OCR inline (threads, GIL-bound) vs. in the process pool.
+
+Every invoice burns `--ocr-cpu` seconds of CPU in the mock OCR call. Runs
+use `--threads` concurrent runners; the inline run keeps OCR on those
+threads, the pooled runs send it to `src.cpu_pool` with 1..N workers.
+
+Usage:
+    python -m benchmarks.bench_cpu_pool --invoices 80 --ocr-cpu 0.02 --threads 8 --workers 1,2,4
+"""
+import argparse
+import contextlib
+import dataclasses
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+from benchmarks.bench_pipeline import save_result
+from benchmarks.generator import generate_invoices
+from src import cpu_pool
+from src import mcp_clients
+from src.runner import load_plan, run_workflow
+
+
+def with_cpu_workers(plan, workers: int):
+    return dataclasses.replace(plan, config=MappingProxyType({**plan.config, 'cpu_pool_workers': workers}))
+
+
+def _run(batch, db_path, plan, threads: int) -> float:
+    def one(inv):
+        return run_workflow(inv, db_path, decision_delay=0, plan=plan)
+
+    started = time.perf_counter()
+    # redirect_stdout is process-wide, so it wraps the whole pool
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, batch))
+    return time.perf_counter() - started
+
+
+def run(invoices: int = 80, ocr_cpu: float = 0.02, threads: int = 8, workers=(1, 2, 4), seed: int = 42) -> dict:
+    tmp = tempfile.mkdtemp(prefix='invoice-bench-')
+    base = load_plan()
+    rows = []
+    try:
+        batch, po_book = generate_invoices(invoices, seed=seed, vendors=20, match_rate=1.0)
+        mcp_clients.set_mock_purchase_orders(po_book)
+        mcp_clients.set_mock_cpu_cost({'ocr': ocr_cpu})
+        for n in (0,) + tuple(workers):
+            plan = with_cpu_workers(base, n)
+            if n:
+                # Start the workers outside the timed run (they stay warm afterwards)
+                cpu_pool.get_pool(n).submit(int).result()
+            # Fresh invoice ids per run so dedup does not short-circuit INTAKE
+            runs = [dict(inv, invoice_id=f"{inv['invoice_id']}-W{n}") for inv in batch]
+            elapsed = _run(runs, os.path.join(tmp, f'w{n}.db'), plan, threads)
+            rows.append({'cpu_workers': n, 'mode': 'process' if n else 'inline', 'elapsed_s': round(elapsed, 3),
+                         'invoices_per_sec': round(len(runs) / elapsed, 2)})
+    finally:
+        cpu_pool.shutdown()
+        mcp_clients.set_mock_cpu_cost({})
+        mcp_clients.set_mock_purchase_orders({})
+        shutil.rmtree(tmp, ignore_errors=True)
+    inline = rows[0]['invoices_per_sec']
+    for row in rows:
+        row['speedup'] = round(row['invoices_per_sec'] / inline, 2) if inline else 0.0
+    return {
+        'benchmark': 'cpu_pool',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'invoices': invoices, 'ocr_cpu': ocr_cpu, 'threads': threads, 'seed': seed,
+                   'cpu_count': os.cpu_count()},
+        'results': rows,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--invoices', type=int, default=80)
+    ap.add_argument('--ocr-cpu', type=float, default=0.02, help='CPU seconds burned per OCR call')
+    ap.add_argument('--threads', type=int, default=8)
+    ap.add_argument('--workers', default='1,2,4', help='process pool sizes to try')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    workers = tuple(int(w) for w in args.workers.split(',') if w)
+    result = run(args.invoices, args.ocr_cpu, args.threads, workers, args.seed)
+    print(f"{'mode':<10}{'workers':>8}{'inv/s':>10}{'speedup':>10}   ({os.cpu_count()} CPUs)")
+    for row in result['results']:
+        print(f"{row['mode']:<10}{row['cpu_workers']:>8}{row['invoices_per_sec']:>10.2f}{row['speedup']:>10.2f}")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
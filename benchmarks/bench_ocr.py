@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Throughput of local OCR (adapters.TesseractAdapter) on sample scans.
+
+Renders `--pages` invoice-like pages at `--scan-dpi`, tilted up to
+`--max-skew` degrees, into one multi-page TIFF (benchmarks.generator).
+Then, for each page worker count in `--workers`:
+
+- preprocessing only (render, downscale to `--dpi`, deskew, binarize),
+  timed in pages/sec
+- full OCR through TesseractAdapter, when Tesseract is installed
+
+It also reports how far the estimated skew is from the true one.
+Needs Pillow; the OCR runs need tesserocr or pytesseract + tesseract-ocr.
+
+Usage:
+    python -m benchmarks.bench_ocr --pages 16 --scan-dpi 600 --dpi 300 --workers 1,2,4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_pipeline import save_result
+from benchmarks.generator import write_sample_scans
+from src import attachments
+from src import local_ocr
+from src.adapters import TesseractAdapter
+
+
+def _pages_per_sec(pages, fn, workers: int) -> float:
+    started = time.perf_counter()
+    attachments.ocr_pages(pages, fn, workers)
+    return round(len(pages) / (time.perf_counter() - started), 2)
+
+
+def run(pages: int = 16, scan_dpi: int = 600, dpi: int = 300, max_skew: float = 3.0, workers=(1, 2, 4)) -> dict:
+    if local_ocr.Image is None:
+        raise SystemExit('bench_ocr needs Pillow (pip install pillow)')
+    tmp = tempfile.mkdtemp(prefix='invoice-bench-')
+    try:
+        path = os.path.join(tmp, 'scans.tif')
+        angles = write_sample_scans(path, pages, scan_dpi, max_skew)
+        page_list = list(attachments.iter_pages([path]))
+
+        def prepare(page):
+            image, source_dpi = local_ocr.render_page(page, dpi)
+            return local_ocr.preprocess(image, source_dpi, dpi)
+
+        skew_errors = []
+        for page, angle in zip(page_list, angles):
+            image, source_dpi = local_ocr.render_page(page, dpi)
+            image = image.convert('L')
+            if source_dpi and source_dpi > dpi:
+                image = image.reduce(round(source_dpi / dpi))
+            skew_errors.append(abs(angle + local_ocr.estimate_skew(image)))
+
+        adapter = TesseractAdapter(dpi=dpi, workers=max(workers))
+        runs = []
+        for n in workers:
+            row = {'workers': n, 'preprocess_pages_per_sec': _pages_per_sec(page_list, prepare, n)}
+            if adapter.available:
+                row['ocr_pages_per_sec'] = _pages_per_sec(page_list, adapter.extract_page_text, n)
+            runs.append(row)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        'benchmark': 'ocr',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'pages': pages, 'scan_dpi': scan_dpi, 'dpi': dpi, 'max_skew': max_skew,
+                   'cpus': os.cpu_count(), 'backend': local_ocr.backend()},
+        'runs': runs,
+        'skew_error_deg': {'mean': round(sum(skew_errors) / len(skew_errors), 2), 'max': round(max(skew_errors), 2)},
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--pages', type=int, default=16)
+    ap.add_argument('--scan-dpi', type=int, default=600, help='resolution the sample scans are rendered at')
+    ap.add_argument('--dpi', type=int, default=300, help='resolution pages are downscaled to for OCR')
+    ap.add_argument('--max-skew', type=float, default=3.0, help='largest tilt of a sample page, in degrees')
+    ap.add_argument('--workers', default='1,2,4', help='comma-separated page worker counts')
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    result = run(args.pages, args.scan_dpi, args.dpi, args.max_skew, [int(w) for w in args.workers.split(',')])
+    print(f"backend: {result['params']['backend'] or 'none (OCR runs skipped)'}, {result['params']['cpus']} CPU(s)")
+    print(f"{'workers':>8}{'preprocess p/s':>16}{'OCR p/s':>10}")
+    for r in result['runs']:
+        ocr = r.get('ocr_pages_per_sec')
+        print(f"{r['workers']:>8}{r['preprocess_pages_per_sec']:>16.2f}{'-' if ocr is None else f'{ocr:.2f}':>10}")
+    print(f"skew error: mean {result['skew_error_deg']['mean']:.2f}, max {result['skew_error_deg']['max']:.2f} degrees")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark on synthetic invoices.
+
+Usage:
+    python -m benchmarks.bench_pipeline --invoices 200 --seed 42 \
+        --latency ocr=0.02,enrich_vendor=0.01,fetch_pos=0.005 --match-rate 0.7
+
+Reports invoices/sec, p50/p95/p99 wall time per stage, DB size and peak
+RSS, and writes the result as JSON under benchmarks/results/ so runs can be
+compared with `python -m benchmarks.compare old.json new.json`.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generator import generate_invoices
+from src import metrics
+from src import mcp_clients
+from src.runner import run_workflow
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def parse_latency(spec: str) -> dict:
+    """'ocr=0.02,enrich_vendor=0.01' -> {'ocr': 0.02, 'enrich_vendor': 0.01}"""
+    out = {}
+    for part in filter(None, (spec or '').split(',')):
+        name, _, value = part.partition('=')
+        out[name.strip()] = float(value)
+    return out
+
+
+def peak_rss_kb() -> int:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return ''
+
+
+def run_benchmark(invoices: int = 100, seed: int = 42, vendors: int = 50, match_rate: float = 0.7,
+                  latency: dict = None, attachments: bool = False, quiet: bool = True,
+                  decision_delay: float = 0.0, plan=None) -> dict:
+    """Run the pipeline over generated invoices.
+
+    `decision_delay` is the simulated reviewer wait per HITL checkpoint;
+    `plan` overrides the compiled workflow plan (see bench_routing).
+    """
+    tmp = tempfile.mkdtemp(prefix='invoice-bench-')
+    db_path = os.path.join(tmp, 'bench.db')
+    try:
+        batch, po_book = generate_invoices(invoices, seed=seed, vendors=vendors, match_rate=match_rate,
+                                           attachment_dir=os.path.join(tmp, 'attachments') if attachments else None)
+        mcp_clients.set_mock_purchase_orders(po_book)
+        mcp_clients.set_mock_latency(latency or {})
+        stage_counts = {labels: metrics.STAGE_WALL.stats(*labels)['count'] for labels in metrics.STAGE_WALL.labelsets()}
+
+        results = []
+        started = time.perf_counter()
+        sink = io.StringIO() if quiet else sys.stdout
+        for inv in batch:
+            with contextlib.redirect_stdout(sink):
+                results.append(run_workflow(inv, db_path, auto_decide=True, decision_delay=decision_delay,
+                                            plan=plan))
+            if quiet:
+                sink.seek(0)
+                sink.truncate()
+        elapsed = time.perf_counter() - started
+
+        stages = {}
+        for labels in metrics.STAGE_WALL.labelsets():
+            st = metrics.STAGE_WALL.stats(*labels)
+            if st['count'] > stage_counts.get(labels, 0):
+                stages[labels[0]] = {k: round(st[k] * 1e3, 3) for k in ('p50', 'p95', 'p99', 'mean')}
+        outcomes = {}
+        for state in results:
+            status = state.get('final_payload', {}).get('status', 'UNKNOWN')
+            outcomes[status] = outcomes.get(status, 0) + 1
+        matched = sum(1 for s in results if s.get('match_result') == 'MATCHED')
+        return {
+            'benchmark': 'pipeline',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_rev': _git_rev(),
+            'python': platform.python_version(),
+            'params': {'invoices': invoices, 'seed': seed, 'vendors': vendors, 'match_rate': match_rate,
+                       'latency': latency or {}, 'attachments': attachments, 'decision_delay': decision_delay},
+            'elapsed_s': round(elapsed, 4),
+            'invoices_per_sec': round(len(batch) / elapsed, 2) if elapsed else 0.0,
+            'observed_match_rate': round(matched / len(batch), 3) if batch else 0.0,
+            'outcomes': outcomes,
+            'stage_latency_ms': stages,
+            'db_size_bytes': os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+            'peak_rss_kb': peak_rss_kb(),
+        }
+    finally:
+        mcp_clients.set_mock_latency({})
+        mcp_clients.set_mock_purchase_orders({})
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def save_result(result: dict, out_dir: str = RESULTS_DIR) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{result['benchmark']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def print_result(result: dict):
+    print(f"invoices/sec: {result['invoices_per_sec']}  (elapsed {result['elapsed_s']}s, "
+          f"match rate {result['observed_match_rate']})")
+    print(f"db size: {result['db_size_bytes'] / 1024:.1f} KiB  peak RSS: {result['peak_rss_kb'] / 1024:.1f} MiB")
+    print(f"{'stage':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, st in result['stage_latency_ms'].items():
+        print(f"{stage:<18}{st['p50']:>10.3f}{st['p95']:>10.3f}{st['p99']:>10.3f}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--invoices', type=int, default=100)
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--vendors', type=int, default=50)
+    ap.add_argument('--match-rate', type=float, default=0.7)
+    ap.add_argument('--latency', default='', help='mock latency per ability, e.g. ocr=0.02,enrich_vendor=0.01')
+    ap.add_argument('--attachments', action='store_true', help='write synthetic attachment files')
+    ap.add_argument('--decision-delay', type=float, default=0.0, help='simulated reviewer wait per checkpoint (s)')
+    ap.add_argument('--out', default=RESULTS_DIR, help='directory for the JSON result')
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    result = run_benchmark(args.invoices, args.seed, args.vendors, args.match_rate,
+                           parse_latency(args.latency), args.attachments, decision_delay=args.decision_delay)
+    print_result(result)
+    if not args.no_save:
+        print('Saved', save_result(result, args.out))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Throughput of condition-driven routing vs. the old linear flow.
+
+The linear baseline is the compiled workflow.json plan with every
+trigger_condition and route removed, i.e. each invoice is checkpointed
+and waits `--decision-delay` for the (auto) reviewer. The routed plan
+sends matched invoices from MATCH_TWO_WAY straight to RECONCILE.
+
+Usage:
+    python -m benchmarks.bench_routing --invoices 100 --match-rates 0.6,0.8,0.95 --decision-delay 0.05
+"""
+import argparse
+import dataclasses
+import time
+
+from benchmarks.bench_pipeline import parse_latency, run_benchmark, save_result
+from src.runner import load_plan
+
+
+def linear_plan(plan):
+    """Copy of `plan` with all triggers and routes stripped (pre-routing behavior)."""
+    stages = tuple(dataclasses.replace(s, trigger=None, trigger_source=None, routes=()) for s in plan.stages)
+    return dataclasses.replace(plan, stages=stages)
+
+
+def run(invoices: int, match_rates, decision_delay: float, latency: dict, seed: int = 42) -> dict:
+    routed = load_plan()
+    linear = linear_plan(routed)
+    rows = []
+    for rate in match_rates:
+        row = {'match_rate': rate}
+        for name, plan in (('linear', linear), ('routed', routed)):
+            res = run_benchmark(invoices, seed=seed, match_rate=rate, latency=latency,
+                                decision_delay=decision_delay, plan=plan)
+            row[name] = {'invoices_per_sec': res['invoices_per_sec'],
+                         'observed_match_rate': res['observed_match_rate'],
+                         'db_size_bytes': res['db_size_bytes']}
+        row['speedup'] = round(row['routed']['invoices_per_sec'] / max(row['linear']['invoices_per_sec'], 1e-9), 2)
+        rows.append(row)
+    return {
+        'benchmark': 'routing',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'invoices': invoices, 'decision_delay': decision_delay, 'latency': latency, 'seed': seed},
+        'results': rows,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--invoices', type=int, default=100)
+    ap.add_argument('--match-rates', default='0.6,0.8,0.95')
+    ap.add_argument('--decision-delay', type=float, default=0.05)
+    ap.add_argument('--latency', default='')
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    rates = [float(r) for r in args.match_rates.split(',') if r]
+    result = run(args.invoices, rates, args.decision_delay, parse_latency(args.latency), args.seed)
+    print(f"{'match rate':<12}{'linear inv/s':>14}{'routed inv/s':>14}{'speedup':>10}")
+    for row in result['results']:
+        print(f"{row['routed']['observed_match_rate']:<12}{row['linear']['invoices_per_sec']:>14}"
+              f"{row['routed']['invoices_per_sec']:>14}{row['speedup']:>9}x")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Startup cost of the short-lived entry points.
+
+For each entry module, a fresh interpreter runs `python -X importtime -c
+"import <module>"`; the cumulative import time of the module and the
+modules it pulled in are reported (best of `--repeat` runs). Whole
+commands (`python -m src`, `python -m src stats`, ...) are timed wall clock
+against a temporary database, and loading tools.yaml is timed with and
+without its parsed cache (src/bigtool.py).
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_pipeline import save_result
+from src.bigtool import TOOLS_CACHE
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ENTRY_MODULES = ('src.__main__', 'src.store', 'src.stats', 'src.retention', 'src.jobs', 'src.api', 'src.runner')
+# Imported only when the work needs them (see tests/test_startup.py)
+HEAVY_MODULES = ('yaml', 'multiprocessing', 'concurrent.futures.process', 'anthropic', 'src.runner', 'src.nodes')
+
+
+def import_profile(module: str) -> dict:
+    """{'cumulative_ms', 'modules'} for importing `module` in a fresh interpreter."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    modules, total_us = set(), 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            modules.add(name.strip())
+            if name.strip() == module:
+                total_us = int(cumulative)
+    return {'cumulative_ms': total_us / 1000, 'modules': modules}
+
+
+def best_import_ms(module: str, repeat: int) -> float:
+    return min(import_profile(module)['cumulative_ms'] for _ in range(repeat))
+
+
+def _wall_ms(argv, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 1)
+
+
+def run(repeat: int = 5) -> dict:
+    tmp = tempfile.mkdtemp(prefix='invoice-bench-')
+    try:
+        db_path = os.path.join(tmp, 'startup.db')
+        py = sys.executable
+        subprocess.run([py, '-c', f'from src import db; db.init_db({db_path!r}).close()'], cwd=ROOT, check=True)
+        imports = []
+        for module in ENTRY_MODULES:
+            heavy = sorted(m for m in HEAVY_MODULES if m in import_profile(module)['modules'] and m != module)
+            imports.append({'module': module, 'import_ms': round(best_import_ms(module, repeat), 1), 'heavy': heavy})
+        commands = []
+        for name, argv in (('python (empty)', [py, '-c', 'pass']),
+                           ('python -m src', [py, '-m', 'src']),
+                           ('python -m src stats', [py, '-m', 'src', 'stats', '--db', db_path]),
+                           ('python -m src jobs stats', [py, '-m', 'src', 'jobs', '--db', db_path, 'stats']),
+                           ('python -m src retention', [py, '-m', 'src', 'retention', '--db', db_path, '--dry-run'])):
+            commands.append({'command': name, 'wall_ms': _wall_ms(argv, repeat)})
+        load = [py, '-c', 'from src.bigtool import load_tools_config; load_tools_config()']
+        parsed = []
+        for _ in range(repeat):
+            if os.path.exists(TOOLS_CACHE):
+                os.remove(TOOLS_CACHE)
+            parsed.append(_wall_ms(load, 1))
+        tools = {'tools.yaml parsed': min(parsed), 'tools.yaml cached': _wall_ms(load, repeat)}
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        'benchmark': 'startup',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'repeat': repeat, 'python': sys.version.split()[0]},
+        'imports': imports,
+        'commands': commands,
+        'tools_config_wall_ms': tools,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--repeat', type=int, default=5, help='runs per measurement (best is kept)')
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    result = run(args.repeat)
+    print(f"{'module':<16}{'import ms':>10}  heavy imports")
+    for row in result['imports']:
+        print(f"{row['module']:<16}{row['import_ms']:>10.1f}  {', '.join(row['heavy']) or '-'}")
+    print(f"{'command':<26}{'wall ms':>10}")
+    for row in result['commands']:
+        print(f"{row['command']:<26}{row['wall_ms']:>10.1f}")
+    for label, ms in result['tools_config_wall_ms'].items():
+        print(f"{label:<26}{ms:>10.1f}")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Vendor resolution benchmark against a large synthetic vendor master.
+
+Builds a VendorIndex of `--vendors` names, then resolves noisy variants
+(case, punctuation, legal-suffix swaps, one-character typos) plus names
+that are not in the master. Reports build time, lookup p50/p95/p99,
+accuracy and false matches, and the cost of a linear Jaccard scan over the
+same master for comparison.
+
+Usage:
+    python -m benchmarks.bench_vendors --vendors 100000 --queries 5000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_pipeline import save_result
+from benchmarks.generator import LEGAL_SUFFIXES, NAME_TRADES
+from src.vendors import VendorIndex, normalize_vendor, trigrams
+
+CONSONANTS = 'bcdfghjklmnprstvwxz'
+VOWELS = 'aeiouy'
+
+
+def _word(rng: random.Random) -> str:
+    # Pronounceable CV(C) word, e.g. 'Tovarek'
+    return ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) + (rng.choice(CONSONANTS) if rng.random() < 0.3 else '')
+                   for _ in range(rng.randint(2, 3))).title()
+
+
+def master_names(count: int, rng: random.Random) -> list:
+    names = {}
+    while len(names) < count:
+        word = _word(rng)
+        if rng.random() < 0.5:
+            word += ' ' + _word(rng)
+        key = f"{word} {rng.choice(NAME_TRADES)}"
+        if normalize_vendor(key) not in names:
+            names[normalize_vendor(key)] = f"{key} {rng.choice(LEGAL_SUFFIXES)}"
+    return list(names.values())
+
+
+def noisy_variant(name: str, rng: random.Random) -> str:
+    words = name.split()
+    core = words[:-1] if words[-1].rstrip('.').lower() in ('corp', 'corporation', 'inc', 'ltd', 'llc', 'co', 'gmbh') else words
+    if words[-2:] == ['Pvt', 'Ltd']:
+        core = words[:-2]
+    text = ' '.join(core)
+    kind = rng.choice(['case', 'suffix', 'typo', 'typo', 'punct'])
+    if kind == 'case':
+        text = text.upper() if rng.random() < 0.5 else text.lower()
+    elif kind == 'suffix':
+        text = f"{text} {rng.choice(['Inc.', 'Corporation', 'Limited', 'LLC'])}"
+    elif kind == 'punct':
+        text = text.replace(' ', ', ', 1) + '.'
+    else:
+        i = rng.randrange(1, len(text) - 1)
+        op = rng.choice(['drop', 'swap', 'dup'])
+        if op == 'drop':
+            text = text[:i] + text[i + 1:]
+        elif op == 'swap':
+            text = text[:i - 1] + text[i] + text[i - 1] + text[i + 1:]
+        else:
+            text = text[:i] + text[i] + text[i:]
+    return text
+
+
+def linear_resolve(names_grams, query: str, threshold: float):
+    q = trigrams(normalize_vendor(query))
+    best, best_score = None, 0.0
+    for i, g in enumerate(names_grams):
+        inter = len(q & g)
+        score = inter / (len(q) + len(g) - inter)
+        if score > best_score:
+            best, best_score = i, score
+    return best if best_score >= threshold else None
+
+
+def _pct(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def run(vendors: int = 100000, queries: int = 5000, unknown_rate: float = 0.2, seed: int = 42,
+        linear_queries: int = 20) -> dict:
+    rng = random.Random(seed)
+    names = master_names(vendors, rng)
+    index = VendorIndex()
+    t0 = time.perf_counter()
+    ids = [index.add(n) for n in names]
+    build_s = time.perf_counter() - t0
+
+    unknown = master_names(int(queries * unknown_rate) + vendors, random.Random(seed + 1))
+    unknown = [n for n in unknown[vendors:] if index.resolve(n, threshold=1.0) is None]
+    cases = []
+    for _ in range(queries):
+        if unknown and rng.random() < unknown_rate:
+            cases.append((noisy_variant(unknown.pop(), rng), None))
+        else:
+            i = rng.randrange(len(names))
+            cases.append((noisy_variant(names[i], rng), ids[i]))
+
+    timings, correct, missed, wrong, false_match = [], 0, 0, 0, 0
+    for query, expected in cases:
+        t = time.perf_counter()
+        match = index.resolve(query)
+        timings.append(time.perf_counter() - t)
+        got = match.vendor_id if match else None
+        if expected is None:
+            false_match += got is not None
+        elif got == expected:
+            correct += 1
+        elif got is None:
+            missed += 1
+        else:
+            wrong += 1
+    timings.sort()
+    known = sum(1 for _, e in cases if e is not None)
+
+    grams = [trigrams(normalize_vendor(n)) for n in names]
+    t = time.perf_counter()
+    for query, _ in cases[:linear_queries]:
+        linear_resolve(grams, query, index.threshold)
+    linear_ms = (time.perf_counter() - t) / max(1, min(linear_queries, len(cases))) * 1e3
+
+    return {
+        'benchmark': 'vendors',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'vendors': vendors, 'queries': queries, 'unknown_rate': unknown_rate, 'seed': seed,
+                   'threshold': index.threshold},
+        'build_s': round(build_s, 3),
+        'lookup_ms': {'p50': round(_pct(timings, 0.5) * 1e3, 4), 'p95': round(_pct(timings, 0.95) * 1e3, 4),
+                      'p99': round(_pct(timings, 0.99) * 1e3, 4), 'mean': round(sum(timings) / len(timings) * 1e3, 4)},
+        'linear_scan_ms': round(linear_ms, 3),
+        'accuracy': round(correct / known, 4) if known else 0.0,
+        'missed': missed,
+        'wrong_vendor': wrong,
+        'false_matches': false_match,
+        'unknown_queries': len(cases) - known,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--vendors', type=int, default=100000)
+    ap.add_argument('--queries', type=int, default=5000)
+    ap.add_argument('--unknown-rate', type=float, default=0.2)
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--no-save', action='store_true')
+    args = ap.parse_args(argv)
+    result = run(args.vendors, args.queries, args.unknown_rate, args.seed)
+    lk = result['lookup_ms']
+    print(f"index build: {result['build_s']}s for {args.vendors} vendors")
+    print(f"lookup ms: p50 {lk['p50']}  p95 {lk['p95']}  p99 {lk['p99']}  (linear scan {result['linear_scan_ms']} ms)")
+    print(f"accuracy {result['accuracy']}  missed {result['missed']}  wrong {result['wrong_vendor']}  "
+          f"false matches {result['false_matches']}/{result['unknown_queries']}")
+    if not args.no_save:
+        print('Saved', save_result(result))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files.
+
+Usage: python -m benchmarks.compare <baseline.json> <candidate.json>
+"""
+import json
+import sys
+
+
+def _pct(old, new):
+    if not old:
+        return ''
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(base: dict, cand: dict) -> str:
+    lines = []
+    for key in ('invoices_per_sec', 'db_size_bytes', 'peak_rss_kb'):
+        if key in base or key in cand:
+            old, new = base.get(key, 0), cand.get(key, 0)
+            lines.append(f"{key:<22}{old:>14}{new:>14}  {_pct(old, new)}")
+    stages = sorted(set(base.get('stage_latency_ms', {})) | set(cand.get('stage_latency_ms', {})))
+    if stages:
+        lines.append(f"{'stage p95 (ms)':<22}{'baseline':>14}{'candidate':>14}")
+        for stage in stages:
+            old = base.get('stage_latency_ms', {}).get(stage, {}).get('p95', 0)
+            new = cand.get('stage_latency_ms', {}).get(stage, {}).get('p95', 0)
+            lines.append(f"{stage:<22}{old:>14}{new:>14}  {_pct(old, new)}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print('Usage: python -m benchmarks.compare <baseline.json> <candidate.json>')
+        return 2
+    with open(argv[0], encoding='utf-8') as f:
+        base = json.load(f)
+    with open(argv[1], encoding='utf-8') as f:
+        cand = json.load(f)
+    print(compare(base, cand))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
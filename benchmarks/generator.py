@@ -0,0 +1,179 @@
+"""
+Synthetic invoice generator for benchmarks.
+
+Produces invoices shaped like the `inputs` schema in workflow.json, with:
+- a Zipf-like vendor distribution (a few vendors send most invoices)
+- lognormal line-item counts and prices
+- per-vendor purchase-order sets, where `match_rate` of invoices get a PO
+  within the two-way tolerance
+- optional attachment files with lognormal sizes, multi-page scanned PDFs
+  (`write_scanned_pdf`) and rendered sample scans (`write_sample_scans`)
+
+Everything is driven by one seed, so runs are reproducible.
+"""
+import datetime
+import os
+import random
+import zlib
+
+LEGAL_SUFFIXES = ['Corp.', 'Corporation', 'Inc', 'Ltd', 'LLC', 'Co.', 'Pvt Ltd', 'GmbH']
+NAME_PARTS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Tyrell', 'Cyberdyne',
+              'Soylent', 'Hooli', 'Vandelay', 'Wonka', 'Oscorp', 'Gringotts', 'Monarch', 'Aperture']
+NAME_TRADES = ['Supplies', 'Industries', 'Logistics', 'Systems', 'Foods', 'Metals', 'Textiles', 'Labs']
+ITEMS = ['Widgets', 'Gadgets', 'Bolts', 'Cable', 'Paper', 'Toner', 'Licenses', 'Consulting hours',
+         'Freight', 'Pallets', 'Sensors', 'Valves']
+CURRENCIES = [('USD', 0.6), ('EUR', 0.2), ('INR', 0.15), ('GBP', 0.05)]
+
+
+def vendor_names(count: int, rng: random.Random) -> list:
+    """Distinct vendors: no two names differ only by legal suffix, since
+    src.vendors resolves those to the same vendor."""
+    names = {}
+    while len(names) < count:
+        part, trade = rng.choice(NAME_PARTS), rng.choice(NAME_TRADES)
+        key = f"{part} {trade}"
+        if len(names) >= len(NAME_PARTS) * len(NAME_TRADES):
+            key += f" {len(names)}"
+        if key not in names:
+            names[key] = f"{part} {trade} {rng.choice(LEGAL_SUFFIXES)}" + key[len(part) + len(trade) + 1:]
+    return sorted(names.values())
+
+
+def _zipf_weights(n: int, s: float) -> list:
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights)[0]
+
+
+def generate_invoices(count: int, seed: int = 42, vendors: int = 50, zipf_s: float = 1.1,
+                      match_rate: float = 0.7, max_line_items: int = 60, attachment_dir: str = None,
+                      attachment_kb_median: int = 200):
+    """Return `(invoices, po_book)`.
+
+    `po_book` maps vendor name -> list of POs, for
+    `src.mcp_clients.set_mock_purchase_orders`.
+    """
+    rng = random.Random(seed)
+    names = vendor_names(vendors, rng)
+    weights = _zipf_weights(len(names), zipf_s)
+    po_book = {name: [] for name in names}
+    start = datetime.date(2025, 1, 1)
+    if attachment_dir:
+        os.makedirs(attachment_dir, exist_ok=True)
+
+    invoices = []
+    for i in range(count):
+        vendor = rng.choices(names, weights=weights)[0]
+        n_items = max(1, min(max_line_items, int(rng.lognormvariate(1.2, 0.8))))
+        line_items = []
+        for _ in range(n_items):
+            qty = rng.randint(1, 100)
+            unit_price = round(rng.lognormvariate(3.5, 1.0), 2)
+            line_items.append({'desc': rng.choice(ITEMS), 'qty': qty, 'unit_price': unit_price,
+                               'total': round(qty * unit_price, 2)})
+        amount = round(sum(li['total'] for li in line_items), 2)
+
+        po_id = f"PO-{seed}-{i:06d}"
+        if rng.random() < match_rate:
+            po_amount = round(amount * rng.uniform(0.97, 1.03), 2)
+        else:
+            po_amount = round(amount * rng.choice([rng.uniform(0.5, 0.9), rng.uniform(1.1, 1.6)]), 2)
+        po_book[vendor].append({'po_id': po_id, 'amount': po_amount})
+
+        invoice_date = start + datetime.timedelta(days=rng.randint(0, 364))
+        inv = {
+            'invoice_id': f"INV-{seed}-{i:06d}",
+            'vendor_name': vendor,
+            'vendor_tax_id': f"GST{zlib.crc32(vendor.encode('utf-8')) % 10**8:08d}",
+            'invoice_date': invoice_date.isoformat(),
+            'due_date': (invoice_date + datetime.timedelta(days=rng.choice([15, 30, 45, 60]))).isoformat(),
+            'amount': amount,
+            'currency': _weighted(rng, CURRENCIES),
+            'line_items': line_items,
+            'attachments': [],
+        }
+        if attachment_dir:
+            path = os.path.join(attachment_dir, f"{inv['invoice_id']}.pdf")
+            size = int(rng.lognormvariate(0, 0.8) * attachment_kb_median * 1024)
+            _write_attachment(path, size, rng)
+            inv['attachments'].append(path)
+        else:
+            inv['attachments'].append(f"{inv['invoice_id']}.pdf")
+        invoices.append(inv)
+
+    # The matcher sees every open PO of the vendor, so the observed match rate
+    # runs a little above `match_rate` for vendors with many POs.
+    return invoices, po_book
+
+
+def _write_attachment(path: str, size: int, rng: random.Random):
+    chunk = bytes(rng.getrandbits(8) for _ in range(4096))
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+        remaining = max(0, size - 9)
+        while remaining > 0:
+            n = min(remaining, len(chunk))
+            f.write(chunk[:n])
+            remaining -= n
+
+
+def write_scanned_pdf(path: str, pages: int, page_kb: int = 100, seed: int = 42):
+    """A PDF shaped like a scanner's output: one page object and one JPEG-sized image stream per page.
+
+    Only the structure the attachment pipeline looks at is real; the image
+    data is random and there is no xref table.
+    """
+    rng = random.Random(seed)
+    chunk = bytes(rng.getrandbits(8) for _ in range(4096))
+    image = (chunk * (page_kb * 1024 // len(chunk) + 1))[:page_kb * 1024]
+    kids = ' '.join(f'{3 + 2 * i} 0 R' for i in range(pages))
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n')
+        f.write(f'2 0 obj << /Type /Pages /Kids [{kids}] /Count {pages} >> endobj\n'.encode('ascii'))
+        for i in range(pages):
+            page, img = 3 + 2 * i, 4 + 2 * i
+            f.write(f'{page} 0 obj << /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                    f'/Resources << /XObject << /Im0 {img} 0 R >> >> >> endobj\n'.encode('ascii'))
+            f.write(f'{img} 0 obj << /Type /XObject /Subtype /Image /Width 2550 /Height 3300 '
+                    f'/BitsPerComponent 8 /ColorSpace /DeviceGray /Filter /DCTDecode /Length {len(image)} >>\nstream\n'
+                    .encode('ascii'))
+            f.write(image)
+            f.write(b'\nendstream endobj\n')
+        f.write(b'trailer << /Root 1 0 R >>\n%%EOF\n')
+
+
+def write_sample_scans(path: str, pages: int, dpi: int = 300, max_skew: float = 3.0, seed: int = 42):
+    """Multi-page TIFF of invoice-like pages with printed text, each tilted up to `max_skew` degrees.
+
+    Needs Pillow. Returns the skew angle of each page (degrees, counter-clockwise).
+    """
+    from PIL import Image, ImageDraw, ImageFont
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.load_default(size=max(10, dpi // 12))
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        font = ImageFont.load_default()
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    images, angles = [], []
+    for number in range(1, pages + 1):
+        page = Image.new('L', (width, height), 255)
+        draw = ImageDraw.Draw(page)
+        y = dpi
+        draw.text((dpi, y), f'INVOICE INV-{seed}-{number:04d}', fill=0, font=font)
+        y += dpi // 3
+        while y < height - dpi:
+            item = rng.choice(ITEMS)
+            qty = rng.randint(1, 100)
+            price = round(rng.lognormvariate(3.5, 1.0), 2)
+            draw.text((dpi, y), f'{item:<20} {qty:>4} x {price:>9.2f} = {qty * price:>10.2f}', fill=0, font=font)
+            y += dpi // 6
+        angle = round(rng.uniform(-max_skew, max_skew), 1)
+        angles.append(angle)
+        # Light scanner noise
+        noisy = page.rotate(angle, resample=Image.BICUBIC, fillcolor=255).point(lambda p: min(255, p + rng.randint(-8, 8) if p > 128 else p))
+        images.append(noisy)
+    images[0].save(path, save_all=True, append_images=images[1:], dpi=(dpi, dpi), compression='tiff_lzw')
+    return angles
@@ -2,12 +2,19 @@
 """
 Export decisions and audit log from demo.db into artifacts/ directory.
 
-Usage: python scripts/export_history.py
+Usage: python scripts/export_history.py [--format json|parquet] [--db demo.db] [--out DIR]
+
+json (the default, run after every decision) rewrites artifacts/decisions.csv
+and artifacts/audit_log.json. parquet appends new rows to date-partitioned
+Parquet files under artifacts/parquet/ (see src/history_export.py; needs
+pyarrow).
 """
+import argparse
 import sqlite3
 import csv
 import json
 import os
+import sys
 from pathlib import Path
 
 DB = Path('demo.db')
@@ -43,14 +50,49 @@ def export_audit(conn, out_dir: Path):
     return json_path
 
 
-def main():
-    if not DB.exists():
-        print('demo.db not found; nothing to export')
+def _src_on_path():
+    # Ensure project root is on sys.path so `from src import ...` works
+    root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+
+def open_for_parquet(db_path: Path):
+    """Connection via db.init_db, which adds checkpoint_changes/export_marks to databases created before them."""
+    _src_on_path()
+    from src import db
+    return db.init_db(str(db_path))
+
+
+def export_parquet(conn, out_dir: Path):
+    _src_on_path()
+    from src.history_export import export_parquet
+    return export_parquet(conn, str(out_dir))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Export decisions and the audit log.')
+    ap.add_argument('--format', choices=('json', 'parquet'), default='json')
+    ap.add_argument('--db', type=Path, default=DB)
+    ap.add_argument('--out', type=Path, default=None, help='default: artifacts/, or artifacts/parquet/ for parquet')
+    args = ap.parse_args(argv)
+    if not args.db.exists():
+        print(f'{args.db} not found; nothing to export')
         return 1
-    conn = sqlite3.connect(str(DB))
+    conn = open_for_parquet(args.db) if args.format == 'parquet' else sqlite3.connect(str(args.db))
     try:
-        dpath = export_decisions(conn, OUT)
-        jpath = export_audit(conn, OUT)
+        if args.format == 'parquet':
+            out = args.out or OUT / 'parquet'
+            try:
+                counts = export_parquet(conn, out)
+            except RuntimeError as e:
+                print(e)
+                return 2
+            print('Exported:', ', '.join(f'{n} {table} row(s)' for table, n in counts.items()), 'to', out)
+            return 0
+        out = args.out or OUT
+        dpath = export_decisions(conn, out)
+        jpath = export_audit(conn, out)
         print('Exported:', dpath, jpath)
         return 0
     finally:
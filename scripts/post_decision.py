@@ -1,24 +1,89 @@
-import sqlite3
+import argparse
+import json
 import sys
 import os
+import urllib.request
 
-# Ensure project root is on sys.path so `from src import db` works
+# Ensure project root is on sys.path so `from src import ...` works
 _HERE = os.path.dirname(os.path.abspath(__file__))
 _ROOT = os.path.abspath(os.path.join(_HERE, '..'))
 if _ROOT not in sys.path:
     sys.path.insert(0, _ROOT)
 
-from src import db
+from src.store import open_store
 
-if len(sys.argv) < 3:
-    print('Usage: post_decision.py <checkpoint_id> <ACCEPT|REJECT> [reviewer_id]')
-    sys.exit(2)
-cp = sys.argv[1]
-dec = sys.argv[2]
-rev = sys.argv[3] if len(sys.argv) > 3 else 'script_user'
+USAGE = '''post_decision.py <checkpoint_id> <ACCEPT|REJECT> [reviewer_id]
+       post_decision.py --batch decisions.json [--reviewer R] [--url http://127.0.0.1:8081 | --db demo.db]
 
-conn = db.init_db()
-db.save_decision(conn, cp, rev, dec)
-# mark completed as API does
-db.mark_completed(conn, cp)
-print('Decision saved for', cp, dec, rev)
+decisions.json (or - for stdin): [{"checkpoint_id": "...", "decision": "ACCEPT"}, ...]
+or {"decisions": [...], "reviewer_id": "..."}. The batch is applied in one
+transaction, directly in the database or through POST /human-review/decisions.'''
+
+
+def load_batch(path, reviewer):
+    if path == '-':
+        payload = json.load(sys.stdin)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    if isinstance(payload, list):
+        payload = {'decisions': payload}
+    payload.setdefault('reviewer_id', reviewer)
+    return payload
+
+
+def post_batch(url, payload):
+    req = urllib.request.Request(url.rstrip('/') + '/human-review/decisions', data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(usage=USAGE)
+    ap.add_argument('args', nargs='*')
+    ap.add_argument('--batch', help='JSON file of decisions, or - for stdin')
+    ap.add_argument('--reviewer', default='script_user')
+    ap.add_argument('--url', help='post to the review API instead of writing to the database')
+    ap.add_argument('--db', default=None, help='database path or store URL')
+    args = ap.parse_args(argv)
+
+    if not args.batch:
+        if len(args.args) < 2:
+            print('Usage: ' + USAGE)
+            return 2
+        cp, dec = args.args[0], args.args[1]
+        rev = args.args[2] if len(args.args) > 2 else args.reviewer
+        store = open_store(args.db)
+        try:
+            store.save_decision(cp, rev, dec)
+            # mark completed as API does
+            store.mark_completed(cp)
+        finally:
+            store.close()
+        print('Decision saved for', cp, dec, rev)
+        return 0
+
+    # Imported here: the HTTP server modules are not needed for single decisions
+    from src.api import decision_batch, batch_response
+    payload = load_batch(args.batch, args.reviewer)
+    if args.url:
+        response = post_batch(args.url, payload)
+    else:
+        batch, error = decision_batch(payload, args.reviewer)
+        if error:
+            print(error)
+            return 2
+        store = open_store(args.db)
+        try:
+            response = batch_response(store.save_decisions(batch))
+        finally:
+            store.close()
+    for result in response['results']:
+        print(f"{result['checkpoint_id']}\t{result['status']}\t{result['decision'] or ''}")
+    print(f"Decided {response['decided']} of {len(response['results'])}")
+    return 0 if response['decided'] == len(response['results']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
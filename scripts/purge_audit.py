@@ -1,28 +1,19 @@
 #!/usr/bin/env python3
-import sqlite3
+"""Archive and delete audit_log rows older than the retention age, in small batches.
+
+Shortcut for `python -m src retention --only audit_log`; takes the same
+options, e.g. `--days audit_log=30`, `--no-archive` or `--dry-run`.
+"""
+import os
 import sys
 
-DB='demo.db'
-try:
-    conn=sqlite3.connect(DB)
-    cur=conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='audit_log'")
-    exists=cur.fetchone()[0]
-    print('TABLE_EXISTS', exists)
-    if not exists:
-        print('No audit_log table found.')
-        sys.exit(0)
-    cur.execute('SELECT COUNT(*) FROM audit_log')
-    before=cur.fetchone()[0]
-    print('COUNT_BEFORE_DELETE', before)
-    cur.execute('DELETE FROM audit_log')
-    conn.commit()
-    cur.execute('VACUUM')
-    conn.commit()
-    cur.execute('SELECT COUNT(*) FROM audit_log')
-    after=cur.fetchone()[0]
-    print('COUNT_AFTER_DELETE', after)
-    conn.close()
-except Exception as e:
-    print('ERROR', e)
-    sys.exit(2)
+# Ensure project root is on sys.path so `from src import ...` works
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.abspath(os.path.join(_HERE, '..'))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+from src.retention import main
+
+if __name__ == '__main__':
+    sys.exit(main(['--only', 'audit_log'] + sys.argv[1:]))
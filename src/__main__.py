@@ -1,12 +1,35 @@
 # Allow `python -m src` to offer quick commands
 import sys
-from src.runner import run_workflow
+
+USAGE = """Usage:
+  python -m src run <invoice.json>
+  python -m src ingest <invoices.jsonl | -> --out <results.jsonl> [--workers N]
+  python -m src watch <spool-dir> [--workers N] [--once]
+  python -m src jobs {submit <invoice.json ...> | work [--processes N] | stats}
+  python -m src stats [--hours N] [--json]
+  python -m src retention [--days TABLE=DAYS ...] [--no-archive] [--dry-run]"""
 
 if __name__ == '__main__':
     if len(sys.argv) >= 2 and sys.argv[1] == 'run':
         import json
+        from src.runner import run_workflow
         with open(sys.argv[2], 'r', encoding='utf-8') as f:
             inv = json.load(f)
         run_workflow(inv)
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'ingest':
+        from src.ingest import main
+        sys.exit(main(sys.argv[2:]))
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'watch':
+        from src.watch import main
+        sys.exit(main(sys.argv[2:]))
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'jobs':
+        from src.jobs import main
+        sys.exit(main(sys.argv[2:]))
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'stats':
+        from src.stats import main
+        sys.exit(main(sys.argv[2:]))
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'retention':
+        from src.retention import main
+        sys.exit(main(sys.argv[2:]))
     else:
-        print('Usage: python -m src run <invoice.json>')
+        print(USAGE)
@@ -2,9 +2,15 @@
 Adapter templates for real MCP clients.
 Replace these stubs with actual implementations when credentials are available.
 """
+import json
+import threading
 
 
 # ============ OCR Adapters (ATLAS) ============
+# `extract_text(path)` OCRs a whole file. Adapters that can OCR one page of a
+# multi-page attachment also define `extract_page_text(page)`, taking a
+# src.attachments.Page (path, 1-based number, page count, kind); the
+# pipeline calls it for several pages at once.
 
 class GoogleVisionAdapter:
     """Adapter for Google Cloud Vision API."""
@@ -20,20 +26,54 @@ class GoogleVisionAdapter:
         # ...
         raise NotImplementedError("Configure Google Vision API key in env")
 
+    def extract_page_text(self, page) -> str:
+        """Extract text from one page of a PDF/TIFF using Google Vision."""
+        # TODO: client.batch_annotate_files(requests=[{'input_config': {...}, 'pages': [page.number],
+        #     'features': [{'type_': vision.Feature.Type.DOCUMENT_TEXT_DETECTION}]}])
+        raise NotImplementedError("Configure Google Vision API key in env")
+
 
 class TesseractAdapter:
-    """Adapter for Tesseract OCR."""
-    def __init__(self):
-        # TODO: import pytesseract; configure path to tesseract executable
-        pass
-    
+    """Local OCR with Tesseract on this machine's cores (see src/local_ocr.py).
+
+    Pages are rendered one at a time, downscaled to `dpi`, deskewed and
+    binarized, then recognised by a pool of up to `workers` warm engines.
+    Needs Pillow and tesserocr or pytesseract + tesseract-ocr; PDFs also
+    need pdf2image + poppler. Without them every call raises
+    NotImplementedError, like the other stubs, and callers fall back.
+    """
+    def __init__(self, lang: str = 'eng', dpi: int = 300, workers: int = None, psm: int = 6,
+                 deskew: bool = True, binarize: bool = True, max_skew: float = 5.0):
+        from src import local_ocr
+        self.lang = lang
+        self.dpi = dpi
+        self.deskew = deskew
+        self.binarize = binarize
+        self.max_skew = max_skew
+        try:
+            self.engine = local_ocr.TesseractEngine(lang=lang, psm=psm, workers=workers)
+        except NotImplementedError:
+            self.engine = None
+
+    @property
+    def available(self) -> bool:
+        return self.engine is not None
+
+    def extract_page_text(self, page) -> str:
+        """Extract text from one page (src.attachments.Page) using Tesseract."""
+        if self.engine is None:
+            raise NotImplementedError("Install Pillow and tesserocr, or pytesseract and tesseract-ocr")
+        from src import local_ocr
+        image, source_dpi = local_ocr.render_page(page, self.dpi)
+        image = local_ocr.preprocess(image, source_dpi, self.dpi, self.deskew, self.binarize, self.max_skew)
+        return self.engine.recognize(image, min(source_dpi or self.dpi, self.dpi))
+
     def extract_text(self, image_path: str) -> str:
-        """Extract text using Tesseract."""
-        # TODO: Implement pytesseract.image_to_string()
-        # import pytesseract
-        # text = pytesseract.image_to_string(image_path)
-        # return text
-        raise NotImplementedError("Install pytesseract and tesseract-ocr")
+        """Extract text from every page of a file using Tesseract, pages in parallel."""
+        if self.engine is None:
+            raise NotImplementedError("Install Pillow and tesserocr, or pytesseract and tesseract-ocr")
+        from src import attachments
+        return attachments.ocr_attachments([image_path], self.extract_page_text, self.engine.workers)
 
 
 class AwsTextractAdapter:
@@ -185,12 +225,21 @@ class PostgresAdapter:
         self.user = user
         self.password = password
         self.dbname = dbname
-        # TODO: import psycopg2; create connection pool
+        self._store = None
+    
+    @property
+    def store(self):
+        """Pooled PostgresStore (see src/store.py), created on first use."""
+        if self._store is None:
+            from urllib.parse import quote
+            from src.store import open_store
+            self._store = open_store(f"postgresql://{quote(self.user, safe='')}:{quote(self.password, safe='')}"
+                                     f"@{self.host}:{self.port}/{self.dbname}")
+        return self._store
     
     def save_checkpoint(self, checkpoint_id: str, state: dict):
         """Save checkpoint to Postgres."""
-        # TODO: Implement INSERT/UPDATE
-        raise NotImplementedError("Configure Postgres connection")
+        self.store.save_checkpoint(checkpoint_id, state.get('invoice', {}).get('invoice_id'), state)
 
 
 class DynamoDbAdapter:
@@ -234,6 +283,26 @@ def get_adapter(adapter_name: str, config: dict):
     return adapter_cls(**config)
 
 
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_adapter(adapter_name: str, config: dict):
+    """Like get_adapter, but one instance per name and config per process.
+
+    Adapters set up SDK clients and sessions (and try optional imports) when
+    constructed; the clients call them on every invoice, so build each once.
+    """
+    key = (adapter_name, json.dumps(config, sort_keys=True, default=repr))
+    adapter = _shared.get(key)
+    if adapter is None:
+        with _shared_lock:
+            adapter = _shared.get(key)
+            if adapter is None:
+                adapter = _shared[key] = get_adapter(adapter_name, config)
+    return adapter
+
+
 # ============ Anthropic / Claude Adapter (ATLAS NLP) ============
 import os
 
@@ -1,51 +1,303 @@
-# Minimal human-review API using Python standard library http.server
+# Human-review API using Python standard library http.server
+#
+# Production mode: one thread per connection (ThreadingHTTPServer), HTTP/1.1
+# keep-alive, a bounded StorePool shared by all request threads, a socket
+# timeout per connection and gzip for larger responses. Review pages get
+# checkpoint changes pushed from a shared ChangeFeed (src/change_feed.py)
+# over /human-review/events (SSE) or /human-review/changes (long poll).
+import argparse
+import gzip
 import json
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, parse_qs
-from src import db
+from src.change_feed import ChangeFeed, poll_changes, sse_events
+from src.store import StorePool
+from src import metrics
 
 HOST = '127.0.0.1'
 PORT = 8081
 
+# Idle keep-alive connections and clients stalling mid-request are dropped after this
+REQUEST_TIMEOUT_S = 30
+MAX_BODY_BYTES = 1 << 20
+# Small bodies are not worth the CPU; level 1 because every response is compressed afresh
+GZIP_MIN_BYTES = 1024
+# Decisions per POST /human-review/decisions
+MAX_BATCH = 1000
+# Hourly throughput rows per GET /stats (one stage row per hour)
+MAX_STATS_HOURS = 24 * 31
+UI_PATH = os.path.join(os.path.dirname(__file__), 'static', 'ui.html')
+
+
+def decision_batch(payload, default_reviewer):
+    """[(checkpoint_id, reviewer_id, decision), ...] from a /human-review/decisions body, or (None, error).
+
+    Body: {"decisions": [{"checkpoint_id", "decision", "reviewer_id"?}, ...], "reviewer_id"?}.
+    Malformed entries are kept as (None, ...) so they come back as 'invalid' in place.
+    """
+    items = payload.get('decisions')
+    if not isinstance(items, list) or not items:
+        return None, 'decisions list required'
+    if len(items) > MAX_BATCH:
+        return None, f'at most {MAX_BATCH} decisions per request'
+    reviewer = payload.get('reviewer_id') or default_reviewer
+    return [(it.get('checkpoint_id'), it.get('reviewer_id') or reviewer, it.get('decision')) if isinstance(it, dict)
+            else (None, reviewer, None) for it in items], None
+
+
+def pending_filters(get):
+    """list_pending keyword arguments from query parameters; `get(name)` returns a str or None. ValueError if malformed.
+
+    ?vendor= (any spelling of the vendor), ?min_amount= / ?max_amount= (band
+    min <= amount < max) and ?limit=.
+    """
+    filters = {'vendor': get('vendor') or None}
+    for name in ('min_amount', 'max_amount'):
+        value = get(name)
+        filters[name] = float(value) if value else None
+    limit = get('limit')
+    filters['limit'] = max(0, int(limit)) if limit else None
+    return filters
+
+
+def stats_params(get):
+    """read_stats keyword arguments from ?hours= and ?vendors=; ValueError if malformed."""
+    hours, vendors = get('hours'), get('vendors')
+    return {'hours': min(max(int(hours), 1), MAX_STATS_HOURS) if hours else 24,
+            'vendors': max(int(vendors), 0) if vendors else 20}
+
+
+def batch_response(results):
+    return {'decided': sum(r['status'] == 'decided' for r in results), 'results': results}
+
+
 class Handler(BaseHTTPRequestHandler):
-    def _send(self, code, obj):
+    protocol_version = 'HTTP/1.1'
+    timeout = REQUEST_TIMEOUT_S
+    # Headers and body are separate writes; with Nagle on, keep-alive clients
+    # wait out the peer's delayed ACK on every response
+    disable_nagle_algorithm = True
+
+    def _accepts_gzip(self):
+        encodings = self.headers.get('Accept-Encoding', '')
+        return any(e.split(';')[0].strip() == 'gzip' for e in encodings.split(','))
+
+    def _send_bytes(self, code, body, content_type, headers=()):
         self.send_response(code)
-        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Type', content_type)
+        if len(body) >= GZIP_MIN_BYTES and self._accepts_gzip():
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        for name, value in headers:
+            self.send_header(name, value)
+        # Content-Length on every response keeps the connection reusable
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send(self, code, obj, headers=()):
+        self._send_bytes(code, json.dumps(obj).encode('utf-8'), 'application/json', headers)
+
+    def _send_text(self, code, text, content_type='text/plain; version=0.0.4'):
+        self._send_bytes(code, text.encode('utf-8'), content_type)
+
+    def _send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
         self.end_headers()
-        self.wfile.write(json.dumps(obj).encode('utf-8'))
+
+    def _since(self, query):
+        """Change seq the client has seen: SSE Last-Event-ID (set on reconnects), else ?since=, else the feed's."""
+        value = self.headers.get('Last-Event-ID') or query.get('since', [None])[0]
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return self.server.feed.seq
+
+    def _pending(self, store, filters):
+        # The change seq is read first: a change racing the list is replayed, never lost
+        seq = store.last_checkpoint_change()
+        etag = f'W/"{seq}"'
+        if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            return 304, etag
+        return 200, {'items': store.list_pending(**filters), 'seq': seq}, [('ETag', etag)]
+
+    def _stream_events(self, since):
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        try:
+            for chunk in sse_events(self.server.feed, since):
+                self.wfile.write(chunk.encode('utf-8'))
+        except OSError:
+            # Page closed (broken pipe / reset) or the client stopped reading
+            pass
+
+    def _read_json(self):
+        """Request body as a dict, or None after an error response was sent."""
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_BYTES:
+            # The unread body would be parsed as the next request
+            self.close_connection = True
+            self._send(413 if length > 0 else 400, {'error': 'invalid Content-Length'})
+            return None
+        body = self.rfile.read(length)
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self._send(400, {'error': 'invalid JSON body'})
+            return None
+        if not isinstance(payload, dict):
+            self._send(400, {'error': 'JSON object expected'})
+            return None
+        return payload
+
+    def _with_store(self, fn):
+        """Send fn(store) -> (code, obj[, headers]); (304, etag) for Not Modified."""
+        try:
+            with self.server.stores.acquire() as store:
+                result = fn(store)
+        except TimeoutError:
+            self._send(503, {'error': 'server busy'}, headers=[('Retry-After', '1')])
+            return
+        if result[0] == 304:
+            self._send_not_modified(result[1])
+            return
+        self._send(*result)
 
     def do_GET(self):
         p = urlparse(self.path)
-        if p.path == '/human-review/pending':
-            conn = db.init_db()
-            items = db.list_pending(conn)
-            resp = {'items': items}
-            self._send(200, resp)
+        if p.path == '/metrics':
+            self._send_text(200, metrics.render_prometheus())
+            return
+        if p.path in ('/human-review/pending', '/human-review/next'):
+            query = parse_qs(p.query)
+            try:
+                filters = pending_filters(lambda name: query.get(name, [None])[0])
+            except ValueError:
+                self._send(400, {'error': 'min_amount, max_amount and limit must be numbers'})
+                return
+            if p.path == '/human-review/next':
+                # The most urgent matching checkpoint: one index entry
+                filters['limit'] = 1
+                self._with_store(lambda store: (200, {'item': next(iter(store.list_pending(**filters)), None)}))
+            else:
+                self._with_store(lambda store: self._pending(store, filters))
+            return
+        if p.path == '/stats':
+            query = parse_qs(p.query)
+            try:
+                params = stats_params(lambda name: query.get(name, [None])[0])
+            except ValueError:
+                self._send(400, {'error': 'hours and vendors must be integers'})
+                return
+            self._with_store(lambda store: (200, store.read_stats(**params)))
+            return
+        if p.path == '/human-review/changes':
+            query = parse_qs(p.query)
+            try:
+                timeout = float(query.get('timeout', ['25'])[0])
+            except ValueError:
+                timeout = 25.0
+            self._send(200, poll_changes(self.server.feed, self._since(query), timeout))
+            return
+        if p.path == '/human-review/events':
+            self._stream_events(self._since(parse_qs(p.query)))
+            return
+        if p.path == '/human-review/ui':
+            with open(UI_PATH, 'rb') as f:
+                self._send_bytes(200, f.read(), 'text/html; charset=utf-8')
             return
         self._send(404, {'error': 'not found'})
 
     def do_POST(self):
         p = urlparse(self.path)
         if p.path == '/human-review/decision':
-            length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(length)
-            payload = json.loads(body.decode('utf-8'))
+            payload = self._read_json()
+            if payload is None:
+                return
             checkpoint_id = payload.get('checkpoint_id')
             decision = payload.get('decision')
             reviewer_id = payload.get('reviewer_id', 'api_user')
-            conn = db.init_db()
-            db.save_decision(conn, checkpoint_id, reviewer_id, decision)
-            db.mark_completed(conn, checkpoint_id)
-            resp = {'resume_token': checkpoint_id, 'next_stage': 'RECONCILE'}
-            self._send(200, resp)
+            if not checkpoint_id or not decision:
+                self._send(400, {'error': 'checkpoint_id and decision required'})
+                return
+
+            def decide(store):
+                store.save_decision(checkpoint_id, reviewer_id, decision)
+                store.mark_completed(checkpoint_id)
+                return 200, {'resume_token': checkpoint_id, 'next_stage': 'RECONCILE'}
+
+            self._with_store(decide)
+            return
+        if p.path == '/human-review/decisions':
+            payload = self._read_json()
+            if payload is None:
+                return
+            batch, error = decision_batch(payload, 'api_user')
+            if error:
+                self._send(400, {'error': error})
+                return
+            self._with_store(lambda store: (200, batch_response(store.save_decisions(batch))))
             return
         self._send(404, {'error': 'not found'})
 
+    def log_message(self, format, *args):
+        if getattr(self.server, 'log_requests', True):
+            super().log_message(format, *args)
+
+
+class ReviewServer(ThreadingHTTPServer):
+    """Threaded review API server owning the StorePool and ChangeFeed its handlers use."""
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, db_path=None, pool_size=8, log_requests=True, handler=Handler, poll_interval=1.0):
+        self.stores = StorePool(db_path, pool_size)
+        self.feed = ChangeFeed(self.stores, poll_interval)
+        self.log_requests = log_requests
+        super().__init__(address, handler)
+
+    def server_close(self):
+        super().server_close()
+        # Ends open event streams and long polls
+        self.feed.close()
+        self.stores.close()
+
+
+def run_server(host=HOST, port=PORT, db_path=None, pool_size=8, log_requests=True):
+    server = ReviewServer((host, port), db_path, pool_size, log_requests)
+    print(f'Listening on http://{host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Threaded human-review API server')
+    ap.add_argument('--host', default=HOST)
+    ap.add_argument('--port', type=int, default=PORT)
+    ap.add_argument('--db', default=None, help='database path or store URL (default: INVOICE_STORE_URL or demo.db)')
+    ap.add_argument('--pool-size', type=int, default=8, help='max concurrent database connections')
+    ap.add_argument('--quiet', action='store_true', help='no per-request log lines')
+    args = ap.parse_args(argv)
+    run_server(args.host, args.port, args.db, args.pool_size, not args.quiet)
+    return 0
 
-def run_server():
-    print(f'Listening on http://{HOST}:{PORT}')
-    server = HTTPServer((HOST, PORT), Handler)
-    server.serve_forever()
 
 if __name__ == '__main__':
-    run_server()
+    raise SystemExit(main())
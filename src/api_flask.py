@@ -1,27 +1,89 @@
-from flask import Flask, jsonify, request, send_from_directory
-from src import db
+from flask import Flask, Response, abort, jsonify, request, send_from_directory
+from src.api import batch_response, decision_batch, pending_filters, stats_params
+from src.change_feed import ChangeFeed, poll_changes, sse_events, summary_item
+from src.store import StorePool
+from src import metrics
 import os
+import threading
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
+_stores = None
+_feed = None
+# Concurrent first requests must not build two pools, or two feeds each polling and listening
+_lock = threading.Lock()
+
+
+def stores() -> StorePool:
+    # Created on first request so importing the app does not touch the database
+    global _stores
+    if _stores is None:
+        with _lock:
+            if _stores is None:
+                _stores = StorePool()
+    return _stores
+
+
+def feed() -> ChangeFeed:
+    global _feed
+    if _feed is None:
+        pool = stores()
+        with _lock:
+            if _feed is None:
+                _feed = ChangeFeed(pool)
+    return _feed
+
+
+def _since():
+    # EventSource sends Last-Event-ID when it reconnects; it wins over the original ?since=
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        return int(since)
+    except (TypeError, ValueError):
+        return feed().seq
+
+
+def _filters():
+    try:
+        return pending_filters(request.args.get)
+    except ValueError:
+        abort(400, 'min_amount, max_amount and limit must be numbers')
+
 
 @app.route('/human-review/pending', methods=['GET'])
 def list_pending():
-    conn = db.init_db()
-    items = db.list_pending(conn)
+    filters = _filters()
+    with stores().acquire() as store:
+        # Read before the list: a change racing it is replayed by the feed, never lost
+        seq = store.last_checkpoint_change()
+        if request.if_none_match.contains_weak(str(seq)):
+            resp = Response(status=304)
+            resp.set_etag(str(seq), weak=True)
+            return resp
+        items = store.list_pending(**filters)
     # Trim state for response
-    resp_items = []
-    for it in items:
-        resp_items.append({
-            'checkpoint_id': it['checkpoint_id'],
-            'invoice_id': it['invoice_id'],
-            'created_at': it['created_at'],
-            'summary': {
-                'vendor_name': it['state'].get('invoice', {}).get('vendor_name'),
-                'amount': it['state'].get('invoice', {}).get('amount')
-            }
-        })
-    return jsonify({'items': resp_items})
+    resp_items = [summary_item(it) for it in items]
+    resp = jsonify({'items': resp_items, 'seq': seq})
+    resp.set_etag(str(seq), weak=True)
+    return resp
+
+
+@app.route('/human-review/next', methods=['GET'])
+def next_pending():
+    filters = dict(_filters(), limit=1)
+    with stores().acquire() as store:
+        items = store.list_pending(**filters)
+    return jsonify({'item': summary_item(items[0]) if items else None})
+
+
+@app.route('/human-review/changes', methods=['GET'])
+def poll_pending_changes():
+    return jsonify(poll_changes(feed(), _since(), request.args.get('timeout', 25.0, type=float)))
+
+
+@app.route('/human-review/events', methods=['GET'])
+def pending_events():
+    return Response(sse_events(feed(), _since()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 
 @app.route('/human-review/decision', methods=['POST'])
@@ -32,17 +94,53 @@ def post_decision():
     reviewer_id = payload.get('reviewer_id', 'web_user')
     if not checkpoint_id or not decision:
         return jsonify({'error': 'checkpoint_id and decision required'}), 400
-    conn = db.init_db()
-    db.save_decision(conn, checkpoint_id, reviewer_id, decision)
-    db.mark_completed(conn, checkpoint_id)
+    with stores().acquire() as store:
+        store.save_decision(checkpoint_id, reviewer_id, decision)
+        store.mark_completed(checkpoint_id)
     return jsonify({'resume_token': checkpoint_id, 'next_stage': 'RECONCILE'})
 
 
+@app.route('/human-review/decisions', methods=['POST'])
+def post_decisions():
+    payload = request.get_json(force=True)
+    batch, error = decision_batch(payload if isinstance(payload, dict) else {}, 'web_user')
+    if error:
+        return jsonify({'error': error}), 400
+    with stores().acquire() as store:
+        results = store.save_decisions(batch)
+    return jsonify(batch_response(results))
+
+
+@app.route('/stats', methods=['GET'])
+def reporting_stats():
+    try:
+        params = stats_params(request.args.get)
+    except ValueError:
+        abort(400, 'hours and vendors must be integers')
+    with stores().acquire() as store:
+        return jsonify(store.read_stats(**params))
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/human-review/ui', methods=['GET'])
 def ui():
     # Serve a minimal UI page
     return send_from_directory(os.path.join(os.path.dirname(__file__), 'static'), 'ui.html')
 
 
+def serve(host='127.0.0.1', port=8081, threads=8):
+    """Production serving: waitress when installed, else the threaded Werkzeug server."""
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+    waitress_serve(app, host=host, port=port, threads=threads, channel_timeout=30)
+
+
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=8081, debug=False)
+    serve()
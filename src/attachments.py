@@ -0,0 +1,133 @@
+"""
+Page-level handling of invoice attachments for OCR.
+
+Every attachment of an invoice is split into pages, the pages are OCRed a
+few at a time, and the texts come back in attachment and page order,
+joined with form feeds (the page separator Tesseract uses).
+
+Nothing here reads a whole file into memory. Pages are counted on a memory
+map of the file: PDF page objects are found with a regex over the map, and
+the IFD chain of a (multi-page) TIFF is walked in place. A `Page` only
+names its file and number; the OCR adapter renders that one page itself
+(pdf2image's first_page/last_page, Vision's `pages`, ...), and at most
+`window` pages are in flight at once, so a 200-page scan costs a handful
+of rendered pages, not 200.
+
+PDFs that keep their page dictionaries in compressed object streams are
+counted with pypdf when it is installed (optional dependency); otherwise
+they are treated as one page.
+"""
+import mmap
+import re
+import struct
+from collections import deque
+from typing import Callable, Iterable, List, NamedTuple
+
+# Pages OCRed at the same time per attachment set (config.ocr_page_workers)
+PAGE_WORKERS = 4
+PAGE_SEPARATOR = '\f'
+
+_PDF_PAGE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+
+
+class Page(NamedTuple):
+    """One page of an attachment; `number` is 1-based, `count` the attachment's page total."""
+    path: str
+    number: int
+    count: int
+    kind: str  # 'pdf', 'tiff', 'image' or 'missing'
+
+
+def _tiff_pages(mm) -> int:
+    """Number of IFDs (pages) in a classic or BigTIFF file."""
+    endian = '<' if mm[:2] == b'II' else '>'
+    if struct.unpack_from(endian + 'H', mm, 2)[0] == 43:
+        count_fmt, next_fmt, entry_size = 'Q', 'Q', 20
+        offset = struct.unpack_from(endian + 'Q', mm, 8)[0]
+    else:
+        count_fmt, next_fmt, entry_size = 'H', 'I', 12
+        offset = struct.unpack_from(endian + 'I', mm, 4)[0]
+    seen = set()
+    try:
+        while offset and offset not in seen:
+            seen.add(offset)
+            entries = struct.unpack_from(endian + count_fmt, mm, offset)[0]
+            offset = struct.unpack_from(endian + next_fmt, mm, offset + struct.calcsize(count_fmt) + entries * entry_size)[0]
+    except struct.error:
+        pass  # truncated file: count the pages read so far
+    return max(len(seen), 1)
+
+
+def _pdf_pages(path: str, mm) -> int:
+    count = sum(1 for _ in _PDF_PAGE.finditer(mm))
+    if count:
+        return count
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return 1
+    try:
+        return len(PdfReader(path).pages) or 1
+    except Exception:
+        return 1
+
+
+def inspect(path: str):
+    """(kind, page count) of an attachment; ('missing', 1) when it cannot be read."""
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    # One forward pass; lets the kernel read ahead and drop pages behind
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                head = mm[:4]
+                if head == b'%PDF':
+                    return 'pdf', _pdf_pages(path, mm)
+                if head in (b'II*\x00', b'MM\x00*', b'II+\x00', b'MM\x00+'):
+                    return 'tiff', _tiff_pages(mm)
+                return 'image', 1
+    except (OSError, TypeError, ValueError):
+        # Missing, not a path, or empty (an empty file cannot be mapped)
+        return 'missing', 1
+
+
+def iter_pages(attachments: Iterable[str]):
+    """Pages of every attachment, in attachment and page order."""
+    for path in attachments:
+        kind, count = inspect(path)
+        for number in range(1, count + 1):
+            yield Page(path, number, count, kind)
+
+
+def ocr_pages(pages: Iterable[Page], ocr_page: Callable[[Page], str], workers: int = PAGE_WORKERS,
+              window: int = None) -> List[str]:
+    """`ocr_page(page)` for every page, up to `workers` at a time; texts in page order.
+
+    No more than `window` (default 2 * workers) pages are submitted ahead of
+    the oldest unfinished one. The first failing page's error is raised.
+    """
+    pages = list(pages)
+    if workers <= 1 or len(pages) <= 1:
+        return [ocr_page(page) for page in pages]
+    from concurrent.futures import ThreadPoolExecutor
+    window = max(window or 2 * workers, workers)
+    texts = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ocr-page') as executor:
+        pending = deque()
+        try:
+            for page in pages:
+                if len(pending) >= window:
+                    texts.append(pending.popleft().result())
+                pending.append(executor.submit(ocr_page, page))
+            while pending:
+                texts.append(pending.popleft().result())
+        finally:
+            for future in pending:
+                future.cancel()
+    return texts
+
+
+def ocr_attachments(attachments: Iterable[str], ocr_page: Callable[[Page], str], workers: int = PAGE_WORKERS,
+                    window: int = None) -> str:
+    """Text of all attachments, pages joined with PAGE_SEPARATOR; '' when there are none."""
+    return PAGE_SEPARATOR.join(ocr_pages(iter_pages(attachments), ocr_page, workers, window))
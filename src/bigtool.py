@@ -1,17 +1,75 @@
-import yaml
+import json
 import os
+import threading
 from typing import List
 
 TOOLS_YAML = os.path.join(os.path.dirname(__file__), '..', 'tools.yaml')
+# Parsed tools.yaml for new processes (CLI runs, pool workers): while
+# tools.yaml is unchanged they read this JSON instead of importing PyYAML
+TOOLS_CACHE = os.path.join(os.path.dirname(__file__), '__pycache__', 'tools.yaml.json')
 
+_tools = None  # (stamp, parsed config)
+_tools_lock = threading.Lock()
 
-def _load_pools():
+
+def _read_cache(stamp):
     try:
-        with open(TOOLS_YAML, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-            return data.get('bigtool_pools', {}) if data else {}
+        with open(TOOLS_CACHE, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('path') != os.path.abspath(TOOLS_YAML) or cached.get('stamp') != stamp:
+        return None
+    return cached.get('config')
+
+
+def _write_cache(stamp, config):
+    # Only configs that survive JSON unchanged (no dates, no non-string keys)
+    try:
+        if json.loads(json.dumps(config)) != config:
+            return
+        os.makedirs(os.path.dirname(TOOLS_CACHE), exist_ok=True)
+        tmp = f'{TOOLS_CACHE}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'path': os.path.abspath(TOOLS_YAML), 'stamp': stamp, 'config': config}, f)
+        os.replace(tmp, TOOLS_CACHE)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load_tools_config():
+    """Parsed tools.yaml; {} when the file is missing or empty.
+
+    Parsed once per process and again only when the file's mtime or size
+    changes. The result is shared: callers must not modify it.
+    """
+    global _tools
+    try:
+        st = os.stat(TOOLS_YAML)
     except FileNotFoundError:
         return {}
+    stamp = [st.st_mtime_ns, st.st_size]
+    cached = _tools
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with _tools_lock:
+        if _tools and _tools[0] == stamp:
+            return _tools[1]
+        config = _read_cache(stamp)
+        if config is None:
+            import yaml
+            try:
+                with open(TOOLS_YAML, 'r', encoding='utf-8') as f:
+                    config = yaml.safe_load(f) or {}
+            except FileNotFoundError:
+                return {}
+            _write_cache(stamp, config)
+        _tools = (stamp, config)
+        return config
+
+
+def _load_pools():
+    return load_tools_config().get('bigtool_pools', {})
 
 
 class BigtoolPicker:
@@ -33,6 +91,10 @@ class BigtoolPicker:
         }
         return fallbacks.get(capability, 'mock_tool')
 
+    def pool(self, capability: str) -> List[str]:
+        """All tools configured for `capability`, in preference order."""
+        return list(self.pools.get(capability, []))
+
 
 if __name__ == '__main__':
     p = BigtoolPicker()
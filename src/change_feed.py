@@ -0,0 +1,145 @@
+"""
+Checkpoint change feed for the review APIs.
+
+Every checkpoint save, decision and completion appends a row to the
+`checkpoint_changes` log (see src/db.py). One ChangeFeed per server reads
+that log on a single thread and keeps the latest events in memory, and any
+number of open review pages wait on it: over Server-Sent Events
+(`sse_events`) or long polling (`poll_changes`). A page therefore costs one
+idle request thread and no database work until something changes.
+
+Writes made in the server's own process (decisions posted to it, or
+runners sharing the process) wake the feed immediately through
+db.add_change_listener; writes from other processes are seen within
+`poll_interval`.
+
+Events are dicts: {'seq', 'event': 'added' | 'decided' | 'completed',
+'checkpoint_id', 'invoice_id', 'ts'}, and 'added' events carry `item`,
+the pending-list entry to show.
+"""
+import json
+import threading
+from collections import deque
+
+from src import db
+
+# Long polls return after this at the latest (below the API socket timeout)
+MAX_WAIT_S = 25.0
+HEARTBEAT_S = 15.0
+# Changes read from the store per query
+PAGE_SIZE = 500
+
+
+def summary_item(item):
+    """Pending-list entry (as from store.list_pending) without the full workflow state."""
+    return {
+        'checkpoint_id': item['checkpoint_id'],
+        'invoice_id': item['invoice_id'],
+        'created_at': item['created_at'],
+        'priority': item['priority'],
+        'due_date': item['due_date'],
+        'summary': {'vendor_name': item['vendor_name'], 'amount': item['amount'],
+                    'match_score': item['match_score'], 'risk_score': item['risk_score']},
+    }
+
+
+class ChangeFeed:
+    """Shared tail of the checkpoint change log; see the module docstring."""
+
+    def __init__(self, stores, poll_interval: float = 1.0, backlog: int = 1000):
+        self.stores = stores
+        self.poll_interval = poll_interval
+        self._events = deque(maxlen=backlog)
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._closed = False
+        with stores.acquire() as store:
+            self.seq = store.last_checkpoint_change()
+        # Every event with seq > _floor is still in _events
+        self._floor = self.seq
+        db.add_change_listener(self._wake.set)
+        self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.refresh()
+            except Exception:
+                # The database may be busy or briefly unavailable; retry on the next tick
+                pass
+
+    def refresh(self):
+        """Read new changes from the store and wake waiting requests."""
+        with self.stores.acquire() as store:
+            changes = store.list_checkpoint_changes(self.seq, PAGE_SIZE)
+            for change in changes:
+                if change['event'] == 'added':
+                    cp = store.fetch_checkpoint(change['checkpoint_id'])
+                    if cp:
+                        change['item'] = summary_item({'checkpoint_id': cp['id'], 'invoice_id': cp['invoice_id'],
+                                                       'created_at': change['ts'],
+                                                       **db.review_fields(cp['state'], change['ts'])})
+        if not changes:
+            return
+        with self._cond:
+            for change in changes:
+                if len(self._events) == self._events.maxlen:
+                    self._floor = self._events[0]['seq']
+                self._events.append(change)
+            self.seq = changes[-1]['seq']
+            self._cond.notify_all()
+        # A full page means there may be more
+        if len(changes) >= PAGE_SIZE:
+            self._wake.set()
+
+    def changes_since(self, since: int):
+        """(seq, events after `since`), or (seq, None) if they are no longer held and the client must reload."""
+        with self._cond:
+            if since < self._floor:
+                return self.seq, None
+            return self.seq, [e for e in self._events if e['seq'] > since]
+
+    def wait(self, since: int, timeout: float):
+        """Like changes_since, but waits up to `timeout` seconds for something newer than `since`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self.seq > since, timeout)
+        return self.changes_since(since)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        db.remove_change_listener(self._wake.set)
+        self._closed = True
+        self._wake.set()
+        with self._cond:
+            self._cond.notify_all()
+
+
+def poll_changes(feed: ChangeFeed, since: int, timeout: float) -> dict:
+    """Long-poll response body: {'seq', 'changes'} or {'seq', 'reset': True}."""
+    seq, changes = feed.wait(since, min(max(timeout, 0.0), MAX_WAIT_S))
+    if changes is None:
+        return {'seq': seq, 'reset': True}
+    return {'seq': seq, 'changes': changes}
+
+
+def sse_events(feed: ChangeFeed, since: int, heartbeat: float = HEARTBEAT_S):
+    """Server-Sent Events stream (str chunks) of changes after `since`, until the feed closes."""
+    yield 'retry: 3000\n\n'
+    while not feed.closed:
+        seq, changes = feed.wait(since, heartbeat)
+        if changes is None:
+            # Too far behind: the page reloads the list and reconnects from its seq
+            yield f'event: reset\ndata: {json.dumps({"seq": seq})}\n\n'
+            return
+        if not changes:
+            yield ': keep-alive\n\n'
+            continue
+        for change in changes:
+            yield f"id: {change['seq']}\nevent: {change['event']}\ndata: {json.dumps(change)}\n\n"
+        since = changes[-1]['seq']
@@ -0,0 +1,78 @@
+"""
+Process pool for CPU-bound stage work (OCR, line-item parsing).
+
+Stages marked `"executor": "process"` in workflow.json run their node's
+`cpu_task` in a shared ProcessPoolExecutor when `config.cpu_pool_workers`
+is > 0, so parsing scales across cores instead of queueing on the GIL.
+Only the node's `cpu_inputs(state)` (attachment path, text, ...) is
+pickled to the worker and only the task's result comes back; the state
+dict never leaves the parent.
+
+Worker processes are started once per parent and reused. Each builds its
+CommonClient / AtlasClient (and with them the adapters) in the pool
+initializer, so tasks run against warm clients; `clients()` returns them.
+"""
+import atexit
+import threading
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Per worker process (also used in-process when nothing else was set up)
+_clients = None
+
+
+def _init_worker(mock_latency: dict, mock_cpu_cost: dict):
+    global _clients
+    from src import mcp_clients
+    # Benchmarks tune the mocks in the parent; spawned workers start clean
+    mcp_clients.set_mock_latency(mock_latency)
+    mcp_clients.set_mock_cpu_cost(mock_cpu_cost)
+    _clients = (mcp_clients.AtlasClient(), mcp_clients.CommonClient())
+
+
+def clients():
+    """(AtlasClient, CommonClient) of the current process, created on first use."""
+    global _clients
+    if _clients is None:
+        from src.mcp_clients import AtlasClient, CommonClient
+        _clients = (AtlasClient(), CommonClient())
+    return _clients
+
+
+def get_pool(workers: int):
+    """The shared ProcessPoolExecutor, (re)started if `workers` changed."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            # Imported here: most runs never start a pool, and these are slow to import
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            from src import mcp_clients
+            # spawn: safe with the runner's threads, and the Windows default anyway
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker,
+                                        initargs=(dict(mcp_clients.MOCK_LATENCY), dict(mcp_clients.MOCK_CPU_COST)))
+            _pool_workers = workers
+        return _pool
+
+
+def submitter(workers: int):
+    """`submit(fn, inputs) -> result` running `fn` in the pool (blocks the calling thread only)."""
+    def submit(fn, inputs):
+        return get_pool(workers).submit(fn, inputs).result()
+    return submit
+
+
+def shutdown():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool, _pool_workers = None, 0
+
+
+atexit.register(shutdown)
@@ -1,12 +1,16 @@
 import sqlite3
+import datetime
 import json
+import math
 import time
 import csv
 import os
 import sys
-import subprocess
+import threading
 from typing import Optional
 
+from src.vendors import normalize_vendor
+
 DB_PATH = "./demo.db"
 
 CREATE_CHECKPOINT_SQL = """
@@ -18,8 +22,32 @@ CREATE TABLE IF NOT EXISTS checkpoints (
   created_at REAL,
   updated_at REAL,
   reviewer_id TEXT,
-  decision TEXT
+  decision TEXT,
+  vendor_name TEXT,
+  vendor_key TEXT,
+  amount REAL,
+  due_date TEXT,
+  match_score REAL,
+  risk_score REAL,
+  priority REAL
+)
+"""
+
+# Review-queue columns, filled from the state by save_checkpoint (see
+# review_fields) so the pending list is filtered and ordered by index
+# instead of by parsing every state_blob. Added to older databases by init_db.
+CHECKPOINT_REVIEW_COLUMNS = (
+    ('vendor_name', 'TEXT'), ('vendor_key', 'TEXT'), ('amount', 'REAL'), ('due_date', 'TEXT'),
+    ('match_score', 'REAL'), ('risk_score', 'REAL'), ('priority', 'REAL'),
 )
+
+# Most urgent PAUSED checkpoint first, optionally per vendor
+CREATE_CHECKPOINT_REVIEW_SQL = """
+CREATE INDEX IF NOT EXISTS idx_checkpoints_review ON checkpoints(status, priority DESC, created_at)
+"""
+
+CREATE_CHECKPOINT_VENDOR_SQL = """
+CREATE INDEX IF NOT EXISTS idx_checkpoints_vendor ON checkpoints(status, vendor_key, priority DESC, created_at)
 """
 
 CREATE_AUDIT_SQL = """
@@ -32,50 +60,366 @@ CREATE TABLE IF NOT EXISTS audit_log (
 )
 """
 
+CREATE_QUARANTINE_SQL = """
+CREATE TABLE IF NOT EXISTS quarantine (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  invoice_id TEXT,
+  payload TEXT,
+  errors TEXT,
+  source TEXT,
+  ts REAL
+)
+"""
+
+CREATE_INVOICE_INDEX_SQL = """
+CREATE TABLE IF NOT EXISTS invoice_index (
+  dedup_key TEXT PRIMARY KEY,
+  invoice_id TEXT,
+  raw_id TEXT,
+  attachment_sha256 TEXT,
+  first_seen REAL,
+  status TEXT DEFAULT 'done'
+)
+"""
+
+CREATE_INVOICE_INDEX_ATTACHMENT_SQL = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_invoice_index_attachment ON invoice_index(attachment_sha256)
+"""
+
+CREATE_INVOICE_INDEX_RAW_SQL = """
+CREATE INDEX IF NOT EXISTS idx_invoice_index_raw ON invoice_index(raw_id)
+"""
+
+# Reporting rollups, updated in the same transaction as the rows they
+# summarize so /stats never scans history: audit rows per hour and stage
+# (append_audit), match outcomes per vendor (record_match) and review
+# turnaround per reviewer plus a log-bucket histogram for quantiles
+# (save_decision/save_decisions). Older databases are backfilled once.
+CREATE_ROLLUP_SQL = (
+    """CREATE TABLE IF NOT EXISTS rollup_stage_hourly (
+  hour INTEGER,
+  stage TEXT,
+  events INTEGER DEFAULT 0,
+  invoices INTEGER DEFAULT 0,
+  PRIMARY KEY (hour, stage)
+)""",
+    """CREATE TABLE IF NOT EXISTS rollup_vendor_match (
+  vendor_key TEXT PRIMARY KEY,
+  vendor_name TEXT,
+  invoices INTEGER DEFAULT 0,
+  matched INTEGER DEFAULT 0,
+  score_sum REAL DEFAULT 0,
+  last_seen REAL
+)""",
+    """CREATE TABLE IF NOT EXISTS rollup_reviewer (
+  reviewer_id TEXT PRIMARY KEY,
+  decisions INTEGER DEFAULT 0,
+  accepted INTEGER DEFAULT 0,
+  rejected INTEGER DEFAULT 0,
+  turnaround_sum REAL DEFAULT 0,
+  turnaround_max REAL DEFAULT 0
+)""",
+    """CREATE TABLE IF NOT EXISTS rollup_turnaround (
+  bucket INTEGER PRIMARY KEY,
+  decisions INTEGER DEFAULT 0
+)""",
+)
+
+# Lets append_audit tell the first row of an invoice at a stage from later ones
+CREATE_AUDIT_INVOICE_STAGE_SQL = """
+CREATE INDEX IF NOT EXISTS idx_audit_invoice_stage ON audit_log(invoice_id, stage)
+"""
+
+# Durable work queue. status: queued -> leased -> done | failed, or
+# leased -> waiting (parked at a HITL checkpoint) -> queued once decided.
+CREATE_JOBS_SQL = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  queue TEXT,
+  kind TEXT,
+  payload TEXT,
+  priority REAL DEFAULT 0,
+  status TEXT,
+  attempts INTEGER DEFAULT 0,
+  max_attempts INTEGER DEFAULT 3,
+  available_at REAL,
+  lease_owner TEXT,
+  lease_expires REAL,
+  checkpoint_id TEXT,
+  result TEXT,
+  error TEXT,
+  created_at REAL,
+  updated_at REAL
+)
+"""
+
+CREATE_JOBS_READY_SQL = """
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(queue, status, priority DESC, available_at)
+"""
+
+CREATE_JOBS_CHECKPOINT_SQL = """
+CREATE INDEX IF NOT EXISTS idx_jobs_checkpoint ON jobs(checkpoint_id)
+"""
+
+# Append-only log of checkpoint changes (event: added, decided, completed),
+# written in the same transaction as the change. The review APIs push it to
+# open review pages and use the latest seq as the ETag of the pending list.
+CREATE_CHECKPOINT_CHANGES_SQL = """
+CREATE TABLE IF NOT EXISTS checkpoint_changes (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  checkpoint_id TEXT,
+  invoice_id TEXT,
+  event TEXT,
+  ts REAL
+)
+"""
+
+# High-water marks of incremental exports that read checkpoint_changes
+# (src/history_export.py), one row per export directory. Retention keeps
+# the 'decided' changes above the lowest 'decisions:' mark.
+CREATE_EXPORT_MARKS_SQL = """
+CREATE TABLE IF NOT EXISTS export_marks (
+  name TEXT PRIMARY KEY,
+  last_key INTEGER,
+  updated_at REAL
+)
+"""
+
+
+BUSY_TIMEOUT_S = 30
+
 
 def init_db(db_path: Optional[str] = None):
     path = db_path or DB_PATH
-    conn = sqlite3.connect(path, check_same_thread=False)
+    # Several workers (ingest pool, API) share one file: wait on locks instead
+    # of failing, and use WAL so readers do not block the writer.
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_S)
     cur = conn.cursor()
+    if path != ':memory:':
+        # Only takes effect on a new file; lets src/retention.py shrink it without a full VACUUM
+        cur.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
     cur.execute(CREATE_CHECKPOINT_SQL)
+    _migrate_checkpoints(cur)
+    cur.execute(CREATE_CHECKPOINT_REVIEW_SQL)
+    cur.execute(CREATE_CHECKPOINT_VENDOR_SQL)
     cur.execute(CREATE_AUDIT_SQL)
+    cur.execute(CREATE_AUDIT_INVOICE_STAGE_SQL)
+    cur.execute(CREATE_QUARANTINE_SQL)
+    cur.execute(CREATE_INVOICE_INDEX_SQL)
+    cur.execute(CREATE_INVOICE_INDEX_ATTACHMENT_SQL)
+    _migrate_invoice_index(cur)
+    cur.execute(CREATE_INVOICE_INDEX_RAW_SQL)
+    cur.execute(CREATE_JOBS_SQL)
+    cur.execute(CREATE_JOBS_READY_SQL)
+    cur.execute(CREATE_JOBS_CHECKPOINT_SQL)
+    cur.execute(CREATE_CHECKPOINT_CHANGES_SQL)
+    cur.execute(CREATE_EXPORT_MARKS_SQL)
     conn.commit()
+    _create_rollups(conn)
     return conn
 
 
+def _migrate_checkpoints(cur):
+    have = {r[1] for r in cur.execute("PRAGMA table_info(checkpoints)").fetchall()}
+    missing = [(name, kind) for name, kind in CHECKPOINT_REVIEW_COLUMNS if name not in have]
+    for name, kind in missing:
+        try:
+            cur.execute(f"ALTER TABLE checkpoints ADD COLUMN {name} {kind}")
+        except sqlite3.OperationalError as e:
+            # Another connection migrated the same file first
+            if 'duplicate column' not in str(e):
+                raise
+    if missing:
+        # Checkpoints saved before the columns existed
+        rows = cur.execute("SELECT id, state_blob, created_at FROM checkpoints").fetchall()
+        cur.executemany(
+            "UPDATE checkpoints SET vendor_name=?, vendor_key=?, amount=?, due_date=?, match_score=?, risk_score=?, priority=? "
+            "WHERE id=?",
+            [(*review_fields(json.loads(r[1] or '{}'), r[2] or time.time()).values(), r[0]) for r in rows],
+        )
+
+
+def _migrate_invoice_index(cur):
+    have = {r[1] for r in cur.execute("PRAGMA table_info(invoice_index)").fetchall()}
+    if 'status' not in have:
+        try:
+            # Entries indexed before the column existed belong to finished runs
+            cur.execute("ALTER TABLE invoice_index ADD COLUMN status TEXT DEFAULT 'done'")
+        except sqlite3.OperationalError as e:
+            if 'duplicate column' not in str(e):
+                raise
+
+
+# Day 0 of the stored priority (any fixed day works; see review_fields)
+PRIORITY_EPOCH = datetime.date(2000, 1, 1).toordinal()
+
+
+def _number(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def review_fields(state: dict, now: float) -> dict:
+    """Review-queue column values for a checkpoint of `state` saved at `now` (in CHECKPOINT_REVIEW_COLUMNS order).
+
+    priority ranks by SLA and amount like jobs.invoice_priority (each 10x in
+    amount is worth 10 days of due date) but counts days from a fixed epoch
+    instead of today, so priorities stored on different days compare
+    correctly. Without a due date an invoice counts as due 30 days after
+    the save.
+    """
+    inv = state.get('invoice') or {}
+    amount = _number(inv.get('amount'))
+    try:
+        due = datetime.date.fromisoformat(str(inv.get('due_date')))
+    except ValueError:
+        due = None
+    due_day = due.toordinal() if due else datetime.date.fromtimestamp(now).toordinal() + 30
+    vendor = inv.get('vendor_name')
+    return {
+        'vendor_name': vendor,
+        'vendor_key': normalize_vendor(vendor) if vendor else None,
+        'amount': amount,
+        'due_date': due.isoformat() if due else None,
+        'match_score': _number(state.get('match_score')),
+        'risk_score': _number((state.get('flags') or {}).get('risk_score')),
+        'priority': round(10 * math.log10(1 + max(amount or 0.0, 0.0)) - (due_day - PRIORITY_EPOCH), 3),
+    }
+
+
 def save_checkpoint(conn, checkpoint_id: str, invoice_id: str, state: dict):
     now = time.time()
     cur = conn.cursor()
     cur.execute(
-        "INSERT OR REPLACE INTO checkpoints (id, invoice_id, state_blob, status, created_at, updated_at) VALUES (?,?,?,?,?,?)",
-        (checkpoint_id, invoice_id, json.dumps(state), 'PAUSED', now, now),
+        "INSERT OR REPLACE INTO checkpoints (id, invoice_id, state_blob, status, created_at, updated_at, "
+        "vendor_name, vendor_key, amount, due_date, match_score, risk_score, priority) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+        (checkpoint_id, invoice_id, json.dumps(state), 'PAUSED', now, now, *review_fields(state, now).values()),
     )
+    cur.execute("INSERT INTO checkpoint_changes (checkpoint_id, invoice_id, event, ts) VALUES (?,?,?,?)",
+                (checkpoint_id, invoice_id, 'added', now))
     conn.commit()
+    notify_change_listeners()
+
 
+PENDING_COLUMNS = "id, invoice_id, state_blob, created_at, vendor_name, amount, due_date, match_score, risk_score, priority"
 
-def list_pending(conn):
+
+def pending_item(r) -> dict:
+    """list_pending entry from a PENDING_COLUMNS row."""
+    return {
+        'checkpoint_id': r[0],
+        'invoice_id': r[1],
+        'state': json.loads(r[2]),
+        'created_at': r[3],
+        'vendor_name': r[4],
+        'amount': r[5],
+        'due_date': r[6],
+        'match_score': r[7],
+        'risk_score': r[8],
+        'priority': r[9],
+    }
+
+
+def pending_filter(vendor: Optional[str] = None, min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                   mark: str = '?'):
+    """(SQL conditions, params) for the list_pending filters; `mark` is the driver's placeholder."""
+    sql, params = '', []
+    if vendor:
+        sql += f" AND vendor_key={mark}"
+        params.append(normalize_vendor(vendor))
+    if min_amount is not None:
+        sql += f" AND amount>={mark}"
+        params.append(min_amount)
+    if max_amount is not None:
+        sql += f" AND amount<{mark}"
+        params.append(max_amount)
+    return sql, params
+
+
+def list_pending(conn, vendor: Optional[str] = None, min_amount: Optional[float] = None,
+                 max_amount: Optional[float] = None, limit: Optional[int] = None):
+    """PAUSED checkpoints, most urgent (highest priority) first.
+
+    `vendor` matches any spelling with the same normalize_vendor() key;
+    `min_amount` <= amount < `max_amount` selects an amount band. The
+    order comes from idx_checkpoints_review (idx_checkpoints_vendor with a
+    vendor), so limit=1 reads one index entry.
+    """
+    where, params = pending_filter(vendor, min_amount, max_amount)
+    sql = f"SELECT {PENDING_COLUMNS} FROM checkpoints WHERE status='PAUSED'{where} ORDER BY priority DESC, created_at"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
     cur = conn.cursor()
-    cur.execute("SELECT id, invoice_id, state_blob, created_at FROM checkpoints WHERE status='PAUSED'")
-    rows = cur.fetchall()
-    result = []
-    for r in rows:
-        result.append({
-            'checkpoint_id': r[0],
-            'invoice_id': r[1],
-            'state': json.loads(r[2]),
-            'created_at': r[3]
-        })
-    return result
+    cur.execute(sql, params)
+    return [pending_item(r) for r in cur.fetchall()]
+
+
+def _record_change(cur, checkpoint_id: str, event: str, now: float):
+    # Only for checkpoints that exist; the invoice id comes along for the UI
+    cur.execute("INSERT INTO checkpoint_changes (checkpoint_id, invoice_id, event, ts) "
+                "SELECT id, invoice_id, ?, ? FROM checkpoints WHERE id=?", (event, now, checkpoint_id))
+
+
+def list_checkpoint_changes(conn, since: int = 0, limit: int = 500):
+    """Checkpoint changes with seq > `since`, oldest first."""
+    cur = conn.cursor()
+    cur.execute("SELECT seq, checkpoint_id, invoice_id, event, ts FROM checkpoint_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                (since, limit))
+    return [{'seq': r[0], 'checkpoint_id': r[1], 'invoice_id': r[2], 'event': r[3], 'ts': r[4]} for r in cur.fetchall()]
+
+
+def last_checkpoint_change(conn) -> int:
+    """Seq of the latest checkpoint change (0 if none); changes whenever the pending list may have."""
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(seq) FROM checkpoint_changes")
+    return cur.fetchone()[0] or 0
+
+
+# In-process subscribers (the review API change feeds) are called without
+# arguments after a checkpoint change commits. Changes made by other
+# processes only show up by reading checkpoint_changes.
+_change_listeners = []
+
+
+def add_change_listener(fn):
+    _change_listeners.append(fn)
+
+
+def remove_change_listener(fn):
+    if fn in _change_listeners:
+        _change_listeners.remove(fn)
+
+
+def notify_change_listeners():
+    for fn in list(_change_listeners):
+        try:
+            fn()
+        except Exception:
+            pass
 
 
 def save_decision(conn, checkpoint_id: str, reviewer_id: str, decision: str):
     now = time.time()
     cur = conn.cursor()
+    cur.execute("SELECT created_at FROM checkpoints WHERE id=? AND status='PAUSED'", (checkpoint_id,))
+    paused = cur.fetchone()
+    if paused:
+        # Re-decisions overwrite the checkpoint but are not counted twice
+        _rollup_decisions(cur, [(reviewer_id, decision, paused[0])], now)
     cur.execute(
         "UPDATE checkpoints SET reviewer_id=?, decision=?, status=?, updated_at=? WHERE id=?",
         (reviewer_id, decision, 'DECIDED', now, checkpoint_id),
     )
+    _record_change(cur, checkpoint_id, 'decided', now)
     conn.commit()
+    notify_change_listeners()
+    # A queue job parked at this checkpoint can now be resumed by any worker
+    wake_parked_job(conn, checkpoint_id)
     # Append decision to a local CSV file for easy auditing/streaming
     try:
         # Fetch invoice_id and timestamps for this checkpoint
@@ -84,51 +428,596 @@ def save_decision(conn, checkpoint_id: str, reviewer_id: str, decision: str):
         invoice_id = row[0] if row else ''
         created_at = row[1] if row else None
         updated_at = row[2] if row else now
-
-        logs_dir = os.path.join(os.getcwd(), 'logs')
-        os.makedirs(logs_dir, exist_ok=True)
-        csv_path = os.path.join(logs_dir, 'decisions.csv')
-        write_header = not os.path.exists(csv_path)
-        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if write_header:
-                writer.writerow(['checkpoint_id', 'invoice_id', 'decision', 'reviewer_id', 'created_at_unix', 'updated_at_unix'])
-            writer.writerow([checkpoint_id, invoice_id, decision, reviewer_id, created_at, updated_at])
+        _append_decision_log([[checkpoint_id, invoice_id, decision, reviewer_id, created_at, updated_at]])
     except Exception:
         # Non-fatal: do not raise errors from logging/CSV writes
         pass
     # Trigger an async export of history to artifacts/ for external consumption.
+    _trigger_history_export()
+
+
+def _append_decision_log(rows):
+    logs_dir = os.path.join(os.getcwd(), 'logs')
+    os.makedirs(logs_dir, exist_ok=True)
+    csv_path = os.path.join(logs_dir, 'decisions.csv')
+    write_header = not os.path.exists(csv_path)
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(['checkpoint_id', 'invoice_id', 'decision', 'reviewer_id', 'created_at_unix', 'updated_at_unix'])
+        writer.writerows(rows)
+
+
+DECISIONS = ('ACCEPT', 'REJECT')
+
+
+def split_decisions(decisions, lookup):
+    """Check a decision batch against current checkpoints; shared by the store backends.
+
+    `decisions` is [(checkpoint_id, reviewer_id, decision), ...] and
+    `lookup[checkpoint_id]` is (invoice_id, status, created_at). Returns
+    (results, accepted): one result dict per input, in order, and the
+    (checkpoint_id, reviewer_id, decision, invoice_id, created_at) to apply.
+    Only PAUSED checkpoints are decided; a checkpoint named twice is
+    decided by its first entry.
+    """
+    results, accepted, taken = [], [], set()
+    for checkpoint_id, reviewer_id, decision in decisions:
+        decision = (decision or '').upper()
+        row = lookup.get(checkpoint_id) if checkpoint_id else None
+        if not checkpoint_id or decision not in DECISIONS:
+            status = 'invalid'
+        elif row is None:
+            status = 'not_found'
+        elif row[1] != 'PAUSED' or checkpoint_id in taken:
+            status = 'already_decided'
+        else:
+            status = 'decided'
+            taken.add(checkpoint_id)
+            accepted.append((checkpoint_id, reviewer_id, decision, row[0], row[2]))
+        results.append({'checkpoint_id': checkpoint_id, 'status': status,
+                        'decision': decision if status == 'decided' else None, 'resume_job': None})
+    return results, accepted
+
+
+def _select_in(cur, sql, ids, chunk=500):
+    """Run `sql` (with one `{marks}` placeholder list) over `ids` in chunks below SQLite's variable limit."""
+    rows = []
+    for i in range(0, len(ids), chunk):
+        part = ids[i:i + chunk]
+        cur.execute(sql.format(marks=','.join('?' * len(part))), part)
+        rows.extend(cur.fetchall())
+    return rows
+
+
+def save_decisions(conn, decisions, complete: bool = True):
+    """Apply a batch of decisions in one transaction; one result per input (see split_decisions).
+
+    With `complete` the checkpoints end COMPLETED, as after save_decision +
+    mark_completed in the review APIs. Jobs parked at the decided
+    checkpoints are requeued in the same transaction (their ids are in
+    `resume_job`), and the CSV log and history export run once per batch.
+    """
+    decisions = list(decisions)
+    now = time.time()
+    cur = conn.cursor()
+    # IMMEDIATE: nobody can decide these checkpoints between the check and the update
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        ids = list({d[0] for d in decisions if d[0]})
+        found = _select_in(cur, "SELECT id, invoice_id, status, created_at FROM checkpoints WHERE id IN ({marks})", ids)
+        results, accepted = split_decisions(decisions, {r[0]: r[1:] for r in found})
+        cur.executemany(
+            "UPDATE checkpoints SET reviewer_id=?, decision=?, status=?, updated_at=? WHERE id=?",
+            [(rev, dec, 'COMPLETED' if complete else 'DECIDED', now, cp) for cp, rev, dec, _, _ in accepted],
+        )
+        events = ('decided', 'completed') if complete else ('decided',)
+        cur.executemany(
+            "INSERT INTO checkpoint_changes (checkpoint_id, invoice_id, event, ts) VALUES (?,?,?,?)",
+            [(cp, invoice_id, event, now) for cp, _, _, invoice_id, _ in accepted for event in events],
+        )
+        _rollup_decisions(cur, [(rev, dec, created_at) for _, rev, dec, _, created_at in accepted], now)
+        parked = _select_in(cur, "SELECT id, checkpoint_id FROM jobs WHERE status='waiting' AND checkpoint_id IN ({marks})",
+                            [a[0] for a in accepted])
+        cur.executemany(
+            "UPDATE jobs SET status='queued', kind='resume', attempts=0, available_at=?, updated_at=? WHERE id=?",
+            [(now, now, job_id) for job_id, _ in parked],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    woken = {cp: job_id for job_id, cp in parked}
+    for result in results:
+        if result['status'] == 'decided':
+            result['resume_job'] = woken.get(result['checkpoint_id'])
+    if accepted:
+        notify_change_listeners()
+        try:
+            _append_decision_log([[cp, invoice_id, dec, rev, created_at, now] for cp, rev, dec, invoice_id, created_at in accepted])
+        except Exception:
+            pass
+        _trigger_history_export()
+    return results
+
+
+# One exporter process at a time: a burst of decisions (e.g. through the
+# review API) costs one extra export run instead of one process per decision.
+_export_lock = threading.Lock()
+_export_proc = None
+_export_again = False
+
+
+def _spawn_exporter(script_path: str):
+    import subprocess
+    if sys.platform == 'win32':
+        # On Windows, hide the console window
+        return subprocess.Popen([sys.executable, script_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=0x08000000)
+    return subprocess.Popen([sys.executable, script_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _export_until_idle(proc, script_path: str):
+    global _export_proc, _export_again
+    while True:
+        proc.wait()
+        with _export_lock:
+            if not _export_again:
+                _export_proc = None
+                return
+            _export_again = False
+            try:
+                proc = _export_proc = _spawn_exporter(script_path)
+            except Exception:
+                _export_proc = None
+                return
+
+
+def _trigger_history_export():
+    """Run scripts/export_history.py in the background (fire-and-forget, never raises).
+
+    While an export is running, further calls only ask for one more run
+    after it, which then picks up every decision made in the meantime.
+    """
+    global _export_proc, _export_again
     try:
         script_path = os.path.join(os.getcwd(), 'scripts', 'export_history.py')
-        if os.path.exists(script_path):
-            # Fire-and-forget: run exporter in background to avoid blocking runner.
-            if sys.platform == 'win32':
-                # On Windows, hide the console window
-                subprocess.Popen([sys.executable, script_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=0x08000000)
-            else:
-                subprocess.Popen([sys.executable, script_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not os.path.exists(script_path):
+            return
+        with _export_lock:
+            if _export_proc is not None:
+                _export_again = True
+                return
+            _export_proc = _spawn_exporter(script_path)
+        threading.Thread(target=_export_until_idle, args=(_export_proc, script_path), daemon=True).start()
     except Exception:
         pass
 
 
 def fetch_checkpoint(conn, checkpoint_id: str):
     cur = conn.cursor()
-    cur.execute("SELECT id, invoice_id, state_blob, status FROM checkpoints WHERE id=?", (checkpoint_id,))
+    cur.execute("SELECT id, invoice_id, state_blob, status, decision, reviewer_id FROM checkpoints WHERE id=?", (checkpoint_id,))
     r = cur.fetchone()
     if not r:
         return None
-    return { 'id': r[0], 'invoice_id': r[1], 'state': json.loads(r[2]), 'status': r[3] }
+    return { 'id': r[0], 'invoice_id': r[1], 'state': json.loads(r[2]), 'status': r[3], 'decision': r[4], 'reviewer_id': r[5] }
 
 
 def mark_completed(conn, checkpoint_id: str):
     now = time.time()
     cur = conn.cursor()
     cur.execute("UPDATE checkpoints SET status=? , updated_at=? WHERE id=?", ('COMPLETED', now, checkpoint_id))
+    _record_change(cur, checkpoint_id, 'completed', now)
     conn.commit()
+    notify_change_listeners()
 
 
 def append_audit(conn, invoice_id: str, stage: str, message: str):
     now = time.time()
     cur = conn.cursor()
+    # Nodes log several rows per stage; only the first counts as an invoice
+    cur.execute("SELECT 1 FROM audit_log WHERE invoice_id=? AND stage=? LIMIT 1", (invoice_id, stage))
+    first = cur.fetchone() is None
     cur.execute("INSERT INTO audit_log (invoice_id, stage, message, ts) VALUES (?,?,?,?)", (invoice_id, stage, message, now))
+    cur.execute(
+        "INSERT INTO rollup_stage_hourly (hour, stage, events, invoices) VALUES (?,?,1,?) "
+        "ON CONFLICT (hour, stage) DO UPDATE SET events=events+1, invoices=invoices+excluded.invoices",
+        (hour_of(now), stage, int(first)),
+    )
     conn.commit()
+
+
+# ============ Reporting rollups ============
+
+def hour_of(ts: float) -> int:
+    """Start of the UTC hour containing `ts` (epoch seconds)."""
+    return int(ts // 3600) * 3600
+
+
+# Turnaround histogram: 4 buckets per doubling of seconds, so quantiles
+# read from it are within ~10% of the exact value
+TURNAROUND_BUCKETS_PER_DOUBLING = 4
+
+
+def turnaround_bucket(seconds: float) -> int:
+    return int(TURNAROUND_BUCKETS_PER_DOUBLING * math.log2(1 + max(seconds, 0.0)))
+
+
+def _bucket_midpoint(bucket: int) -> float:
+    lo = 2 ** (bucket / TURNAROUND_BUCKETS_PER_DOUBLING) - 1
+    hi = 2 ** ((bucket + 1) / TURNAROUND_BUCKETS_PER_DOUBLING) - 1
+    return (lo + hi) / 2
+
+
+def bucket_quantile(buckets, q: float) -> Optional[float]:
+    """Estimated q-quantile (seconds) from [(bucket, count), ...] sorted by bucket."""
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    seen = 0
+    for bucket, count in buckets:
+        seen += count
+        if seen >= q * total:
+            return round(_bucket_midpoint(bucket), 3)
+    return round(_bucket_midpoint(buckets[-1][0]), 3)
+
+
+def decision_rollup_rows(decided, now: float):
+    """(reviewer rows, bucket rows) for [(reviewer_id, decision, created_at), ...] decided at `now`."""
+    reviewers, buckets = [], []
+    for reviewer_id, decision, created_at in decided:
+        turnaround = max(now - (created_at or now), 0.0)
+        decision = (decision or '').upper()
+        reviewers.append((reviewer_id or '', int(decision == 'ACCEPT'), int(decision == 'REJECT'), turnaround, turnaround))
+        buckets.append((turnaround_bucket(turnaround),))
+    return reviewers, buckets
+
+
+def _rollup_decisions(cur, decided, now: float):
+    reviewers, buckets = decision_rollup_rows(decided, now)
+    cur.executemany(
+        "INSERT INTO rollup_reviewer (reviewer_id, decisions, accepted, rejected, turnaround_sum, turnaround_max) "
+        "VALUES (?,1,?,?,?,?) ON CONFLICT (reviewer_id) DO UPDATE SET decisions=decisions+1, "
+        "accepted=accepted+excluded.accepted, rejected=rejected+excluded.rejected, "
+        "turnaround_sum=turnaround_sum+excluded.turnaround_sum, "
+        "turnaround_max=MAX(turnaround_max, excluded.turnaround_max)",
+        reviewers,
+    )
+    cur.executemany(
+        "INSERT INTO rollup_turnaround (bucket, decisions) VALUES (?,1) "
+        "ON CONFLICT (bucket) DO UPDATE SET decisions=decisions+1",
+        buckets,
+    )
+
+
+def record_match(conn, vendor_name: str, matched: bool, score: float):
+    """Count one two-way match outcome for the vendor's match-rate rollup."""
+    now = time.time()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO rollup_vendor_match (vendor_key, vendor_name, invoices, matched, score_sum, last_seen) "
+        "VALUES (?,?,1,?,?,?) ON CONFLICT (vendor_key) DO UPDATE SET invoices=invoices+1, "
+        "matched=matched+excluded.matched, score_sum=score_sum+excluded.score_sum, last_seen=excluded.last_seen, "
+        "vendor_name=excluded.vendor_name",
+        (normalize_vendor(vendor_name), vendor_name, int(bool(matched)), float(score or 0.0), now),
+    )
+    conn.commit()
+
+
+def format_stats(hours: int, stage_rows, vendor_rows, reviewer_rows, bucket_rows) -> dict:
+    """read_stats result from rollup rows; shared by the store backends."""
+    stages, totals = [], {}
+    for hour, stage, events, invoices in stage_rows:
+        stages.append({'hour': time.strftime('%Y-%m-%dT%H:00Z', time.gmtime(hour)), 'stage': stage,
+                       'events': events, 'invoices': invoices})
+        totals[stage] = totals.get(stage, 0) + invoices
+    buckets = [(b, n) for b, n in bucket_rows]
+    return {
+        'hours': hours,
+        'stages': stages,
+        'stage_invoices': totals,
+        'vendors': [{'vendor': name, 'vendor_key': key, 'invoices': n, 'matched': matched,
+                     'match_rate': round(matched / n, 4) if n else None,
+                     'avg_score': round(score_sum / n, 4) if n else None}
+                    for key, name, n, matched, score_sum in vendor_rows],
+        'reviewers': [{'reviewer_id': rid, 'decisions': n, 'accepted': acc, 'rejected': rej,
+                       'mean_turnaround_s': round(total / n, 3) if n else None, 'max_turnaround_s': round(worst, 3)}
+                      for rid, n, acc, rej, total, worst in reviewer_rows],
+        'turnaround': {'decisions': sum(n for _, n in buckets), 'p50_s': bucket_quantile(buckets, 0.5),
+                       'p90_s': bucket_quantile(buckets, 0.9)},
+    }
+
+
+def read_stats(conn, hours: int = 24, vendors: int = 20) -> dict:
+    """Throughput per hour and stage for the last `hours`, top vendors by volume, reviewers and turnaround.
+
+    Reads only the rollup tables: the cost depends on `hours`, the number of
+    stages, vendors and reviewers, not on how much history is stored.
+    """
+    cur = conn.cursor()
+    since = hour_of(time.time()) - (hours - 1) * 3600
+    cur.execute("SELECT hour, stage, events, invoices FROM rollup_stage_hourly WHERE hour>=? ORDER BY hour, stage", (since,))
+    stage_rows = cur.fetchall()
+    cur.execute("SELECT vendor_key, vendor_name, invoices, matched, score_sum FROM rollup_vendor_match "
+                "ORDER BY invoices DESC, vendor_key LIMIT ?", (vendors,))
+    vendor_rows = cur.fetchall()
+    cur.execute("SELECT reviewer_id, decisions, accepted, rejected, turnaround_sum, turnaround_max FROM rollup_reviewer "
+                "ORDER BY decisions DESC, reviewer_id")
+    reviewer_rows = cur.fetchall()
+    cur.execute("SELECT bucket, decisions FROM rollup_turnaround ORDER BY bucket")
+    return format_stats(hours, stage_rows, vendor_rows, reviewer_rows, cur.fetchall())
+
+
+def _create_rollups(conn):
+    cur = conn.cursor()
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='rollup_stage_hourly'").fetchone():
+        return
+    # IMMEDIATE so two processes opening an old database backfill only once
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        if not cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='rollup_stage_hourly'").fetchone():
+            for stmt in CREATE_ROLLUP_SQL:
+                cur.execute(stmt)
+            _backfill_rollups(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _backfill_rollups(cur):
+    """One pass over existing audit rows and decided checkpoints. Vendor match rates start empty:
+    the audit log does not record vendors."""
+    cur.execute("SELECT ts, invoice_id, stage FROM audit_log ORDER BY id")
+    hourly, seen = {}, set()
+    for ts, invoice_id, stage in cur.fetchall():
+        key = (hour_of(ts or 0), stage)
+        events, invoices = hourly.get(key, (0, 0))
+        first = (invoice_id, stage) not in seen
+        seen.add((invoice_id, stage))
+        hourly[key] = (events + 1, invoices + int(first))
+    cur.executemany("INSERT INTO rollup_stage_hourly (hour, stage, events, invoices) VALUES (?,?,?,?)",
+                    [(hour, stage, events, invoices) for (hour, stage), (events, invoices) in hourly.items()])
+    cur.execute("SELECT reviewer_id, decision, created_at, updated_at FROM checkpoints WHERE decision IS NOT NULL")
+    for reviewer_id, decision, created_at, decided_at in cur.fetchall():
+        _rollup_decisions(cur, [(reviewer_id, decision, created_at)], decided_at or created_at or 0)
+
+
+def quarantine_invoices(conn, rejected, source: str = 'intake'):
+    """Store invalid invoices in one transaction; `rejected` is [(invoice, [error str, ...]), ...]."""
+    now = time.time()
+    rows = []
+    for inv, errors in rejected:
+        invoice_id = inv.get('invoice_id') if isinstance(inv, dict) else None
+        rows.append((str(invoice_id or ''), json.dumps(inv, default=str), json.dumps([str(e) for e in errors]), source, now))
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO quarantine (invoice_id, payload, errors, source, ts) VALUES (?,?,?,?,?)", rows)
+    conn.commit()
+
+
+def list_quarantine(conn, limit: int = 100):
+    cur = conn.cursor()
+    cur.execute("SELECT id, invoice_id, payload, errors, source, ts FROM quarantine ORDER BY id DESC LIMIT ?", (limit,))
+    return [{ 'id': r[0], 'invoice_id': r[1], 'payload': json.loads(r[2]), 'errors': json.loads(r[3]), 'source': r[4], 'ts': r[5] }
+            for r in cur.fetchall()]
+
+
+def database_path(conn) -> str:
+    """Filename of the main database behind `conn` ('' for in-memory)."""
+    row = conn.execute("PRAGMA database_list").fetchone()
+    return row[2] if row else ''
+
+
+def register_invoice(conn, dedup_key: str, invoice_id: str, raw_id: str, attachment_sha256: Optional[str] = None):
+    """Add an invoice to the dedup index as 'pending'; returns the existing entry if it is already there, else None."""
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT OR IGNORE INTO invoice_index (dedup_key, invoice_id, raw_id, attachment_sha256, first_seen, status) "
+        "VALUES (?,?,?,?,?,'pending')",
+        (dedup_key, invoice_id, raw_id, attachment_sha256, time.time()),
+    )
+    conn.commit()
+    if cur.rowcount == 1:
+        return None
+    return find_indexed_invoice(conn, dedup_key, attachment_sha256)
+
+
+def find_indexed_invoice(conn, dedup_key: str, attachment_sha256: Optional[str] = None):
+    cur = conn.cursor()
+    cur.execute("SELECT dedup_key, invoice_id, raw_id, attachment_sha256, first_seen, status FROM invoice_index WHERE dedup_key=?", (dedup_key,))
+    r = cur.fetchone()
+    if not r and attachment_sha256:
+        cur.execute("SELECT dedup_key, invoice_id, raw_id, attachment_sha256, first_seen, status FROM invoice_index WHERE attachment_sha256=?", (attachment_sha256,))
+        r = cur.fetchone()
+    if not r:
+        return None
+    return { 'dedup_key': r[0], 'invoice_id': r[1], 'raw_id': r[2], 'attachment_sha256': r[3], 'first_seen': r[4], 'status': r[5] }
+
+
+def claim_invoice(conn, dedup_key: str, raw_id: str) -> bool:
+    """Hand a still-pending index entry over to run `raw_id` (a retry of a run that never finished)."""
+    cur = conn.cursor()
+    cur.execute("UPDATE invoice_index SET raw_id=? WHERE dedup_key=? AND status='pending'", (raw_id, dedup_key))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def confirm_invoice(conn, raw_id: str) -> bool:
+    """Mark the index entry of run `raw_id` done: from now on the invoice is a duplicate for every other run."""
+    cur = conn.cursor()
+    cur.execute("UPDATE invoice_index SET status='done' WHERE raw_id=? AND status='pending'", (raw_id,))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def save_export_mark(conn, name: str, last_key: int):
+    """Record that the export `name` has everything up to `last_key`."""
+    conn.execute(
+        "INSERT INTO export_marks (name, last_key, updated_at) VALUES (?,?,?) "
+        "ON CONFLICT(name) DO UPDATE SET last_key=excluded.last_key, updated_at=excluded.updated_at",
+        (name, last_key, time.time()),
+    )
+    conn.commit()
+
+
+def iter_invoice_index_keys(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT dedup_key, attachment_sha256 FROM invoice_index")
+    while True:
+        rows = cur.fetchmany(10000)
+        if not rows:
+            return
+        yield from rows
+
+
+def enqueue_job(conn, queue: str, kind: str, payload, priority: float = 0, max_attempts: int = 3, delay: float = 0) -> int:
+    """Add a job; higher `priority` is claimed first. Returns the job id."""
+    now = time.time()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO jobs (queue, kind, payload, priority, status, attempts, max_attempts, available_at, created_at, updated_at) "
+        "VALUES (?,?,?,?,?,?,?,?,?,?)",
+        (queue, kind, json.dumps(payload, default=str), priority, 'queued', 0, max_attempts, now + delay, now, now),
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def job_from_row(r):
+    return { 'id': r[0], 'queue': r[1], 'kind': r[2], 'payload': json.loads(r[3]), 'priority': r[4], 'status': r[5],
+             'attempts': r[6], 'max_attempts': r[7], 'lease_owner': r[8], 'lease_expires': r[9], 'checkpoint_id': r[10],
+             'result': json.loads(r[11]) if r[11] else None, 'error': r[12] }
+
+
+JOB_COLUMNS = "id, queue, kind, payload, priority, status, attempts, max_attempts, lease_owner, lease_expires, checkpoint_id, result, error"
+
+
+def claim_job(conn, queues, worker_id: str, lease_s: float = 60):
+    """Atomically lease the highest-priority ready job from `queues`; None if there is none.
+
+    A job whose lease expired (its worker died) is ready again, unless it
+    has used up max_attempts, in which case it is marked failed.
+    """
+    queues = [queues] if isinstance(queues, str) else list(queues)
+    marks = ','.join('?' * len(queues))
+    now = time.time()
+    cur = conn.cursor()
+    # IMMEDIATE takes the write lock up front, so two workers cannot pick the same row
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute(
+            f"UPDATE jobs SET status='failed', error='lease expired', lease_owner=NULL, updated_at=? "
+            f"WHERE queue IN ({marks}) AND status='leased' AND lease_expires<? AND attempts>=max_attempts",
+            (now, *queues, now),
+        )
+        cur.execute(
+            f"SELECT id FROM jobs WHERE queue IN ({marks}) AND "
+            f"((status='queued' AND available_at<=?) OR (status='leased' AND lease_expires<?)) "
+            f"ORDER BY priority DESC, available_at, id LIMIT 1",
+            (*queues, now, now),
+        )
+        row = cur.fetchone()
+        if row:
+            cur.execute(
+                "UPDATE jobs SET status='leased', lease_owner=?, lease_expires=?, attempts=attempts+1, updated_at=? WHERE id=?",
+                (worker_id, now + lease_s, now, row[0]),
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return fetch_job(conn, row[0]) if row else None
+
+
+def fetch_job(conn, job_id: int):
+    cur = conn.cursor()
+    cur.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id=?", (job_id,))
+    r = cur.fetchone()
+    return job_from_row(r) if r else None
+
+
+def _update_leased(conn, job_id: int, worker_id: str, assignments: str, params) -> bool:
+    cur = conn.cursor()
+    cur.execute(
+        f"UPDATE jobs SET {assignments}, updated_at=? WHERE id=? AND status='leased' AND lease_owner=?",
+        (*params, time.time(), job_id, worker_id),
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def extend_lease(conn, job_id: int, worker_id: str, lease_s: float = 60) -> bool:
+    """Push the visibility timeout out; False if the lease was lost to another worker."""
+    return _update_leased(conn, job_id, worker_id, "lease_expires=?", (time.time() + lease_s,))
+
+
+def ack_job(conn, job_id: int, worker_id: str, result=None) -> bool:
+    return _update_leased(conn, job_id, worker_id, "status='done', lease_owner=NULL, lease_expires=NULL, result=?",
+                          (json.dumps(result, default=str),))
+
+
+def fail_job(conn, job_id: int, worker_id: str, error: str, retry_delay: float = 5) -> Optional[str]:
+    """Release a failed attempt: back to 'queued' after `retry_delay`, or 'failed' once out of attempts."""
+    job = fetch_job(conn, job_id)
+    if not job or job['status'] != 'leased' or job['lease_owner'] != worker_id:
+        return None
+    status = 'failed' if job['attempts'] >= job['max_attempts'] else 'queued'
+    ok = _update_leased(conn, job_id, worker_id, "status=?, lease_owner=NULL, lease_expires=NULL, error=?, available_at=?",
+                        (status, error, time.time() + retry_delay))
+    return status if ok else None
+
+
+def park_job(conn, job_id: int, worker_id: str, checkpoint_id: str, payload, queue: str) -> bool:
+    """Move a leased job to `queue`, waiting until the HITL decision for `checkpoint_id` is saved.
+
+    The decision may already be in: the run saved its checkpoint before
+    returning, and wake_parked_job found no waiting row then. The status is
+    read in the same write transaction as the park, so such a job goes
+    straight back to 'queued' as a 'resume' job.
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("SELECT status FROM checkpoints WHERE id=?", (checkpoint_id,))
+        row = cur.fetchone()
+        now = time.time()
+        if row and row[0] in ('DECIDED', 'COMPLETED'):
+            assignments = "status='queued', kind='resume', attempts=0, available_at=?"
+            params = (now,)
+        else:
+            assignments, params = "status='waiting'", ()
+        cur.execute(
+            f"UPDATE jobs SET {assignments}, lease_owner=NULL, lease_expires=NULL, checkpoint_id=?, payload=?, queue=?, "
+            f"updated_at=? WHERE id=? AND status='leased' AND lease_owner=?",
+            (*params, checkpoint_id, json.dumps(payload, default=str), queue, now, job_id, worker_id),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return cur.rowcount == 1
+
+
+def wake_parked_job(conn, checkpoint_id: str) -> Optional[int]:
+    """Requeue the job waiting on `checkpoint_id` as a 'resume' job; returns its id."""
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM jobs WHERE checkpoint_id=? AND status='waiting'", (checkpoint_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    now = time.time()
+    cur.execute(
+        "UPDATE jobs SET status='queued', kind='resume', attempts=0, available_at=?, updated_at=? "
+        "WHERE id=? AND status='waiting'",
+        (now, now, row[0]),
+    )
+    conn.commit()
+    return row[0] if cur.rowcount == 1 else None
+
+
+def job_counts(conn, queue: Optional[str] = None) -> dict:
+    cur = conn.cursor()
+    if queue:
+        cur.execute("SELECT status, COUNT(*) FROM jobs WHERE queue=? GROUP BY status", (queue,))
+    else:
+        cur.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+    return dict(cur.fetchall())
@@ -0,0 +1,149 @@
+"""
+Duplicate invoice detection for INTAKE.
+
+Each invoice gets a dedup key over (normalized vendor, invoice_id, amount,
+invoice_date) and, when its first attachment is a readable file, a SHA-256
+of the attachment. Both live in the `invoice_index` table (primary key /
+unique index), so the authoritative check is an O(1) index probe.
+
+A per-database Bloom filter sits in front of it: a negative answer means
+the invoice is new and goes straight to the insert; only "maybe seen"
+answers pay for a SELECT first. The filter is warmed from the table on
+first use and never produces false negatives for keys it has seen; keys
+added by other processes are still caught by the insert's unique
+constraint.
+
+Entries are registered 'pending' under the run's raw_id and only become
+'done' once that run posts to the ERP or returns (completed, rejected or
+parked for review); see confirm_invoice in nodes.PostingNode and the
+runner. A run that fails or crashes after INTAKE leaves its entry
+pending, so a retry (JobWorker, ingest replay, watcher requeue) takes the
+entry over instead of being reported as a duplicate of itself.
+"""
+import hashlib
+import math
+import threading
+
+from src import metrics
+from src.store import as_store
+from src.vendors import normalize_vendor
+
+DEFAULT_CAPACITY = 100_000  # ~120 KB at 1% false positives
+
+
+def dedup_key(inv: dict) -> str:
+    try:
+        amount = f"{float(inv.get('amount')):.2f}"
+    except (TypeError, ValueError):
+        amount = str(inv.get('amount'))
+    parts = (normalize_vendor(inv.get('vendor_name')), str(inv.get('invoice_id', '')).strip().upper(),
+             amount, str(inv.get('invoice_date') or ''))
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def attachment_digest(path, chunk_size: int = 1 << 20):
+    """SHA-256 of the attachment file, or None when it is not a readable file."""
+    if not isinstance(path, str) or not path:
+        return None
+    h = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter (double hashing over one blake2b digest)."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str):
+        with self._lock:
+            for pos in self._positions(key):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DedupIndex:
+    """Bloom filter + `invoice_index` table for one database file."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, error_rate: float = 0.01):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def _warm_up(self, store):
+        with self._lock:
+            if self._warm:
+                return
+            for key, digest in store.iter_invoice_index_keys():
+                self.bloom.add('k:' + key)
+                if digest:
+                    self.bloom.add('a:' + digest)
+            self._warm = True
+
+    @staticmethod
+    def _duplicate(store, existing: dict, raw_id: str):
+        """`existing` unless it is pending for a run that never finished and `raw_id` could take it over."""
+        if existing.get('status') == 'pending' and existing['raw_id'] != raw_id \
+                and store.claim_invoice(existing['dedup_key'], raw_id):
+            metrics.DEDUP_LOOKUPS.inc('retry')
+            return None
+        metrics.DEDUP_LOOKUPS.inc('duplicate')
+        return existing
+
+    def check_and_add(self, conn, inv: dict, raw_id: str):
+        """Register `inv` as pending for run `raw_id`; return the existing index entry if it is a duplicate, else None."""
+        store = as_store(conn)
+        if not self._warm:
+            self._warm_up(store)
+        key = dedup_key(inv)
+        attachments = inv.get('attachments') or []
+        digest = attachment_digest(attachments[0]) if attachments else None
+        if 'k:' + key in self.bloom or (digest and 'a:' + digest in self.bloom):
+            existing = store.find_indexed_invoice(key, digest)
+            if existing:
+                return self._duplicate(store, existing, raw_id)
+            metrics.DEDUP_LOOKUPS.inc('bloom_false_positive')
+        else:
+            metrics.DEDUP_LOOKUPS.inc('bloom_negative')
+        # The unique constraints still catch keys inserted by other processes
+        existing = store.register_invoice(key, inv.get('invoice_id'), raw_id, digest)
+        self.bloom.add('k:' + key)
+        if digest:
+            self.bloom.add('a:' + digest)
+        return self._duplicate(store, existing, raw_id) if existing else None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(conn, capacity: int = DEFAULT_CAPACITY) -> DedupIndex:
+    """Process-wide DedupIndex for the database behind `conn` (a Store or sqlite3 connection)."""
+    path = as_store(conn).key
+    index = _indexes.get(path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.setdefault(path, DedupIndex(capacity))
+    return index
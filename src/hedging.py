@@ -0,0 +1,205 @@
+"""
+Hedged requests for interchangeable Bigtool pools.
+
+The first tool in a pool is called as usual. If it has not answered within
+its observed p95 latency, the same request is sent to the next pool member
+and whichever answers first wins. A token budget caps how many extra
+requests hedging may add on top of the normal load.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List
+
+from src.bigtool import load_tools_config
+
+DEFAULTS = {
+    'enabled': False,
+    'capabilities': ['ocr', 'enrichment'],
+    'budget_ratio': 0.1,
+    'budget_burst': 5,
+    'default_delay_ms': 500,
+    'min_delay_ms': 10,
+    'min_samples': 20,
+    'window': 256,
+    'max_workers': 16,
+}
+
+
+class HedgeError(RuntimeError):
+    """Raised when every tool tried for a hedged call failed."""
+    def __init__(self, errors):
+        self.errors = errors
+        names = ', '.join(f"{tool}: {err!r}" for tool, err in errors)
+        super().__init__(f"All hedged tools failed ({names})")
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per tool."""
+    def __init__(self, window: int = 256, min_samples: int = 20, default_delay: float = 0.5):
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, tool: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(tool)
+            if samples is None:
+                samples = self._samples[tool] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def p95(self, tool: str) -> float:
+        """Observed p95 for `tool`, or `default_delay` until enough samples exist."""
+        with self._lock:
+            samples = list(self._samples.get(tool, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+class HedgeBudget:
+    """Token bucket: every primary request earns `ratio` tokens, every hedge spends one.
+
+    With ratio=0.1 hedging adds at most ~10% extra requests over time, plus
+    an initial `burst` so the first slow calls can still be hedged.
+    """
+    def __init__(self, ratio: float = 0.1, burst: float = 5):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = float(burst)
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Hedger:
+    """Runs one request against a pool, hedging onto later members when slow."""
+    def __init__(self, tracker: LatencyTracker = None, budget: HedgeBudget = None,
+                 min_delay: float = 0.01, executor: ThreadPoolExecutor = None):
+        self.tracker = tracker or LatencyTracker()
+        self.budget = budget or HedgeBudget()
+        self.min_delay = min_delay
+        self.executor = executor or _shared_executor()
+        self.stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'failovers': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str):
+        # call() runs concurrently from ingest, watcher and OCR page workers
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _timed(self, fn: Callable, tool: str):
+        start = time.perf_counter()
+        result = fn(tool)
+        # Only successes feed the tracker; fast failures would drag p95 down.
+        self.tracker.observe(tool, time.perf_counter() - start)
+        return result
+
+    def call(self, pool: List[str], fn: Callable):
+        """Call `fn(tool)` for pool members and return `(tool, result)` of the first success.
+
+        Losing requests are left to finish in the background; their results
+        are discarded but their latency still updates the tracker.
+        """
+        if not pool:
+            raise ValueError('Cannot hedge over an empty pool')
+        self._count('calls')
+        self.budget.earn()
+        pending = {}
+        errors = []
+        next_idx = 0
+        can_hedge = True
+
+        def submit():
+            nonlocal next_idx
+            tool = pool[next_idx]
+            next_idx += 1
+            pending[self.executor.submit(self._timed, fn, tool)] = tool
+            return tool
+
+        last_tool = submit()
+        while pending:
+            timeout = None
+            if can_hedge and next_idx < len(pool):
+                timeout = max(self.min_delay, self.tracker.p95(last_tool))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Outstanding request(s) exceeded their p95: hedge if the budget allows.
+                if self.budget.try_spend():
+                    self._count('hedges')
+                    last_tool = submit()
+                else:
+                    can_hedge = False
+                continue
+            for fut in done:
+                tool = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    errors.append((tool, e))
+                    continue
+                if tool != pool[0]:
+                    self._count('hedge_wins')
+                return tool, result
+            if not pending and next_idx < len(pool):
+                # Everything in flight failed: fail over without spending budget.
+                self._count('failovers')
+                last_tool = submit()
+        raise HedgeError(errors)
+
+
+_executor = None
+_hedgers = {}
+_lock = threading.Lock()
+
+
+def _shared_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=hedging_config()['max_workers'],
+                                           thread_name_prefix='hedge')
+        return _executor
+
+
+def hedging_config() -> dict:
+    """Hedging settings from the `hedging` section of tools.yaml, over DEFAULTS."""
+    cfg = dict(DEFAULTS)
+    cfg.update(load_tools_config().get('hedging') or {})
+    return cfg
+
+
+def hedging_enabled(capability: str) -> bool:
+    cfg = hedging_config()
+    return bool(cfg['enabled']) and capability in cfg['capabilities']
+
+
+def get_hedger(capability: str) -> Hedger:
+    """Process-wide Hedger per capability, so latency history survives across clients."""
+    with _lock:
+        hedger = _hedgers.get(capability)
+    if hedger is not None:
+        return hedger
+    cfg = hedging_config()
+    hedger = Hedger(
+        tracker=LatencyTracker(window=cfg['window'], min_samples=cfg['min_samples'],
+                               default_delay=cfg['default_delay_ms'] / 1000.0),
+        budget=HedgeBudget(ratio=cfg['budget_ratio'], burst=cfg['budget_burst']),
+        min_delay=cfg['min_delay_ms'] / 1000.0,
+        executor=_shared_executor(),
+    )
+    with _lock:
+        return _hedgers.setdefault(capability, hedger)
@@ -0,0 +1,190 @@
+"""
+Columnar (Parquet) export of the audit log and decision history.
+
+Writes Hive-style date partitions that pyarrow.dataset, pandas, DuckDB or
+Spark read directly:
+
+    <out_dir>/audit_log/date=YYYY-MM-DD/part-<first id>.parquet
+    <out_dir>/decisions/date=YYYY-MM-DD/part-<first seq>.parquet
+
+Columns are typed (int64 ids, float64 amounts, UTC timestamps) and the
+low-cardinality ones (`stage`, `decision`, `reviewer_id`) are dictionary
+encoded. Rows are read with fetchmany and written one row group at a time,
+so memory stays at one row group whatever the history size.
+
+Exports are incremental: `_export_state.json` holds the last audit id and
+the last `decided` change seq exported, and each run only adds new part
+files for rows after them; files already written are never touched. Part
+files are named after their first row, so a run interrupted before the
+state was saved rewrites the same files instead of duplicating rows.
+Decisions come from the checkpoint change log (see db.py), dated when the
+decision was made. The decisions seq is also saved in the database
+(db.save_export_mark, as 'decisions:<out_dir>'), and retention keeps the
+'decided' changes this export has not read yet, however old they are.
+
+Needs pyarrow (optional dependency: `pip install pyarrow`).
+"""
+import datetime
+import json
+import os
+
+from src import db
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet exports
+    pa = None
+
+ROW_GROUP_ROWS = 50_000
+STATE_FILE = '_export_state.json'
+COMPRESSION = 'zstd'
+
+AUDIT_SQL = "SELECT id, invoice_id, stage, message, ts FROM audit_log WHERE id > ? ORDER BY id"
+DECISIONS_SQL = """
+SELECT ch.seq, c.id, c.invoice_id, c.decision, c.reviewer_id, c.vendor_name, c.amount, c.created_at, ch.ts
+FROM checkpoint_changes ch JOIN checkpoints c ON c.id = ch.checkpoint_id
+WHERE ch.event = 'decided' AND ch.seq > ? ORDER BY ch.seq
+"""
+
+# name -> kind per table, in SELECT order; the last column dates the partition
+TABLES = {
+    'audit_log': (AUDIT_SQL, (('id', 'int'), ('invoice_id', 'str'), ('stage', 'dict'), ('message', 'str'),
+                              ('ts', 'time'))),
+    'decisions': (DECISIONS_SQL, (('seq', 'int'), ('checkpoint_id', 'str'), ('invoice_id', 'str'), ('decision', 'dict'),
+                                  ('reviewer_id', 'dict'), ('vendor_name', 'str'), ('amount', 'float'),
+                                  ('created_at', 'time'), ('decided_at', 'time'))),
+}
+
+
+def decisions_mark(out_dir: str) -> str:
+    """Name of the export_marks row holding the decisions seq exported to `out_dir`."""
+    return 'decisions:' + os.path.abspath(out_dir)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+
+
+def _arrow_type(kind):
+    return {'int': pa.int64(), 'str': pa.string(), 'dict': pa.dictionary(pa.int32(), pa.string()),
+            'float': pa.float64(), 'time': pa.timestamp('us', tz='UTC')}[kind]
+
+
+def schema(table: str):
+    _require_pyarrow()
+    return pa.schema([(name, _arrow_type(kind)) for name, kind in TABLES[table][1]])
+
+
+def _column(values, kind):
+    if kind == 'dict':
+        return pa.array(values, pa.string()).dictionary_encode()
+    if kind == 'time':
+        return pa.array([None if v is None else int(v * 1_000_000) for v in values], _arrow_type(kind))
+    return pa.array(values, _arrow_type(kind))
+
+
+def _batch(table: str, rows):
+    columns = TABLES[table][1]
+    return pa.Table.from_arrays([_column([r[i] for r in rows], kind) for i, (_, kind) in enumerate(columns)],
+                                schema=schema(table))
+
+
+def _day(ts) -> int:
+    """UTC day number of a timestamp; cheap enough to call per row."""
+    return int((ts or 0) // 86400)
+
+
+def _day_name(day: int) -> str:
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=day)).isoformat()
+
+
+def load_state(out_dir: str) -> dict:
+    try:
+        with open(os.path.join(out_dir, STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(out_dir: str, state: dict):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+class _PartitionWriter:
+    """One open Parquet file at a time; rows arrive in key order, a new file starts when the date changes."""
+
+    def __init__(self, out_dir: str, table: str):
+        self.base = os.path.join(out_dir, table)
+        self.table = table
+        self.schema = schema(table)
+        self.day = None
+        self.writer = None
+        self.path = None
+        self.files = []
+
+    def write(self, rows):
+        """Write rows of one date as one row group."""
+        day = _day(rows[0][-1])
+        if day != self.day:
+            self.close()
+            directory = os.path.join(self.base, f'date={_day_name(day)}')
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f'part-{rows[0][0]:012d}.parquet')
+            self.writer = pq.ParquetWriter(self.path + '.tmp', self.schema, compression=COMPRESSION)
+            self.day = day
+        self.writer.write_table(_batch(self.table, rows))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.path + '.tmp', self.path)
+            self.files.append(self.path)
+            self.writer = None
+            self.day = None
+
+
+def export_table(conn, out_dir: str, table: str, after: int = 0, row_group_rows: int = ROW_GROUP_ROWS):
+    """Append rows of `table` ('audit_log' or 'decisions') with key > `after`; (rows, last key, files written)."""
+    _require_pyarrow()
+    cur = conn.cursor()
+    cur.execute(TABLES[table][0], (after,))
+    writer = _PartitionWriter(out_dir, table)
+    count, last = 0, after
+    try:
+        while True:
+            rows = cur.fetchmany(row_group_rows)
+            if not rows:
+                break
+            start, day = 0, _day(rows[0][-1])
+            for i in range(1, len(rows)):
+                row_day = _day(rows[i][-1])
+                if row_day != day:
+                    writer.write(rows[start:i])
+                    start, day = i, row_day
+            writer.write(rows[start:])
+            count += len(rows)
+            last = rows[-1][0]
+    finally:
+        writer.close()
+    return count, last, writer.files
+
+
+def export_parquet(conn, out_dir: str, row_group_rows: int = ROW_GROUP_ROWS) -> dict:
+    """Incremental export of audit_log and decisions into `out_dir`; {table: rows exported}."""
+    _require_pyarrow()
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_state(out_dir)
+    exported = {}
+    for table in TABLES:
+        count, state[table], _ = export_table(conn, out_dir, table, state.get(table, 0), row_group_rows)
+        exported[table] = count
+        _save_state(out_dir, state)
+        if table == 'decisions':
+            # Lets retention purge the change rows this directory already has
+            db.save_export_mark(conn, decisions_mark(out_dir), state[table])
+    return exported
@@ -0,0 +1,279 @@
+"""
+Streaming JSONL ingestion.
+
+    python -m src ingest invoices.jsonl --out results.jsonl --workers 4
+    cat invoices.jsonl | python -m src ingest - --out results.jsonl
+
+A reader thread walks the input one line at a time and hands lines to a
+pool of worker threads through a bounded queue; at most `queue_size +
+workers` lines are in flight, so memory stays flat however large the file
+is. Each line is parsed, validated against the workflow inputs schema
+(bad lines are quarantined) and run through the workflow. Results are
+written to the output JSONL in input order.
+
+For file input the byte offset of the last line whose result has been
+written is checkpointed (atomically, every `checkpoint_every` lines), so
+re-running the same command resumes after it. The output file is cut back
+to the checkpointed size first, so no result is written twice.
+"""
+import argparse
+import contextlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+from src.store import open_store
+from src import metrics
+from src import nodes
+from src.runner import load_plan, run_workflow
+from src.schema import SchemaError
+
+_STOP = object()
+
+
+def iter_lines(stream, offset: int = 0):
+    """Yield `(line_no, end_offset, raw_bytes)` for each non-blank line, from `offset` on."""
+    line_no = 0
+    pos = offset
+    for raw in stream:
+        line_no += 1
+        pos += len(raw)
+        if raw.strip():
+            yield line_no, pos, raw
+
+
+def _read_checkpoint(path: str, source: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            ckpt = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if ckpt.get('source') != source:
+        return {}
+    try:
+        if os.path.getsize(source) < ckpt.get('offset', 0):
+            # Input was replaced by a shorter file; start over
+            return {}
+    except OSError:
+        return {}
+    return ckpt
+
+
+def _write_checkpoint(path: str, ckpt: dict):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(ckpt, f)
+    os.replace(tmp, path)
+
+
+class Ingestor:
+    """Bounded reader -> worker pool -> ordered writer for one input stream."""
+
+    def __init__(self, db_path=None, workers: int = 4, queue_size: int = 64, auto_decide: bool = True,
+                 decision_delay: float = 0, checkpoint_every: int = 100, source: str = 'ingest'):
+        self.db_path = db_path
+        self.source = source  # label for quarantine rows and metrics
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.auto_decide = auto_decide
+        self.decision_delay = decision_delay
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.plan = load_plan()
+        self.stats = {'lines': 0, 'processed': 0, 'quarantined': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _quarantine(self, payload, errors):
+        messages = [str(e) for e in errors]
+        try:
+            store = open_store(self.db_path)
+            try:
+                nodes.quarantine_rejected(store, [(payload, errors)], self.source)
+            finally:
+                store.close()
+        except Exception as e:
+            # The line is still answered, so the writer never waits on it
+            self._count('failed')
+            return {'status': 'FAILED', 'errors': messages, 'error': f'quarantine failed: {type(e).__name__}: {e}'}
+        self._count('quarantined')
+        return {'status': 'QUARANTINED', 'errors': messages}
+
+    def process_line(self, line_no: int, raw: bytes) -> dict:
+        """Parse, validate and run one line; never raises."""
+        record = {'line': line_no}
+        try:
+            inv = json.loads(raw)
+        except ValueError as e:
+            record.update(self.quarantine_unparsable(raw.decode('utf-8', 'replace').strip(), e))
+            return record
+        return self.process_invoice(inv, record)
+
+    def quarantine_unparsable(self, payload: str, exc: Exception) -> dict:
+        return self._quarantine(payload, [SchemaError('', 'json', f'invalid JSON: {exc}')])
+
+    def process_invoice(self, inv, record: dict = None) -> dict:
+        """Validate and run one parsed invoice, filling `record`; never raises."""
+        started = time.perf_counter()
+        record = {} if record is None else record
+        record['invoice_id'] = inv.get('invoice_id') if isinstance(inv, dict) else None
+        metrics.INPUTS_VALIDATED.inc(self.source)
+        errors = self.plan.validate_input(inv)
+        if errors:
+            record.update(self._quarantine(inv, errors))
+            return record
+        try:
+            state = run_workflow(inv, self.db_path, auto_decide=self.auto_decide,
+                                 decision_delay=self.decision_delay, plan=self.plan, inputs_validated=True)
+            payload = state.get('final_payload', {})
+            record['status'] = payload.get('status', 'UNKNOWN')
+            record['final_payload'] = payload
+            self._count('processed')
+        except Exception as e:
+            record['status'] = 'FAILED'
+            record['error'] = f'{type(e).__name__}: {e}'
+            self._count('failed')
+        record['duration_ms'] = round((time.perf_counter() - started) * 1e3, 3)
+        return record
+
+    def run(self, stream, out, start_offset: int = 0, line_base: int = 0, on_checkpoint=None) -> dict:
+        """Process binary `stream` (positioned at `start_offset`) and write JSONL results to text `out`.
+
+        Line numbers continue from `line_base`. `on_checkpoint(offset,
+        line_no)` is called after results up to that input offset have been
+        flushed to `out`.
+        """
+        work = queue.Queue(maxsize=self.queue_size)
+        done = queue.Queue()
+        inflight = threading.BoundedSemaphore(self.queue_size + self.workers)
+        errors = []
+
+        def reader():
+            seq = 0
+            try:
+                for line_no, end, raw in iter_lines(stream, start_offset):
+                    inflight.acquire()
+                    work.put((seq, line_base + line_no, end, raw))
+                    seq += 1
+            except Exception as e:  # surfaced after the pool drains
+                errors.append(e)
+            finally:
+                for _ in range(self.workers):
+                    work.put(_STOP)
+
+        def worker():
+            while True:
+                item = work.get()
+                if item is _STOP:
+                    done.put(_STOP)
+                    return
+                seq, line_no, end, raw = item
+                try:
+                    record = self.process_line(line_no, raw)
+                except Exception as e:
+                    # Every line must reach the writer, or run() waits for it forever
+                    self._count('failed')
+                    record = {'line': line_no, 'status': 'FAILED', 'error': f'{type(e).__name__}: {e}'}
+                done.put((seq, end, record))
+
+        threads = [threading.Thread(target=reader, name='ingest-reader', daemon=True)]
+        threads += [threading.Thread(target=worker, name=f'ingest-worker-{i}', daemon=True) for i in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        # Writer (this thread): emit results in input order, checkpoint the low-water mark
+        pending = {}
+        next_seq = 0
+        stopped = 0
+        last_offset, last_line, since_ckpt = start_offset, line_base, 0
+        while stopped < self.workers:
+            item = done.get()
+            if item is _STOP:
+                stopped += 1
+                continue
+            pending[item[0]] = item
+            while next_seq in pending:
+                _, end, record = pending.pop(next_seq)
+                out.write(json.dumps(record, default=str) + '\n')
+                inflight.release()
+                next_seq += 1
+                self._count('lines')
+                last_offset, last_line = end, record['line']
+                since_ckpt += 1
+                if since_ckpt >= self.checkpoint_every:
+                    out.flush()
+                    if on_checkpoint:
+                        on_checkpoint(last_offset, last_line)
+                    since_ckpt = 0
+        out.flush()
+        if on_checkpoint and since_ckpt:
+            on_checkpoint(last_offset, last_line)
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return dict(self.stats)
+
+
+def ingest_file(source: str, output: str, checkpoint: str = None, **kwargs) -> dict:
+    """Ingest a JSONL file (or '-' for stdin) into `output`, resuming from `checkpoint`."""
+    ingestor = Ingestor(**kwargs)
+    if source == '-':
+        with open(output, 'a', encoding='utf-8') as out:
+            return ingestor.run(sys.stdin.buffer, out)
+
+    source = os.path.abspath(source)
+    checkpoint = checkpoint or output + '.checkpoint.json'
+    ckpt = _read_checkpoint(checkpoint, source)
+    offset = ckpt.get('offset', 0)
+    line_base = ckpt.get('line', 0)
+    out_size = ckpt.get('output_size', 0) if ckpt else 0
+    # Drop results written after the last checkpoint; they will be redone
+    with open(output, 'a', encoding='utf-8') as out:
+        out.truncate(out_size)
+    if offset:
+        print(f"Resuming {source} at byte {offset} (line {line_base})", file=sys.stderr)
+
+    with open(source, 'rb') as stream, open(output, 'a', encoding='utf-8') as out:
+        stream.seek(offset)
+
+        def on_checkpoint(end_offset, line_no):
+            _write_checkpoint(checkpoint, {'source': source, 'offset': end_offset, 'line': line_no,
+                                           'output_size': out.tell(), 'ts': time.time()})
+
+        return ingestor.run(stream, out, offset, line_base, on_checkpoint)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m src ingest', description='Stream a JSONL file of invoices through the workflow.')
+    ap.add_argument('source', help="JSONL file, or '-' for stdin")
+    ap.add_argument('--out', required=True, help='output JSONL with one result per input line')
+    ap.add_argument('--checkpoint', help='offset checkpoint file (default: <out>.checkpoint.json)')
+    ap.add_argument('--db', dest='db_path', default=None)
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--queue-size', type=int, default=64, help='max lines buffered ahead of the workers')
+    ap.add_argument('--checkpoint-every', type=int, default=100, help='lines between offset checkpoints')
+    ap.add_argument('--no-auto', '--manual', dest='auto_decide', action='store_false')
+    ap.add_argument('--decision-delay', type=float, default=0.0)
+    ap.add_argument('--verbose', action='store_true', help='keep per-stage workflow output')
+    args = ap.parse_args(argv)
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        stats = ingest_file(args.source, args.out, args.checkpoint, db_path=args.db_path, workers=args.workers,
+                            queue_size=args.queue_size, auto_decide=args.auto_decide,
+                            decision_delay=args.decision_delay, checkpoint_every=args.checkpoint_every)
+    elapsed = time.perf_counter() - started
+    print(f"Ingested {stats['lines']} line(s) in {elapsed:.2f}s: {stats['processed']} processed, "
+          f"{stats['quarantined']} quarantined, {stats['failed']} failed")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+"""
+Durable invoice job queue on the workflow database.
+
+    python -m src jobs submit invoices.json [more.json ...]
+    python -m src jobs work --processes 4
+    python -m src jobs stats
+
+Jobs live in the `jobs` table of the store (src/store.py: a SQLite file
+by default, or a shared PostgreSQL database). A worker leases the
+highest-priority ready job inside a write transaction, renews the lease
+while it runs, and acks it (done) or fails it (retried with backoff until
+max_attempts). A worker that dies simply stops renewing; once the lease
+expires the job is ready again for another worker, so any number of
+worker processes can share one database file without a broker.
+
+An invoice that reaches the HITL checkpoint does not block its worker:
+the job is parked in the `human_review_queue` (workflow.json config) and
+`save_decision()` wakes it as a 'resume' job, which any worker then
+continues from the checkpoint.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import math
+import os
+import signal
+import socket
+import threading
+
+from src.store import as_store, open_store
+
+INVOICE_QUEUE = 'invoices'
+DEFAULT_LEASE_S = 60
+RETRY_BASE_S = 5
+
+
+def invoice_priority(inv: dict, today: datetime.date = None) -> float:
+    """Bigger and sooner-due invoices first: each 10x in amount is worth 10 days of due date."""
+    try:
+        amount = max(0.0, float(inv.get('amount') or 0))
+    except (TypeError, ValueError):
+        amount = 0.0
+    days_left = 30
+    try:
+        due = datetime.date.fromisoformat(str(inv.get('due_date')))
+        days_left = max(-30, min(365, (due - (today or datetime.date.today())).days))
+    except ValueError:
+        pass
+    return round(10 * math.log10(1 + amount) - days_left, 3)
+
+
+def submit_invoice(store, inv: dict, priority: float = None, queue: str = INVOICE_QUEUE, max_attempts: int = 3) -> int:
+    """Enqueue `inv` on `store` (a Store or sqlite3 connection); returns the job id."""
+    priority = invoice_priority(inv) if priority is None else priority
+    return as_store(store).enqueue_job(queue, 'invoice', inv, priority, max_attempts=max_attempts)
+
+
+class JobWorker:
+    """Claims jobs from `queues` and runs them until stopped (or idle, with `run(until_idle=True)`)."""
+
+    def __init__(self, db_path=None, queues=None, lease_s: float = DEFAULT_LEASE_S, poll_interval: float = 0.5,
+                 worker_id: str = None):
+        # The workflow modules are imported by workers only, not by `jobs submit` / `jobs stats`
+        from src.runner import load_plan
+        self.db_path = db_path
+        self.plan = load_plan()
+        self.review_queue = self.plan.config.get('human_review_queue', 'human_review_queue')
+        self.queues = tuple(queues or (INVOICE_QUEUE, self.review_queue))
+        self.lease_s = lease_s
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.stats = {'done': 0, 'parked': 0, 'retried': 0, 'failed': 0, 'lost': 0}
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def _heartbeat(self, store, job_id, done: threading.Event):
+        while not done.wait(self.lease_s / 3):
+            if not store.extend_lease(job_id, self.worker_id, self.lease_s):
+                return
+
+    def handle(self, job: dict) -> dict:
+        """Run one job; returns the final state of the workflow run."""
+        from src.runner import resume_workflow, run_workflow
+        if job['kind'] == 'resume':
+            return resume_workflow(job['checkpoint_id'], self.db_path, plan=self.plan,
+                                   paused_at=job['payload'].get('paused_at'))
+        return run_workflow(job['payload'], self.db_path, auto_decide=False, plan=self.plan,
+                            wait_for_decision=False)
+
+    def run_once(self, store) -> bool:
+        """Claim and process one job; False when no job was ready."""
+        job = store.claim_job(self.queues, self.worker_id, self.lease_s)
+        if not job:
+            return False
+        done = threading.Event()
+        # The heartbeat gets its own store: a SQLite store's connection must
+        # not be used from two threads at once (pooled stores are shared).
+        hb_store = open_store(self.db_path)
+        beat = threading.Thread(target=self._heartbeat, args=(hb_store, job['id'], done), daemon=True)
+        beat.start()
+        try:
+            state = self.handle(job)
+        except Exception as e:
+            outcome = store.fail_job(job['id'], self.worker_id, f'{type(e).__name__}: {e}',
+                                     RETRY_BASE_S * 2 ** (job['attempts'] - 1))
+            self.stats[{'queued': 'retried', 'failed': 'failed'}.get(outcome, 'lost')] += 1
+            return True
+        finally:
+            done.set()
+            beat.join()
+            hb_store.close()
+        if state.get('paused'):
+            ok = store.park_job(job['id'], self.worker_id, state['checkpoint_id'],
+                                {'paused_at': state.get('paused_at'), 'invoice': state['invoice']}, self.review_queue)
+            self.stats['parked' if ok else 'lost'] += 1
+        else:
+            ok = store.ack_job(job['id'], self.worker_id, state.get('final_payload', {}))
+            self.stats['done' if ok else 'lost'] += 1
+        return True
+
+    def run(self, until_idle: bool = False) -> dict:
+        store = open_store(self.db_path)
+        try:
+            while not self._stop.is_set():
+                if not self.run_once(store):
+                    if until_idle:
+                        break
+                    self._stop.wait(self.poll_interval)
+        finally:
+            store.close()
+        return dict(self.stats)
+
+
+def _work(db_path, queues, lease_s, until_idle, verbose):
+    worker = JobWorker(db_path, queues, lease_s)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        stats = worker.run(until_idle)
+    print(f"[{worker.worker_id}] {json.dumps(stats)}")
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m src jobs', description='Submit invoices to, and work, the job queue.')
+    ap.add_argument('--db', dest='db_path', default=None)
+    sub = ap.add_subparsers(dest='command', required=True)
+    p_submit = sub.add_parser('submit', help='enqueue invoice JSON file(s); a file may hold a JSON list')
+    p_submit.add_argument('invoices', nargs='+')
+    p_submit.add_argument('--priority', type=float, default=None, help='fixed priority (default: by amount and due date)')
+    p_work = sub.add_parser('work', help='process jobs')
+    p_work.add_argument('--processes', type=int, default=1)
+    p_work.add_argument('--queue', dest='queues', action='append', help='queue to work (repeatable; default: all)')
+    p_work.add_argument('--lease', type=float, default=DEFAULT_LEASE_S, help='lease (visibility timeout) in seconds')
+    p_work.add_argument('--until-idle', action='store_true', help='exit when no job is ready')
+    p_work.add_argument('--verbose', action='store_true', help='keep per-stage workflow output')
+    sub.add_parser('stats', help='job counts by status')
+    args = ap.parse_args(argv)
+
+    if args.command == 'submit':
+        store = open_store(args.db_path)
+        try:
+            count = 0
+            for path in args.invoices:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for inv in (data if isinstance(data, list) else [data]):
+                    submit_invoice(store, inv, args.priority)
+                    count += 1
+        finally:
+            store.close()
+        print(f"Queued {count} invoice job(s)")
+    elif args.command == 'work':
+        work_args = (args.db_path, args.queues, args.lease, args.until_idle, args.verbose)
+        if args.processes <= 1:
+            _work(*work_args)
+        else:
+            import multiprocessing
+            procs = [multiprocessing.Process(target=_work, args=work_args) for _ in range(args.processes)]
+            for p in procs:
+                p.start()
+            # Children stop on SIGINT/SIGTERM themselves; just wait for them
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            for p in procs:
+                p.join()
+    else:
+        store = open_store(args.db_path)
+        try:
+            print(json.dumps(store.job_counts(), indent=2))
+        finally:
+            store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+"""
+Local OCR with Tesseract: page rendering, preprocessing and a pool of warm engines.
+
+Used by adapters.TesseractAdapter. Each page goes through
+
+    render  ->  grayscale  ->  downscale to `dpi`  ->  deskew  ->  binarize  ->  Tesseract
+
+Rendering loads only the requested page: PDFs via pdf2image (poppler) with
+first_page/last_page, TIFF pages by seeking to their frame, other images
+as they are. Scans above the target DPI are downscaled (never upscaled).
+Skew is estimated on a small thumbnail by maximising the variance of its
+row profile over candidate angles, then the page is rotated once. Pages
+are binarized with an Otsu threshold from the grayscale histogram.
+
+Engines come from tesserocr when installed: every worker keeps a
+PyTessBaseAPI with the language model loaded, and recognition releases
+the GIL. Otherwise pytesseract runs the `tesseract` binary per page, one
+process per call, limited to one OpenMP thread each so parallel pages do
+not oversubscribe the cores. Either way at most `workers` pages are
+recognised at once per engine, whatever the number of callers.
+
+Optional dependencies: Pillow, plus tesserocr or pytesseract with the
+tesseract binary, plus pdf2image with poppler for PDFs.
+"""
+import os
+import queue
+import threading
+
+try:
+    from PIL import Image
+except ImportError:  # optional: only needed for local OCR
+    Image = None
+
+DEFAULT_DPI = 300
+MAX_SKEW = 5.0
+# Width of the thumbnail skew is estimated on
+SKEW_THUMB_WIDTH = 600
+
+
+def _backend():
+    """'tesserocr', 'pytesseract' or None, whichever can run here."""
+    if Image is None:
+        return None
+    try:
+        import tesserocr  # noqa: F401
+        return 'tesserocr'
+    except ImportError:
+        pass
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return 'pytesseract'
+    except (ImportError, OSError):
+        return None
+
+
+_detected = []
+
+
+def backend():
+    """The detected backend, probed once per process."""
+    if not _detected:
+        _detected.append(_backend())
+    return _detected[0]
+
+
+def otsu_threshold(histogram) -> int:
+    """Otsu's threshold for a 256-bin grayscale histogram."""
+    total = sum(histogram)
+    weighted = sum(i * n for i, n in enumerate(histogram))
+    best, best_t = -1.0, 127
+    below, below_weighted = 0, 0
+    for t in range(256):
+        below += histogram[t]
+        if below == 0:
+            continue
+        above = total - below
+        if above == 0:
+            break
+        below_weighted += t * histogram[t]
+        mean_below = below_weighted / below
+        mean_above = (weighted - below_weighted) / above
+        between = below * above * (mean_below - mean_above) ** 2
+        if between > best:
+            best, best_t = between, t
+    return best_t
+
+
+def binarize(image):
+    """Black text on white: pixels above the Otsu threshold become 255, the rest 0."""
+    t = otsu_threshold(image.histogram())
+    return image.point([0 if i <= t else 255 for i in range(256)])
+
+
+def _row_profile_score(thumb, angle: float) -> float:
+    rotated = thumb.rotate(angle, resample=Image.NEAREST, fillcolor=0)
+    # Averaging each row down to one pixel gives the ink per row
+    rows = rotated.resize((1, rotated.height), Image.BOX).tobytes()
+    mean = sum(rows) / len(rows)
+    return sum((r - mean) ** 2 for r in rows)
+
+
+def estimate_skew(image, max_skew: float = MAX_SKEW) -> float:
+    """Angle (degrees, counter-clockwise) that straightens the text lines of a grayscale page."""
+    scale = min(1.0, SKEW_THUMB_WIDTH / image.width)
+    thumb = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.BOX)
+    # Ink as bright pixels, so the rotation's fill adds none
+    t = otsu_threshold(thumb.histogram())
+    thumb = thumb.point([255 if i <= t else 0 for i in range(256)])
+    best = max((a / 2 for a in range(int(-max_skew * 2), int(max_skew * 2) + 1)),
+               key=lambda a: _row_profile_score(thumb, a))
+    return max((best + a / 10 for a in range(-5, 6)), key=lambda a: _row_profile_score(thumb, a))
+
+
+def deskew(image, max_skew: float = MAX_SKEW):
+    angle = estimate_skew(image, max_skew)
+    if abs(angle) < 0.05:
+        return image
+    return image.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+
+
+def preprocess(image, source_dpi: float = None, dpi: int = DEFAULT_DPI, straighten: bool = True,
+               threshold: bool = True, max_skew: float = MAX_SKEW):
+    """Grayscale, downscale from `source_dpi` to `dpi`, deskew and binarize one page image."""
+    image = image.convert('L')
+    if source_dpi and source_dpi > dpi:
+        factor = source_dpi / dpi
+        if abs(factor - round(factor)) < 0.01:
+            # 600 -> 300 dpi and the like: box average, several times faster than resampling
+            image = image.reduce(round(factor))
+        else:
+            image = image.resize((max(1, round(image.width / factor)), max(1, round(image.height / factor))),
+                                 Image.LANCZOS)
+    if straighten:
+        image = deskew(image, max_skew)
+    if threshold:
+        image = binarize(image)
+    return image
+
+
+def render_page(page, dpi: int = DEFAULT_DPI):
+    """(image, dpi of that image or None) of one src.attachments.Page."""
+    if page.kind == 'pdf':
+        try:
+            from pdf2image import convert_from_path
+        except ImportError:
+            raise NotImplementedError("Install pdf2image and poppler to OCR PDFs locally")
+        image, = convert_from_path(page.path, dpi=dpi, first_page=page.number, last_page=page.number,
+                                   grayscale=True)
+        return image, dpi
+    with Image.open(page.path) as source:
+        if page.number > 1:
+            source.seek(page.number - 1)
+        source_dpi = float((source.info.get('dpi') or (0,))[0] or 0) or None
+        width = source.width
+        if source_dpi and source_dpi > dpi and source.format == 'JPEG':
+            # Let the JPEG decoder scale down (by 1/2, 1/4 or 1/8) instead of decoding full size
+            scale = dpi / source_dpi
+            source.draft('L', (int(source.width * scale), int(source.height * scale)))
+        source.load()
+        image = source.copy()
+    if source_dpi and image.width != width:
+        source_dpi = source_dpi * image.width / width
+    return image, source_dpi
+
+
+class TesseractEngine:
+    """Up to `workers` warm Tesseract instances shared by every caller in the process."""
+
+    def __init__(self, lang: str = 'eng', psm: int = 6, workers: int = None, kind: str = None):
+        self.kind = kind or backend()
+        if self.kind is None:
+            raise NotImplementedError("Install Pillow and tesserocr, or pytesseract and tesseract-ocr")
+        self.lang = lang
+        self.psm = psm
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        if self.kind == 'pytesseract':
+            # One thread per tesseract process; parallelism comes from the pages
+            os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+    def _new_api(self):
+        if self.kind == 'tesserocr':
+            import tesserocr
+            return tesserocr.PyTessBaseAPI(lang=self.lang, psm=self.psm)
+        import pytesseract
+        return pytesseract
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._created < self.workers
+            if grow:
+                self._created += 1
+        if grow:
+            try:
+                return self._new_api()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def recognize(self, image, dpi: float = None) -> str:
+        api = self._acquire()
+        try:
+            if self.kind == 'tesserocr':
+                api.SetImage(image)
+                if dpi:
+                    api.SetSourceResolution(int(dpi))
+                return api.GetUTF8Text()
+            config = f'--psm {self.psm}' + (f' --dpi {int(dpi)}' if dpi else '')
+            return api.image_to_string(image, lang=self.lang, config=config)
+        finally:
+            self._idle.put(api)
+
+    def close(self):
+        while True:
+            try:
+                api = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self.kind == 'tesserocr':
+                api.End()
+        self._created = 0
@@ -1,14 +1,30 @@
 """
 Enhanced logging for invoice workflow.
 Tracks all stage transitions, tool selections, and checkpoints.
+
+Structured events are kept in a bounded per-invoice ring buffer and, when an
+event sink is started, handed to a background QueueListener that writes them
+as JSON Lines to a rotating file. Formatting happens on the listener thread.
 """
+import atexit
 import logging
+import logging.handlers
 import json
-from datetime import datetime
+import os
+import queue
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+MAX_EVENTS = 1000
+EVENTS_LOGGER = 'workflow.events'
+
+# Handlers installed by setup_logging, so repeated calls replace them instead of stacking.
+_installed_handlers = []
 
 
 def setup_logging(log_file: str = 'workflow.log', level=logging.DEBUG):
-    """Configure logging for the workflow."""
+    """Configure logging for the workflow. Safe to call more than once."""
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
@@ -27,36 +43,141 @@ def setup_logging(log_file: str = 'workflow.log', level=logging.DEBUG):
     # Get root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
+    for old in _installed_handlers:
+        root_logger.removeHandler(old)
+        old.close()
+    _installed_handlers[:] = [fh, ch]
     root_logger.addHandler(fh)
     root_logger.addHandler(ch)
     
     return root_logger
 
 
+def _event_dict(ts: float, event_type: str, invoice_id: str, details: dict) -> dict:
+    return {
+        'timestamp': datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+        'type': event_type,
+        'invoice_id': invoice_id,
+        'details': details
+    }
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats records carrying an `event` tuple as one compact JSON line."""
+    def format(self, record):
+        # RotatingFileHandler formats twice (rollover check + emit); cache the line.
+        line = getattr(record, '_jsonl', None)
+        if line is None:
+            event = getattr(record, 'event', None)
+            if event is not None:
+                payload = _event_dict(*event)
+            else:
+                payload = {'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                           'type': 'log', 'message': record.getMessage()}
+            line = json.dumps(payload, default=str, separators=(',', ':'))
+            record._jsonl = line
+        return line
+
+
+class _EventQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers all formatting to the listener and never blocks."""
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventSink:
+    """Background JSON Lines writer for workflow events."""
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 queue_size: int = 10000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.file_handler.setFormatter(JsonLinesFormatter())
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = _EventQueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, self.file_handler)
+        self.logger = logging.getLogger(EVENTS_LOGGER)
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def start(self):
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """Detach from the logger, drain the queue and close the file."""
+        self.logger.removeHandler(self.handler)
+        self.listener.stop()
+        self.file_handler.close()
+
+
+_sink = None
+
+
+def start_event_sink(path: str = os.path.join('logs', 'workflow_events.jsonl'), **kwargs) -> EventSink:
+    """Start (or return the running) process-wide event sink."""
+    global _sink
+    if _sink is None:
+        _sink = EventSink(path, **kwargs).start()
+        atexit.register(stop_event_sink)
+    return _sink
+
+
+def stop_event_sink():
+    global _sink
+    if _sink is not None:
+        _sink.stop()
+        _sink = None
+
+
 class WorkflowLogger:
-    """Structured logging for workflow events."""
+    """Structured logging for workflow events.
+
+    Keeps at most `max_events` recent events in memory; older ones fall off
+    the ring buffer (and are only persisted if an event sink is running).
+    """
     
-    def __init__(self, invoice_id: str):
+    def __init__(self, invoice_id: str, max_events: int = MAX_EVENTS):
         self.invoice_id = invoice_id
-        self.logger = logging.getLogger(f'workflow.{invoice_id}')
-        self.events = []
+        # One shared logger: per-invoice logger names are never freed by logging.
+        self.logger = logging.getLogger('workflow')
+        self._events = deque(maxlen=max_events)
+        self._event_logger = logging.getLogger(EVENTS_LOGGER)
+    
+    @property
+    def events(self) -> list:
+        """Buffered events as dicts (formatted on access)."""
+        return [_event_dict(*e) for e in self._events]
     
     def log_stage_start(self, stage_name: str, stage_id: str):
         """Log the start of a stage."""
-        msg = f"[{stage_id}] Starting stage {stage_name}"
-        self.logger.info(msg)
+        self.logger.info("[%s] %s: Starting stage %s", stage_id, self.invoice_id, stage_name)
         self._record_event('stage_start', {'stage_id': stage_id, 'stage_name': stage_name})
     
     def log_stage_end(self, stage_id: str, status: str = 'OK'):
         """Log the completion of a stage."""
-        msg = f"[{stage_id}] Stage completed with status: {status}"
-        self.logger.info(msg)
+        self.logger.info("[%s] %s: Stage completed with status: %s", stage_id, self.invoice_id, status)
         self._record_event('stage_end', {'stage_id': stage_id, 'status': status})
     
     def log_tool_selection(self, capability: str, tool_name: str, context: dict = None):
         """Log when Bigtool selects a tool."""
-        msg = f"Bigtool selected {tool_name} for capability {capability}"
-        self.logger.info(msg)
+        self.logger.info("%s: Bigtool selected %s for capability %s", self.invoice_id, tool_name, capability)
         self._record_event('tool_selection', {
             'capability': capability,
             'tool_name': tool_name,
@@ -65,8 +186,7 @@ class WorkflowLogger:
     
     def log_ability_call(self, server: str, ability: str, params: dict = None):
         """Log when an ability is called on an MCP server."""
-        msg = f"Calling ability {ability} on {server} server"
-        self.logger.debug(msg)
+        self.logger.debug("%s: Calling ability %s on %s server", self.invoice_id, ability, server)
         self._record_event('ability_call', {
             'server': server,
             'ability': ability,
@@ -75,8 +195,7 @@ class WorkflowLogger:
     
     def log_checkpoint_created(self, checkpoint_id: str, reason: str):
         """Log checkpoint creation."""
-        msg = f"Checkpoint created {checkpoint_id} - reason: {reason}"
-        self.logger.warning(msg)
+        self.logger.warning("%s: Checkpoint created %s - reason: %s", self.invoice_id, checkpoint_id, reason)
         self._record_event('checkpoint_created', {
             'checkpoint_id': checkpoint_id,
             'reason': reason
@@ -84,8 +203,8 @@ class WorkflowLogger:
     
     def log_hitl_decision(self, checkpoint_id: str, decision: str, reviewer_id: str):
         """Log HITL decision."""
-        msg = f"HITL decision received: {decision} from {reviewer_id} for checkpoint {checkpoint_id}"
-        self.logger.info(msg)
+        self.logger.info("%s: HITL decision received: %s from %s for checkpoint %s",
+                         self.invoice_id, decision, reviewer_id, checkpoint_id)
         self._record_event('hitl_decision', {
             'checkpoint_id': checkpoint_id,
             'decision': decision,
@@ -94,8 +213,7 @@ class WorkflowLogger:
     
     def log_error(self, stage: str, error: str, traceback_str: str = None):
         """Log an error."""
-        msg = f"[{stage}] Error: {error}"
-        self.logger.error(msg, exc_info=bool(traceback_str))
+        self.logger.error("[%s] %s: Error: %s", stage, self.invoice_id, error, exc_info=bool(traceback_str))
         self._record_event('error', {
             'stage': stage,
             'error': error,
@@ -104,8 +222,7 @@ class WorkflowLogger:
     
     def log_state_transition(self, from_stage: str, to_stage: str, state_keys: list = None):
         """Log state transition between stages."""
-        msg = f"State transition: {from_stage} -> {to_stage}"
-        self.logger.debug(msg)
+        self.logger.debug("%s: State transition: %s -> %s", self.invoice_id, from_stage, to_stage)
         self._record_event('state_transition', {
             'from_stage': from_stage,
             'to_stage': to_stage,
@@ -113,23 +230,30 @@ class WorkflowLogger:
         })
     
     def _record_event(self, event_type: str, details: dict):
-        """Record an event in memory."""
-        event = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'type': event_type,
-            'invoice_id': self.invoice_id,
-            'details': details
-        }
-        self.events.append(event)
+        """Record an event in the ring buffer and hand it to the event sink, if any.
+
+        Only a tuple is built here; timestamps and JSON are formatted lazily.
+        """
+        event = (time.time(), event_type, self.invoice_id, details)
+        self._events.append(event)
+        if self._event_logger.handlers:
+            self._event_logger.info(event_type, extra={'event': event})
     
     def export_events(self) -> str:
-        """Export all logged events as JSON."""
+        """Export buffered events as JSON."""
         return json.dumps(self.events, indent=2, default=str)
     
     def export_events_to_file(self, file_path: str):
-        """Export all logged events to a JSON file."""
+        """Export buffered events to a JSON file."""
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(self.export_events())
+    
+    def export_events_jsonl(self, file_path: str):
+        """Append buffered events to a JSON Lines file, one event per line."""
+        with open(file_path, 'a', encoding='utf-8') as f:
+            for e in self._events:
+                f.write(json.dumps(_event_dict(*e), default=str, separators=(',', ':')))
+                f.write('\n')
 
 
 # Module-level logger setup
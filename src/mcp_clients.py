@@ -1,22 +1,77 @@
+import random
 import time
-from src.bigtool import BigtoolPicker
-from src.adapters import get_adapter
+from src.bigtool import BigtoolPicker, load_tools_config
+from src.adapters import shared_adapter
+from src import hedging
+from src import metrics
+from src.vendors import get_vendor_index
+
+# Simulated latency for the mock abilities, keyed by method name (seconds,
+# median of a lognormal with MOCK_LATENCY_SIGMA). Empty = no delay.
+MOCK_LATENCY = {}
+MOCK_LATENCY_SIGMA = 0.5
+# Simulated CPU work per ability (thread CPU seconds, busy loop), for
+# benchmarking CPU-bound stages. Empty = none.
+MOCK_CPU_COST = {}
+# Purchase orders served by the mock ERP, keyed by vendor name (and by
+# canonical vendor id, so name variants resolve). Vendors not listed get
+# DEFAULT_MOCK_POS.
+MOCK_PO_BOOK = {}
+_MOCK_PO_BY_VENDOR_ID = {}
+DEFAULT_MOCK_POS = [ { 'po_id': 'PO-9001', 'amount': 12000 } ]
+
+
+def set_mock_latency(latency: dict):
+    """Replace the simulated latency table, e.g. {'ocr': 0.05, 'enrich_vendor': 0.02}."""
+    MOCK_LATENCY.clear()
+    MOCK_LATENCY.update(latency or {})
+
+
+def set_mock_cpu_cost(cost: dict):
+    """Replace the simulated CPU cost table, e.g. {'ocr': 0.02}."""
+    MOCK_CPU_COST.clear()
+    MOCK_CPU_COST.update(cost or {})
+
+
+def set_mock_purchase_orders(po_book: dict):
+    """Replace the mock ERP's vendor -> purchase orders table."""
+    MOCK_PO_BOOK.clear()
+    MOCK_PO_BOOK.update(po_book or {})
+    _MOCK_PO_BY_VENDOR_ID.clear()
+    index = get_vendor_index()
+    for name, pos in MOCK_PO_BOOK.items():
+        _MOCK_PO_BY_VENDOR_ID.setdefault(index.add(name), []).extend(pos)
+
+
+def _mock_delay(ability: str):
+    median = MOCK_LATENCY.get(ability)
+    if median:
+        time.sleep(median * random.lognormvariate(0, MOCK_LATENCY_SIGMA))
+    cost = MOCK_CPU_COST.get(ability)
+    if cost:
+        end = time.thread_time() + cost
+        while time.thread_time() < end:
+            pass
 
 
 class CommonClient:
     def __init__(self):
         self.bigtool = BigtoolPicker()
 
+    @metrics.timed_call('common')
     def ocr(self, attachment_path: str):
+        _mock_delay('ocr')
         # stub: return text
         return "Extracted invoice text (mock)"
 
+    @metrics.timed_call('common')
     def parse_line_items(self, text: str):
+        _mock_delay('parse_line_items')
         # If a semantic NLP tool is available in the bigtool pools, prefer it
         try:
             pick = self.bigtool.select('nlp')
             if pick == 'anthropic':
-                adapter = get_adapter('anthropic', {})
+                adapter = shared_adapter('anthropic', {})
                 # Use a TASK header that AnthropicAdapter recognizes for richer behavior
                 parsed = adapter.call_model(prompt=f"TASK:PARSE_INVOICE\n{text}")
                 return parsed.get('parsed_line_items', [ { 'desc': 'Widgets', 'qty': 10, 'unit_price': 1234.5, 'total': 12345.0 } ])
@@ -25,38 +80,118 @@ class CommonClient:
             pass
         return [ { 'desc': 'Widgets', 'qty': 10, 'unit_price': 1234.5, 'total': 12345.0 } ]
 
-    def normalize_vendor(self, vendor_name: str):
-        return { 'normalized_name': vendor_name.strip().title(), 'tax_id': None }
+    @metrics.timed_call('common')
+    def normalize_vendor(self, vendor_name: str, tax_id: str = None):
+        # Resolve against the vendor master; unseen vendors are registered
+        match = get_vendor_index().resolve_or_add(vendor_name, tax_id)
+        return { 'normalized_name': match.name, 'vendor_id': match.vendor_id, 'tax_id': match.tax_id,
+                 'vendor_match_score': match.score }
 
+    @metrics.timed_call('common')
     def compute_flags(self, invoice):
         return { 'missing_info': [], 'risk_score': 0.1 }
 
+    @metrics.timed_call('common')
     def build_accounting_entries(self, invoice):
         return [ { 'account': 'AP', 'debit': invoice.get('amount',0), 'credit': 0 } ]
 
 
 class AtlasClient:
-    def __init__(self):
+    def __init__(self, hedge: bool = None):
         self.bigtool = BigtoolPicker()
+        # None -> follow the `hedging` section of tools.yaml per capability
+        self.hedge = hedge
+
+    def _hedging(self, capability: str) -> bool:
+        if self.hedge is None:
+            return hedging.hedging_enabled(capability)
+        return self.hedge
+
+    def _adapter(self, tool: str):
+        config = (load_tools_config().get('adapter_config') or {}).get(tool) or {}
+        return shared_adapter(tool, config)
+
+    def _ocr_with(self, tool: str, attachment_path: str):
+        return self._adapter(tool).extract_text(attachment_path)
+
+    def _ocr_page_with(self, tool: str, page):
+        adapter = self._adapter(tool)
+        if hasattr(adapter, 'extract_page_text'):
+            return adapter.extract_page_text(page)
+        if page.count == 1:
+            return adapter.extract_text(page.path)
+        raise NotImplementedError(f"{tool} cannot OCR single pages")
+
+    def _local_ocr(self):
+        """The TesseractAdapter when 'tesseract' is in the OCR pool and can run here, else None."""
+        if 'tesseract' not in self.bigtool.pool('ocr'):
+            return None
+        adapter = self._adapter('tesseract')
+        return adapter if getattr(adapter, 'available', False) else None
+
+    def _enrich_with(self, tool: str, vendor_name: str):
+        return self._adapter(tool).enrich_vendor(vendor_name)
+
+    def _hedged_call(self, capability: str, fn):
+        """Run `fn(tool)` across the capability's pool; None if hedging is off or all tools fail."""
+        pool = self.bigtool.pool(capability)
+        if not pool or not self._hedging(capability):
+            return None
+        try:
+            _, result = hedging.get_hedger(capability).call(pool, fn)
+            return result
+        except hedging.HedgeError:
+            return None
 
+    @metrics.timed_call('atlas')
     def ocr(self, attachment_path: str):
+        text = self._hedged_call('ocr', lambda tool: self._ocr_with(tool, attachment_path))
+        if text:
+            return text
+        return self._mock_ocr(attachment_path)
+
+    @metrics.timed_call('atlas')
+    def ocr_page(self, page):
+        """Text of one page of an attachment (src.attachments.Page); called for several pages at once."""
+        text = self._hedged_call('ocr', lambda tool: self._ocr_page_with(tool, page))
+        if text:
+            return text
+        # Without hedging, OCR on local cores when Tesseract is installed
+        local = None if self._hedging('ocr') or page.kind == 'missing' else self._local_ocr()
+        if local is not None:
+            try:
+                return local.extract_page_text(page)
+            except NotImplementedError:
+                pass  # e.g. a PDF without pdf2image
+        if page.count == 1:
+            return self._mock_ocr(page.path)
+        _mock_delay('ocr')
+        return f"OCR via ATLAS (mock), page {page.number} of {page.count}"
+
+    def _mock_ocr(self, attachment_path):
+        _mock_delay('ocr')
         # Prefer an NLP provider if configured for semantic OCR/parse
         try:
             pick = self.bigtool.select('nlp')
             if pick == 'anthropic':
-                adapter = get_adapter('anthropic', {})
+                adapter = shared_adapter('anthropic', {})
                 parsed = adapter.call_model(prompt=f"TASK:OCR\nPlease extract the invoice text from attachment: {attachment_path}")
                 return parsed.get('invoice_text') or parsed.get('parsed_line_items') or "OCR via ATLAS (mock)"
         except Exception:
             pass
         return "OCR via ATLAS (mock)"
 
+    @metrics.timed_call('atlas')
     def enrich_vendor(self, vendor_name: str):
+        enriched = self._hedged_call('enrichment', lambda tool: self._enrich_with(tool, vendor_name))
+        if enriched:
+            return enriched
+        _mock_delay('enrich_vendor')
         try:
             # Some setups may route enrichment to an LLM-based enrichment via 'nlp'
             pick = self.bigtool.select('nlp')
             if pick == 'anthropic':
-                adapter = get_adapter('anthropic', {})
+                adapter = shared_adapter('anthropic', {})
                 parsed = adapter.call_model(prompt=f"TASK:ENRICH_VENDOR\nPlease return JSON with tax_id and credit_score for vendor: {vendor_name}")
                 # Map parsed output to expected enrichment keys conservatively
                 if isinstance(parsed, dict):
@@ -68,14 +203,24 @@ class AtlasClient:
             pass
         return { 'tax_id': 'GST12345', 'credit_score': 700 }
 
+    @metrics.timed_call('atlas')
     def fetch_pos(self, vendor_name: str):
+        _mock_delay('fetch_pos')
         # mock: return empty or a candidate
-        return [ { 'po_id': 'PO-9001', 'amount': 12000 } ]
+        pos = MOCK_PO_BOOK.get(vendor_name)
+        if pos is None and _MOCK_PO_BY_VENDOR_ID:
+            match = get_vendor_index().resolve(vendor_name)
+            pos = _MOCK_PO_BY_VENDOR_ID.get(match.vendor_id) if match else None
+        return DEFAULT_MOCK_POS if pos is None else pos
 
+    @metrics.timed_call('atlas')
     def post_to_erp(self, entries):
+        _mock_delay('post_to_erp')
         return { 'posted': True, 'erp_txn_id': 'TXN-555' }
 
+    @metrics.timed_call('atlas')
     def notify(self, parties, message):
+        _mock_delay('notify')
         return { 'ok': True }
 
 
@@ -0,0 +1,230 @@
+"""
+In-process timing metrics for the invoice workflow.
+
+Stages and adapter calls record wall, CPU and external-call time into
+histograms. The registry renders Prometheus text format (served at
+/metrics by the review APIs) and a plain-text summary for batch runs.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RESERVOIR_SIZE = 1024
+
+
+def _fmt_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {v}")
+        return lines
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'sum', 'samples')
+
+    def __init__(self, n_buckets):
+        self.buckets = [0] * n_buckets
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+
+class Histogram:
+    """Prometheus-style histogram; also keeps recent samples for quantiles."""
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = _Series(len(self.bounds))
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    s.buckets[i] += 1
+                    break
+            s.count += 1
+            s.sum += value
+            s.samples.append(value)
+
+    def labelsets(self):
+        with self._lock:
+            return sorted(self._series)
+
+    def stats(self, *labels) -> dict:
+        """count/sum/mean and p50/p95/p99 over the recent-sample reservoir."""
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                return {'count': 0, 'sum': 0.0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+            samples = sorted(s.samples)
+            count, total = s.count, s.sum
+
+        def q(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p))]
+        return {'count': count, 'sum': total, 'mean': total / count,
+                'p50': q(0.50), 'p95': q(0.95), 'p99': q(0.99)}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v.buckets), v.count, v.sum) for k, v in self._series.items())
+        for labels, buckets, count, total in items:
+            cumulative = 0
+            for bound, n in zip(self.bounds, buckets):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, labelnames, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help_text, labelnames, **kw)
+            return m
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._get(Counter, name, help_text, labelnames)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[k] for k in sorted(self._metrics)]
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_WALL = REGISTRY.histogram('invoice_stage_wall_seconds', 'Wall-clock time per workflow stage', ('stage',))
+STAGE_CPU = REGISTRY.histogram('invoice_stage_cpu_seconds', 'Thread CPU time per workflow stage', ('stage',))
+STAGE_EXTERNAL = REGISTRY.histogram('invoice_stage_external_seconds', 'Time spent in adapter calls per workflow stage', ('stage',))
+ADAPTER_CALLS = REGISTRY.histogram('invoice_adapter_call_seconds', 'Wall-clock time per adapter call', ('server', 'ability'))
+WORKFLOW_WALL = REGISTRY.histogram('invoice_workflow_seconds', 'End-to-end wall-clock time per workflow run')
+INPUTS_VALIDATED = REGISTRY.counter('invoice_inputs_validated_total', 'Invoices checked against the workflow.json inputs schema', ('source',))
+INPUTS_REJECTED = REGISTRY.counter('invoice_inputs_rejected_total', 'Invoices quarantined by schema validation, by first error reason', ('source', 'reason'))
+DEDUP_LOOKUPS = REGISTRY.counter('invoice_dedup_lookups_total', 'INTAKE duplicate checks by outcome (bloom_negative, bloom_false_positive, duplicate, retry)', ('result',))
+SPOOL_FILES = REGISTRY.counter('invoice_spool_files_total', 'Spool files handled by the watcher, by outcome (archived, error)', ('result',))
+
+_local = threading.local()
+
+
+def _external_total() -> float:
+    return getattr(_local, 'external', 0.0)
+
+
+@contextmanager
+def external_call(server: str, ability: str):
+    """Time one adapter call and charge it to the enclosing stage's external time."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _local.external = _external_total() + elapsed
+        ADAPTER_CALLS.observe(elapsed, server, ability)
+
+
+def timed_call(server: str):
+    """Decorator form of `external_call`, using the method name as the ability."""
+    def deco(fn):
+        ability = fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with external_call(server, ability):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def stage_timer(stage_id: str):
+    """Record wall, CPU and external-call time for one stage run on this thread."""
+    wall0 = time.perf_counter()
+    cpu0 = time.thread_time()
+    ext0 = _external_total()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall0
+        cpu = time.thread_time() - cpu0
+        ext = _external_total() - ext0
+        STAGE_WALL.observe(wall, stage_id)
+        STAGE_CPU.observe(cpu, stage_id)
+        STAGE_EXTERNAL.observe(ext, stage_id)
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render_prometheus()
+
+
+def summary() -> str:
+    """Plain-text table of stage and adapter timings (milliseconds)."""
+    rows = []
+    wall, cpu, ext = STAGE_WALL, STAGE_CPU, STAGE_EXTERNAL
+    header = f"{'stage':<34}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'cpu':>10}{'ext':>10}"
+    rows.append(header)
+    rows.append('-' * len(header))
+    for (stage,) in wall.labelsets():
+        w = wall.stats(stage)
+        rows.append(f"{stage:<34}{w['count']:>7}{w['mean'] * 1e3:>10.2f}{w['p50'] * 1e3:>10.2f}"
+                    f"{w['p95'] * 1e3:>10.2f}{w['p99'] * 1e3:>10.2f}"
+                    f"{cpu.stats(stage)['mean'] * 1e3:>10.2f}{ext.stats(stage)['mean'] * 1e3:>10.2f}")
+    calls = ADAPTER_CALLS
+    if calls.labelsets():
+        rows.append('')
+        rows.append(f"{'adapter call':<34}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for server, ability in calls.labelsets():
+            c = calls.stats(server, ability)
+            rows.append(f"{server + '.' + ability:<34}{c['count']:>7}{c['mean'] * 1e3:>10.2f}"
+                        f"{c['p50'] * 1e3:>10.2f}{c['p95'] * 1e3:>10.2f}{c['p99'] * 1e3:>10.2f}")
+    return '\n'.join(rows)
@@ -1,49 +1,116 @@
 import uuid
-from src import db
+from src import attachments
+from src import cpu_pool
+from src import metrics
+from src.store import as_store
 from src.bigtool import BigtoolPicker
 from src.mcp_clients import CommonClient, AtlasClient, compute_match_score
 
 
 class BaseNode:
     def __init__(self, conn, config):
+        # `conn` is a Store (src/store.py) or a raw sqlite3 connection
         self.conn = conn
+        self.store = as_store(conn)
         self.config = config
         self.common = CommonClient()
         self.atlas = AtlasClient()
         self.bigtool = BigtoolPicker()
 
     def log(self, invoice_id, stage, message):
-        db.append_audit(self.conn, invoice_id, stage, message)
+        self.store.append_audit(invoice_id, stage, message)
+
+    # Nodes whose work is CPU-bound can define `cpu_inputs(state)` (small,
+    # picklable), a module-level `cpu_task(inputs)` and
+    # `apply_cpu_result(state, result)`; stages with "executor": "process"
+    # then run the task in src.cpu_pool instead of calling run().
+    cpu_task = None
+
+    def run_in_pool(self, state: dict, submit):
+        """Run `cpu_task` through `submit(fn, inputs) -> result`; only inputs and result cross processes."""
+        return self.apply_cpu_result(state, submit(self.cpu_task, self.cpu_inputs(state)))
+
+
+def quarantine_rejected(conn, rejected, source='intake'):
+    """Quarantine `[(invoice, errors), ...]` and count them by the first error's reason."""
+    if not rejected:
+        return
+    as_store(conn).quarantine_invoices(rejected, source)
+    for _, errors in rejected:
+        metrics.INPUTS_REJECTED.inc(source, errors[0].reason)
 
 
 class IngestNode(BaseNode):
     def run(self, state: dict):
         inv = state['invoice']
-        inv['raw_id'] = str(uuid.uuid4())
+        # The runner passes the plan's inputs schema as config['validate_input'];
+        # invoices pre-validated by a batch run skip the per-invoice check
+        validate = self.config.get('validate_input')
+        if not state.pop('inputs_validated', False) and validate is not None:
+            metrics.INPUTS_VALIDATED.inc('intake')
+            errors = validate(inv)
+            if errors:
+                invoice_id = inv.get('invoice_id', 'unknown') if isinstance(inv, dict) else 'unknown'
+                quarantine_rejected(self.store, [(inv, errors)], 'intake')
+                state['validation_errors'] = [str(e) for e in errors]
+                state['final_payload'] = { 'invoice_id': invoice_id, 'status': 'QUARANTINED', 'errors': state['validation_errors'] }
+                print(f"Invoice {invoice_id} failed schema validation: {'; '.join(state['validation_errors'])}")
+                self.log(invoice_id, 'INTAKE', f"Quarantined: {len(errors)} schema error(s)")
+                return state
+        raw_id = str(uuid.uuid4())
+        if self.config.get('dedup_enabled', True):
+            from src.dedup import DEFAULT_CAPACITY, get_index
+            index = get_index(self.store, self.config.get('dedup_bloom_capacity', DEFAULT_CAPACITY))
+            existing = index.check_and_add(self.store, inv, raw_id)
+            if existing:
+                state['duplicate_of'] = existing
+                state['final_payload'] = { 'invoice_id': inv['invoice_id'], 'status': 'DUPLICATE',
+                                           'duplicate_of': { 'invoice_id': existing['invoice_id'], 'raw_id': existing['raw_id'] } }
+                print(f"Invoice {inv['invoice_id']} is a duplicate of raw_id {existing['raw_id']}; skipping")
+                self.log(inv['invoice_id'], 'INTAKE', f"Duplicate of raw_id {existing['raw_id']}")
+                return state
+        inv['raw_id'] = raw_id
         self.log(inv['invoice_id'], 'INTAKE', f"Persisted raw_id {inv['raw_id']}")
         return state
 
 
+def ocr_and_parse(inputs: dict, atlas=None, common=None) -> dict:
+    """OCR every page of the attachments and parse line items; runs in a pool worker with its warm clients by default."""
+    if atlas is None:
+        atlas, common = cpu_pool.clients()
+    text = attachments.ocr_attachments(inputs['attachments'], atlas.ocr_page,
+                                       inputs.get('page_workers', attachments.PAGE_WORKERS))
+    return { 'invoice_text': text, 'parsed_line_items': common.parse_line_items(text) }
+
+
 class OcrNlpNode(BaseNode):
-    def run(self, state: dict):
+    cpu_task = staticmethod(ocr_and_parse)
+
+    def cpu_inputs(self, state: dict):
         inv = state['invoice']
         pick = self.bigtool.select('ocr')
         self.log(inv['invoice_id'], 'UNDERSTAND', f"Bigtool selected: {pick}")
-        text = self.atlas.ocr(inv.get('attachments', [None])[0])
-        items = self.common.parse_line_items(text)
-        state['parsed_invoice'] = { 'invoice_text': text, 'parsed_line_items': items }
-        self.log(inv['invoice_id'], 'UNDERSTAND', 'Parsed line items')
+        return { 'attachments': list(inv.get('attachments') or []),
+                 'page_workers': self.config.get('ocr_page_workers', attachments.PAGE_WORKERS) }
+
+    def apply_cpu_result(self, state: dict, result: dict):
+        state['parsed_invoice'] = result
+        self.log(state['invoice']['invoice_id'], 'UNDERSTAND', 'Parsed line items')
         return state
 
+    def run(self, state: dict):
+        return self.apply_cpu_result(state, ocr_and_parse(self.cpu_inputs(state), self.atlas, self.common))
+
 
 class NormalizeEnrichNode(BaseNode):
     def run(self, state: dict):
         inv = state['invoice']
-        norm = self.common.normalize_vendor(inv.get('vendor_name',''))
+        norm = self.common.normalize_vendor(inv.get('vendor_name',''), inv.get('vendor_tax_id'))
         pick = self.bigtool.select('enrichment')
         self.log(inv['invoice_id'], 'PREPARE', f"Bigtool selected for enrichment: {pick}")
-        enrich = self.atlas.enrich_vendor(inv.get('vendor_name',''))
-        state['vendor_profile'] = { **norm, **enrich }
+        # Enrich by canonical name so spelling variants share one vendor
+        enrich = self.atlas.enrich_vendor(norm['normalized_name'])
+        state['vendor_profile'] = { **enrich, **{k: v for k, v in norm.items() if v is not None} }
         state['normalized_invoice'] = { 'amount': inv.get('amount'), 'currency': inv.get('currency'), 'line_items': state.get('parsed_invoice',{}).get('parsed_line_items',[]) }
         state['flags'] = self.common.compute_flags(state['normalized_invoice'])
         self.log(inv['invoice_id'], 'PREPARE', 'Vendor normalized and enriched')
@@ -55,7 +122,8 @@ class ErpFetchNode(BaseNode):
         inv = state['invoice']
         pick = self.bigtool.select('erp_connector')
         self.log(inv['invoice_id'], 'RETRIEVE', f"ERP tool picked: {pick}")
-        pos = self.atlas.fetch_pos(inv.get('vendor_name',''))
+        vendor = state.get('vendor_profile', {}).get('normalized_name') or inv.get('vendor_name','')
+        pos = self.atlas.fetch_pos(vendor)
         state['matched_pos'] = pos
         self.log(inv['invoice_id'], 'RETRIEVE', f"Fetched {len(pos)} PO(s)")
         return state
@@ -69,6 +137,8 @@ class TwoWayMatcherNode(BaseNode):
         state['match_score'] = score
         threshold = self.config.get('match_threshold', 0.9)
         state['match_result'] = 'MATCHED' if score >= threshold else 'FAILED'
+        vendor = state.get('vendor_profile', {}).get('normalized_name') or inv.get('vendor_name', '')
+        self.store.record_match(vendor, state['match_result'] == 'MATCHED', score)
         self.log(inv['invoice_id'], 'MATCH_TWO_WAY', f"Match score {score}, result {state['match_result']}")
         return state
 
@@ -77,7 +147,7 @@ class CheckpointNode(BaseNode):
     def run(self, state: dict):
         inv = state['invoice']
         checkpoint_id = str(uuid.uuid4())
-        db.save_checkpoint(self.conn, checkpoint_id, inv['invoice_id'], state)
+        self.store.save_checkpoint(checkpoint_id, inv['invoice_id'], state)
         self.log(inv['invoice_id'], 'CHECKPOINT_HITL', f"Checkpoint created {checkpoint_id}")
         state['checkpoint_id'] = checkpoint_id
         # Indicate paused state by returning a special key
@@ -87,7 +157,17 @@ class CheckpointNode(BaseNode):
 
 class HumanReviewNode(BaseNode):
     def run(self, state: dict):
-        # For demo, decision is read from DB (this node not used in runner since runner polls)
+        # The runner collects the decision (auto or by polling the DB) into
+        # state['human_decision']; REJECT is routed to END by workflow.json.
+        inv = state['invoice']
+        decision = (state.get('human_decision') or '').upper()
+        reviewer = state.get('reviewer_id')
+        if decision == 'REJECT':
+            print('Human rejected the invoice. Finalizing with status REQUIRES_MANUAL_HANDLING')
+            state['final_payload'] = { 'invoice_id': inv['invoice_id'], 'status': 'REQUIRES_MANUAL_HANDLING' }
+            self.log(inv['invoice_id'], 'HITL_DECISION', f'Rejected by reviewer {reviewer}')
+        elif decision:
+            self.log(inv['invoice_id'], 'HITL_DECISION', f'Decision {decision} by reviewer {reviewer}')
         return state
 
 
@@ -117,6 +197,10 @@ class PostingNode(BaseNode):
         entries = state.get('accounting_entries', [])
         resp = self.atlas.post_to_erp(entries)
         state['posted'] = resp
+        raw_id = state['invoice'].get('raw_id')
+        if raw_id:
+            # Posted: a later run of this invoice is a duplicate even if this one dies before returning
+            self.store.confirm_invoice(raw_id)
         self.log(state['invoice']['invoice_id'], 'POSTING', f"Posted to ERP: {resp}")
         return state
 
@@ -0,0 +1,101 @@
+"""
+Opt-in cProfile / tracemalloc hooks for workflow runs.
+
+A WorkflowProfiler decides per invoice whether to sample it. For sampled
+runs every stage is profiled separately and the results are written to
+`<out_dir>/<invoice_id>-<timestamp>/`:
+
+- `<NN>_<STAGE>.prof`  raw cProfile stats (load with `pstats` or snakeviz)
+- `summary.txt`        top functions by cumulative time, per stage
+- `memory.txt`         top allocation sites per stage (with trace_memory)
+
+Only the runner thread is profiled; work handed to thread pools (e.g.
+hedged adapter calls) shows up as waiting time in the stage.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_OUT_DIR = os.path.join('artifacts', 'profiles')
+
+
+class WorkflowProfiler:
+    def __init__(self, profile: bool = True, trace_memory: bool = False, sample_rate: float = 1.0,
+                 out_dir: str = DEFAULT_OUT_DIR, top_n: int = 25, rng: random.Random = None):
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.sample_rate = sample_rate
+        self.out_dir = out_dir
+        self.top_n = top_n
+        self._rng = rng or random.Random()
+
+    def begin(self, invoice_id: str):
+        """Return a ProfileRun for this invoice, or None if it is not sampled."""
+        if not (self.profile or self.trace_memory):
+            return None
+        if self.sample_rate < 1.0 and self._rng.random() >= self.sample_rate:
+            return None
+        return ProfileRun(self, invoice_id)
+
+
+class ProfileRun:
+    def __init__(self, profiler: WorkflowProfiler, invoice_id: str):
+        self.profiler = profiler
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(invoice_id))
+        self.dir = os.path.join(profiler.out_dir, f"{safe_id}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}")
+        self._summaries = []
+        self._memory = []
+        self._started_tracemalloc = False
+        if profiler.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    @contextmanager
+    def stage(self, stage_id: str):
+        os.makedirs(self.dir, exist_ok=True)
+        index = len(self._summaries) + 1
+        prof = cProfile.Profile() if self.profiler.profile else None
+        before = tracemalloc.take_snapshot() if self.profiler.trace_memory else None
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+                prof.dump_stats(os.path.join(self.dir, f"{index:02d}_{stage_id}.prof"))
+                buf = io.StringIO()
+                pstats.Stats(prof, stream=buf).sort_stats('cumulative').print_stats(self.profiler.top_n)
+                self._summaries.append((stage_id, buf.getvalue()))
+            else:
+                self._summaries.append((stage_id, ''))
+            if before is not None:
+                after = tracemalloc.take_snapshot()
+                filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+                diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+                self._memory.append((stage_id, diff[:self.profiler.top_n]))
+
+    def finish(self):
+        """Write the per-stage summaries and release tracemalloc if we started it."""
+        os.makedirs(self.dir, exist_ok=True)
+        if self.profiler.profile:
+            with open(os.path.join(self.dir, 'summary.txt'), 'w', encoding='utf-8') as f:
+                for stage_id, text in self._summaries:
+                    f.write(f"===== {stage_id} =====\n{text}\n")
+        if self.profiler.trace_memory:
+            with open(os.path.join(self.dir, 'memory.txt'), 'w', encoding='utf-8') as f:
+                for stage_id, stats in self._memory:
+                    f.write(f"===== {stage_id} =====\n")
+                    for stat in stats:
+                        f.write(f"{stat}\n")
+                    f.write('\n')
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return self.dir
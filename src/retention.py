@@ -0,0 +1,196 @@
+"""
+Time-based retention for the workflow database.
+
+Rows older than a per-table age are copied to compressed monthly archive
+files and then deleted from the live database in small batches, each its
+own short transaction, so runners, workers and the review API keep writing
+in between. Space is handed back with `PRAGMA incremental_vacuum` instead
+of a full VACUUM, which would lock the whole database and rewrite it.
+
+Ages come from `retention_days` in the workflow.json config (overridden by
+`--days table=N`); tables without an age are left alone. Paused checkpoints
+and jobs that are still queued, leased or waiting are never removed, nor
+are 'decided' checkpoint changes a Parquet history export has not read
+yet (db.CREATE_EXPORT_MARKS_SQL; delete a directory's mark to stop
+holding rows for it). The
+reporting rollups (db.CREATE_ROLLUP_SQL) are kept, so /stats still covers
+purged history.
+
+Archives are gzip JSON lines, one file per table and month of the row's
+timestamp: `<archive_dir>/<table>/<YYYY-MM>.jsonl.gz`. Each batch is
+appended as a new gzip member and fsynced before its rows are deleted, so
+a crash can repeat rows in an archive but never lose them.
+
+    python -m src retention [--db demo.db] [--days audit_log=30] [--dry-run]
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+
+from src import db
+
+# table -> (timestamp column, condition a row must also meet to be removed)
+RETENTION_TABLES = {
+    'audit_log': ('ts', ''),
+    'checkpoints': ('updated_at', "status != 'PAUSED'"),
+    'checkpoint_changes': ('ts', "(event != 'decided' OR seq <= COALESCE((SELECT MIN(last_key) FROM export_marks "
+                                 "WHERE name LIKE 'decisions:%'), seq))"),
+    'jobs': ('updated_at', "status IN ('done', 'failed')"),
+}
+DEFAULT_RETENTION_DAYS = {'audit_log': 90, 'checkpoints': 180, 'checkpoint_changes': 7, 'jobs': 30}
+BATCH_SIZE = 500
+# Free pages returned to the filesystem per incremental_vacuum call
+VACUUM_PAGES = 2000
+
+
+def retention_days(overrides=None) -> dict:
+    """Age in days per table: workflow.json `retention_days` over the defaults, then `overrides`."""
+    from src.workflow_plan import workflow_config
+    days = dict(DEFAULT_RETENTION_DAYS)
+    days.update(workflow_config().get('retention_days') or {})
+    days.update(overrides or {})
+    unknown = set(days) - set(RETENTION_TABLES)
+    if unknown:
+        raise ValueError(f"no retention rule for table(s): {', '.join(sorted(unknown))}")
+    return {table: age for table, age in days.items() if age is not None}
+
+
+def archive_path(archive_dir: str, table: str, ts: float) -> str:
+    return os.path.join(archive_dir, table, time.strftime('%Y-%m', time.gmtime(ts or 0)) + '.jsonl.gz')
+
+
+def _archive(archive_dir, table, columns, rows, ts_index):
+    by_file = {}
+    for row in rows:
+        by_file.setdefault(archive_path(archive_dir, table, row[ts_index]), []).append(row)
+    for path, month in by_file.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in month).encode('utf-8')
+        with open(path, 'ab') as f:
+            f.write(gzip.compress(data))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def purge_table(conn, table: str, older_than: float, archive_dir=None, batch_size: int = BATCH_SIZE,
+                pause: float = 0.0) -> int:
+    """Archive (unless `archive_dir` is None) and delete rows of `table` last touched before `older_than`.
+
+    Works in batches of `batch_size` rows, committing after each and
+    sleeping `pause` seconds in between. Returns the number of rows deleted.
+    """
+    ts_column, condition = RETENTION_TABLES[table]
+    where = f"{ts_column} < ?" + (f" AND {condition}" if condition else '')
+    cur = conn.cursor()
+    deleted = 0
+    while True:
+        cur.execute(f"SELECT rowid, * FROM {table} WHERE {where} ORDER BY rowid LIMIT ?", (older_than, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            return deleted
+        if archive_dir is not None:
+            columns = [d[0] for d in cur.description][1:]
+            _archive(archive_dir, table, columns, [r[1:] for r in rows], columns.index(ts_column))
+        cur.executemany(f"DELETE FROM {table} WHERE rowid=?", [(r[0],) for r in rows])
+        conn.commit()
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def count_expired(conn, table: str, older_than: float) -> int:
+    ts_column, condition = RETENTION_TABLES[table]
+    where = f"{ts_column} < ?" + (f" AND {condition}" if condition else '')
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", (older_than,)).fetchone()[0]
+
+
+def incremental_vacuum(conn, pages: int = VACUUM_PAGES) -> int:
+    """Return up to `pages` free pages to the filesystem; the number released.
+
+    Only databases created with auto_vacuum=INCREMENTAL (db.init_db does so
+    for new files) can shrink this way; see enable_incremental_vacuum.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # executescript steps the pragma to completion; execute() frees one page
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def enable_incremental_vacuum(conn):
+    """Switch an older database to auto_vacuum=INCREMENTAL: one full VACUUM, locking the database while it runs."""
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def apply_retention(conn, days: dict, archive_dir=None, batch_size: int = BATCH_SIZE, pause: float = 0.0,
+                    now=None) -> dict:
+    """Purge every table in `days` ({table: age in days}); {table: rows deleted}, then space is vacuumed."""
+    now = time.time() if now is None else now
+    purged = {table: purge_table(conn, table, now - age * 86400, archive_dir, batch_size, pause)
+              for table, age in days.items()}
+    if any(purged.values()):
+        # A few thousand pages at a time, so each write lock is short
+        while incremental_vacuum(conn) >= VACUUM_PAGES:
+            if pause:
+                time.sleep(pause)
+    return purged
+
+
+def _days_arg(value):
+    table, _, age = value.partition('=')
+    if table not in RETENTION_TABLES or not age:
+        raise argparse.ArgumentTypeError(f"expected TABLE=DAYS with TABLE one of {', '.join(RETENTION_TABLES)}")
+    return table, None if age == 'keep' else float(age)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m src retention', description='Archive and delete old rows.')
+    ap.add_argument('--db', dest='db_path', default=None, help='SQLite database (default: db.DB_PATH)')
+    ap.add_argument('--days', type=_days_arg, action='append', default=[], metavar='TABLE=DAYS',
+                    help="age limit for one table, or TABLE=keep (repeatable; default: workflow.json retention_days)")
+    ap.add_argument('--only', choices=sorted(RETENTION_TABLES), action='append', help='purge just these tables')
+    ap.add_argument('--archive-dir', default=None, help='default: archive/ next to the database')
+    ap.add_argument('--no-archive', action='store_true', help='delete without archiving')
+    ap.add_argument('--batch', type=int, default=BATCH_SIZE, help='rows per delete transaction')
+    ap.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between batches')
+    ap.add_argument('--dry-run', action='store_true', help='only count the rows that would go')
+    ap.add_argument('--enable-incremental-vacuum', action='store_true',
+                    help='convert an older database first (one full VACUUM)')
+    args = ap.parse_args(argv)
+
+    try:
+        days = retention_days(dict(args.days))
+    except ValueError as e:
+        ap.error(str(e))
+    if args.only:
+        days = {table: age for table, age in days.items() if table in args.only}
+    path = args.db_path or db.DB_PATH
+    if '://' in path:
+        ap.error('retention works on SQLite files; use the database\'s own partitioning for other stores')
+    archive_dir = None if args.no_archive else (args.archive_dir or os.path.join(os.path.dirname(os.path.abspath(path)), 'archive'))
+    conn = db.init_db(path)
+    try:
+        if args.dry_run:
+            now = time.time()
+            for table, age in days.items():
+                print(f"{table:<20}{count_expired(conn, table, now - age * 86400):>10} row(s) older than {age:g} day(s)")
+            return 0
+        if args.enable_incremental_vacuum:
+            enable_incremental_vacuum(conn)
+        purged = apply_retention(conn, days, archive_dir, args.batch, args.pause)
+        for table, count in purged.items():
+            print(f"{table:<20}{count:>10} row(s) purged")
+        if archive_dir is not None and any(purged.values()):
+            print('Archived to', archive_dir)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print('Freed pages are reused by new rows; run with --enable-incremental-vacuum once to shrink the file.')
+    finally:
+        conn.close()
+    return 0
@@ -1,12 +1,16 @@
-import sys
 import json
 import time
 import uuid
 import os
-from src import db
+from contextlib import nullcontext
+from types import MappingProxyType
+from src.store import open_store
+from src import cpu_pool
 from src import nodes
-
-WORKFLOW_PATH = os.path.join(os.path.dirname(__file__), '..', 'workflow.json')
+from src import metrics
+from src.logging_utils import WorkflowLogger, start_event_sink
+from src.schema import validate_batch
+from src.workflow_plan import WORKFLOW_PATH, get_plan
 
 NODE_MAP = {
     'IngestNode': nodes.IngestNode,
@@ -29,71 +33,222 @@ def load_workflow():
         return json.load(f)
 
 
-def run_workflow(invoice_obj, db_path=None, auto_decide=True, decision_delay=2):
-    wf = load_workflow()
-    config = wf.get('config', {})
-    conn = db.init_db(db_path)
-    state = { 'invoice': invoice_obj }
-    # Simple sequential runner
-    for stage in wf['stages']:
-        stage_id = stage['id']
-        agent_name = stage['agent']
-        AgentCls = NODE_MAP.get(agent_name)
-        if not AgentCls:
-            print(f"No agent found for {agent_name}, skipping")
-            continue
-        agent = AgentCls(conn, config)
-        print(f"==> Running stage {stage_id} ({agent_name})")
-        state = agent.run(state)
-        # If checkpointed and paused, break and wait for decision
-        if state.get('paused'):
-            checkpoint_id = state.get('checkpoint_id')
-            print(f"Workflow paused at checkpoint {checkpoint_id}")
-            # In a production scenario we'd notify human review queue and return.
-            # For demo, either poll DB or auto-resolve after delay.
-            if auto_decide:
-                print(f"Auto-decision will be applied in {decision_delay}s (ACCEPT)")
-                time.sleep(decision_delay)
-                db.save_decision(conn, checkpoint_id, 'demo_reviewer', 'ACCEPT')
-                print("Decision saved: ACCEPT")
-                db.mark_completed(conn, checkpoint_id)
-                # continue processing: assume ACCEPT -> next stage is RECONCILE
-                state.pop('paused', None)
+def load_plan():
+    """Compiled workflow plan (cached until workflow.json changes)."""
+    return get_plan(WORKFLOW_PATH, NODE_MAP)
+
+
+def run_workflow(invoice_obj, db_path=None, auto_decide=True, decision_delay=2, profiler=None, plan=None,
+                 inputs_validated=False, wait_for_decision=True):
+    """Run one invoice through all stages.
+
+    `profiler` is an optional `src.profiling.WorkflowProfiler`; sampled runs
+    write per-stage cProfile/tracemalloc output under its out_dir.
+    `plan` overrides the compiled workflow.json plan. `inputs_validated`
+    skips the INTAKE schema check for invoices already validated in bulk.
+    With `wait_for_decision=False` (and no auto decision) the run returns as
+    soon as it pauses at a checkpoint, with final_payload status PAUSED;
+    `resume_workflow()` continues it once a decision has been saved.
+    """
+    started = time.perf_counter()
+    prun = profiler.begin(invoice_obj.get('invoice_id', 'unknown')) if profiler else None
+    try:
+        return _run_stages(invoice_obj, db_path, auto_decide, decision_delay, prun, plan, inputs_validated,
+                           wait_for_decision)
+    finally:
+        metrics.WORKFLOW_WALL.observe(time.perf_counter() - started)
+        if prun:
+            print(f"Profile written to {prun.finish()}")
+
+
+def resume_workflow(checkpoint_id, db_path=None, plan=None, paused_at=None):
+    """Continue a run parked at `checkpoint_id` after its human decision was saved.
+
+    Execution picks up after stage `paused_at` (default: the first
+    CheckpointNode stage) with the checkpointed state.
+    """
+    plan = plan or load_plan()
+    store = open_store(db_path)
+    try:
+        cp = store.fetch_checkpoint(checkpoint_id)
+    finally:
+        store.close()
+    if not cp:
+        raise KeyError(f"Unknown checkpoint {checkpoint_id}")
+    if cp['status'] not in ('DECIDED', 'COMPLETED'):
+        raise ValueError(f"Checkpoint {checkpoint_id} has no decision yet (status {cp['status']})")
+    if paused_at is None:
+        paused_at = next(s.id for s in plan.stages if s.agent_cls is nodes.CheckpointNode)
+    state = cp['state']
+    state.update(checkpoint_id=checkpoint_id, human_decision=(cp.get('decision') or '').upper(),
+                 reviewer_id=cp.get('reviewer_id'))
+    state.pop('paused', None)
+    started = time.perf_counter()
+    try:
+        return _run_stages(state['invoice'], db_path, False, 0, plan=plan, state=state,
+                           start=plan.stage(paused_at).next_index(state))
+    finally:
+        metrics.WORKFLOW_WALL.observe(time.perf_counter() - started)
+
+
+def _profiled(prun, stage_id):
+    return prun.stage(stage_id) if prun else nullcontext()
+
+
+def _confirm_intake(store, state):
+    # The run got through: its pending dedup entry (see src/dedup.py) now marks a real duplicate
+    raw_id = state.get('invoice', {}).get('raw_id')
+    if raw_id:
+        store.confirm_invoice(raw_id)
+
+
+def _run_stages(invoice_obj, db_path, auto_decide, decision_delay, prun=None, plan=None, inputs_validated=False,
+                wait_for_decision=True, state=None, start=0):
+    with _profiled(prun, 'SETUP'):
+        plan = plan or load_plan()
+        # Nodes see the plan's config plus its compiled inputs schema (IngestNode)
+        config = MappingProxyType({**plan.config, 'validate_input': plan.validate_input})
+        store = open_store(db_path)
+    try:
+        state = state if state is not None else { 'invoice': invoice_obj }
+        if inputs_validated:
+            state['inputs_validated'] = True
+        wlog = WorkflowLogger(invoice_obj.get('invoice_id', 'unknown'))
+        # Sequential runner driven by the plan's triggers and routes
+        i = start
+        while i < len(plan.stages):
+            stage = plan.stages[i]
+            stage_id = stage.id
+            agent_name = stage.agent_name
+            if not stage.should_run(state):
+                print(f"==> Skipping stage {stage_id} (trigger_condition false: {stage.trigger_source})")
+                wlog.log_stage_end(stage_id, status='SKIPPED')
+                i = stage.default_next
                 continue
-            else:
-                print("Waiting for human decision (external)")
-                # poll until decision exists (accept DECIDED or COMPLETED statuses)
-                while True:
-                    pending = db.fetch_checkpoint(conn, checkpoint_id)
-                    if pending and pending.get('status') in ('DECIDED', 'COMPLETED'):
-                        decision = pending.get('decision')
-                        print(f'Decision observed: {decision}; resuming')
-                        # Handle REJECT case: finalize workflow and stop
-                        if decision and decision.upper() == 'REJECT':
-                            print('Human rejected the invoice. Finalizing with status REQUIRES_MANUAL_HANDLING')
-                            # create final payload and exit
-                            state['final_payload'] = { 'invoice_id': state['invoice']['invoice_id'], 'status': 'REQUIRES_MANUAL_HANDLING' }
-                            # append audit
-                            db.append_audit(conn, state['invoice']['invoice_id'], 'HITL_DECISION', f'Rejected by reviewer {pending.get("reviewer_id")}')
-                            return state
-                        break
-                    time.sleep(1)
+            print(f"==> Running stage {stage_id} ({agent_name})")
+            wlog.log_stage_start(agent_name, stage_id)
+            with metrics.stage_timer(stage_id), _profiled(prun, stage_id):
+                agent = stage.agent_cls(store, config)
+                if stage.executor == 'process' and config.get('cpu_pool_workers'):
+                    state = agent.run_in_pool(state, cpu_pool.submitter(config['cpu_pool_workers']))
+                else:
+                    state = agent.run(state)
+            wlog.log_stage_end(stage_id)
+            # If checkpointed and paused, wait for decision; HITL_DECISION routes on it
+            if state.get('paused'):
+                checkpoint_id = state.get('checkpoint_id')
+                print(f"Workflow paused at checkpoint {checkpoint_id}")
+                # In a production scenario we'd notify human review queue and return.
+                # For demo, either poll DB or auto-resolve after delay.
+                if auto_decide:
+                    print(f"Auto-decision will be applied in {decision_delay}s (ACCEPT)")
+                    time.sleep(decision_delay)
+                    store.save_decision(checkpoint_id, 'demo_reviewer', 'ACCEPT')
+                    print("Decision saved: ACCEPT")
+                    store.mark_completed(checkpoint_id)
+                    state['human_decision'] = 'ACCEPT'
+                    state['reviewer_id'] = 'demo_reviewer'
+                elif not wait_for_decision:
+                    # Hand the run back; resume_workflow() picks it up after the decision
+                    print("Parked for human decision")
+                    state['paused_at'] = stage_id
+                    state['final_payload'] = { 'invoice_id': invoice_obj.get('invoice_id'), 'status': 'PAUSED',
+                                               'checkpoint_id': checkpoint_id }
+                    _confirm_intake(store, state)
+                    return state
+                else:
+                    print("Waiting for human decision (external)")
+                    # poll until decision exists (accept DECIDED or COMPLETED statuses)
+                    while True:
+                        pending = store.fetch_checkpoint(checkpoint_id)
+                        if pending and pending.get('status') in ('DECIDED', 'COMPLETED'):
+                            decision = (pending.get('decision') or '').upper()
+                            print(f'Decision observed: {decision}; resuming')
+                            state['human_decision'] = decision
+                            state['reviewer_id'] = pending.get('reviewer_id')
+                            break
+                        time.sleep(1)
                 state.pop('paused', None)
-                continue
-    print('Workflow finished. Final payload:')
-    print(json.dumps(state.get('final_payload', {}), indent=2))
-    return state
+            next_i = stage.next_index(state)
+            if next_i != stage.default_next:
+                target = plan.stages[next_i].id if next_i < len(plan.stages) else 'END'
+                print(f"==> Routing {stage_id} -> {target}")
+            i = next_i
+        print('Workflow finished. Final payload:')
+        print(json.dumps(state.get('final_payload', {}), indent=2))
+        _confirm_intake(store, state)
+        return state
+    finally:
+        store.close()
+
+
+def run_batch(invoices, db_path=None, auto_decide=True, decision_delay=0, profiler=None):
+    """Run several invoices in sequence and print a stage timing summary at the end.
+
+    The whole batch is validated against the inputs schema up front; invalid
+    invoices are quarantined in one transaction and never enter the stages.
+    """
+    plan = load_plan()
+    valid, rejected = validate_batch(plan.validate_input, invoices)
+    metrics.INPUTS_VALIDATED.inc('batch', amount=len(invoices))
+    if rejected:
+        store = open_store(db_path)
+        try:
+            nodes.quarantine_rejected(store, rejected, 'batch')
+        finally:
+            store.close()
+        print(f"Quarantined {len(rejected)} of {len(invoices)} invoice(s) failing schema validation; running {len(valid)}")
+    errors_by_id = {id(inv): errors for inv, errors in rejected}
+    results = []
+    for inv in invoices:
+        errors = errors_by_id.get(id(inv))
+        if errors:
+            invoice_id = inv.get('invoice_id', 'unknown') if isinstance(inv, dict) else 'unknown'
+            messages = [str(e) for e in errors]
+            results.append({ 'invoice': inv, 'validation_errors': messages,
+                             'final_payload': { 'invoice_id': invoice_id, 'status': 'QUARANTINED', 'errors': messages } })
+            continue
+        results.append(run_workflow(inv, db_path, auto_decide=auto_decide, decision_delay=decision_delay,
+                                    profiler=profiler, plan=plan, inputs_validated=True))
+    print('Batch timing summary (ms):')
+    print(metrics.summary())
+    return results
+
+
+def _load_invoices(paths):
+    invoices = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        invoices.extend(data if isinstance(data, list) else [data])
+    return invoices
+
+
+def _build_profiler(args):
+    if not (args.profile or args.trace_memory):
+        return None
+    from src.profiling import WorkflowProfiler
+    return WorkflowProfiler(profile=args.profile, trace_memory=args.trace_memory,
+                            sample_rate=args.profile_sample, out_dir=args.profile_dir)
 
 
 if __name__ == '__main__':
-    # Simple CLI: python -m src.runner <invoice.json> [--no-auto]
-    if len(sys.argv) < 2:
-        print('Usage: python -m src.runner <invoice.json> [--no-auto]')
-        sys.exit(2)
-    invoice_path = sys.argv[1]
-    auto_decide = True
-    if '--no-auto' in sys.argv or '--manual' in sys.argv:
-        auto_decide = False
-    with open(invoice_path, 'r', encoding='utf-8') as f:
-        inv = json.load(f)
-    run_workflow(inv, auto_decide=auto_decide)
+    # Simple CLI: python -m src.runner <invoice.json> [more.json ...] [--no-auto]
+    # Several files, or a file holding a JSON list, run as a batch.
+    import argparse
+    ap = argparse.ArgumentParser(prog='python -m src.runner')
+    ap.add_argument('invoices', nargs='+', help='invoice JSON file(s); a file may hold a JSON list')
+    ap.add_argument('--no-auto', '--manual', dest='auto_decide', action='store_false',
+                    help='wait for an external HITL decision instead of auto-accepting')
+    ap.add_argument('--profile', action='store_true', help='write per-stage cProfile stats')
+    ap.add_argument('--trace-memory', action='store_true', help='write per-stage tracemalloc top allocations')
+    ap.add_argument('--profile-sample', type=float, default=1.0, help='fraction of invoices to profile (0-1)')
+    ap.add_argument('--profile-dir', default=os.path.join('artifacts', 'profiles'))
+    args = ap.parse_args()
+    invoices = _load_invoices(args.invoices)
+    profiler = _build_profiler(args)
+    start_event_sink()
+    if len(invoices) == 1:
+        run_workflow(invoices[0], auto_decide=args.auto_decide, profiler=profiler)
+    else:
+        run_batch(invoices, auto_decide=args.auto_decide, profiler=profiler)
@@ -0,0 +1,172 @@
+"""
+Precompiled JSON-schema validator for invoice inputs.
+
+`compile_schema()` walks a schema once (the `inputs` section of
+workflow.json) and returns a `validate(obj) -> [SchemaError, ...]`
+closure, so each check is a direct type test per field instead of
+re-interpreting the schema on every call.
+
+Supported keywords: type (object/array/string/number/integer/boolean/null,
+or a list of them), properties, required, items, enum, format (date,
+date-time), minimum/maximum, minLength and minItems. Unknown keywords are
+ignored.
+"""
+import datetime
+from typing import Callable, List, NamedTuple
+
+
+class SchemaError(NamedTuple):
+    path: str
+    reason: str  # required | type | enum | format | range | length
+    message: str
+
+    def __str__(self):
+        return f"{self.path or '$'}: {self.message}"
+
+
+_TYPES = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+
+def _is_date(v):
+    try:
+        datetime.date.fromisoformat(v)
+        return True
+    except ValueError:
+        return False
+
+
+def _is_datetime(v):
+    try:
+        datetime.datetime.fromisoformat(v.replace('Z', '+00:00'))
+        return True
+    except ValueError:
+        return False
+
+
+_FORMATS = {'date': _is_date, 'date-time': _is_datetime}
+
+
+def _join(path, key):
+    return f"{path}.{key}" if path else key
+
+
+def _compile(schema: dict) -> Callable:
+    """Return check(value, path, errors) for one schema node."""
+    checks = []
+
+    types = schema.get('type')
+    if types:
+        names = (types,) if isinstance(types, str) else tuple(types)
+        unknown = [t for t in names if t not in _TYPES]
+        if unknown:
+            raise ValueError(f"Unsupported schema type(s): {unknown}")
+        tests = tuple(_TYPES[t] for t in names)
+        expected = '|'.join(names)
+
+        def check_type(value, path, errors):
+            if not any(t(value) for t in tests):
+                errors.append(SchemaError(path, 'type', f"expected {expected}, got {type(value).__name__}"))
+                return False
+            return True
+        checks.append(check_type)
+
+    if 'enum' in schema:
+        allowed = tuple(schema['enum'])
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append(SchemaError(path, 'enum', f"{value!r} not in {list(allowed)}"))
+            return True
+        checks.append(check_enum)
+
+    fmt = _FORMATS.get(schema.get('format'))
+    if fmt:
+        fmt_name = schema['format']
+
+        def check_format(value, path, errors):
+            if isinstance(value, str) and not fmt(value):
+                errors.append(SchemaError(path, 'format', f"{value!r} is not a valid {fmt_name}"))
+            return True
+        checks.append(check_format)
+
+    lo, hi = schema.get('minimum'), schema.get('maximum')
+    if lo is not None or hi is not None:
+        def check_range(value, path, errors):
+            if _TYPES['number'](value) and ((lo is not None and value < lo) or (hi is not None and value > hi)):
+                errors.append(SchemaError(path, 'range', f"{value} outside [{lo}, {hi}]"))
+            return True
+        checks.append(check_range)
+
+    min_len = schema.get('minLength', schema.get('minItems'))
+    if min_len is not None:
+        def check_length(value, path, errors):
+            if isinstance(value, (str, list)) and len(value) < min_len:
+                errors.append(SchemaError(path, 'length', f"length {len(value)} < {min_len}"))
+            return True
+        checks.append(check_length)
+
+    required = tuple(schema.get('required') or ())
+    props = tuple((k, _compile(v)) for k, v in (schema.get('properties') or {}).items())
+    if required or props:
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return True
+            for key in required:
+                if key not in value or value[key] is None:
+                    errors.append(SchemaError(_join(path, key), 'required', 'is required'))
+            for key, sub in props:
+                if key in value and value[key] is not None:
+                    sub(value[key], _join(path, key), errors)
+            return True
+        checks.append(check_object)
+
+    items = schema.get('items')
+    if isinstance(items, dict):
+        item_check = _compile(items)
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    item_check(item, f"{path}[{i}]", errors)
+            return True
+        checks.append(check_items)
+
+    checks = tuple(checks)
+
+    def check(value, path, errors):
+        for c in checks:
+            # A failed type check makes the remaining keyword checks meaningless
+            if c(value, path, errors) is False:
+                return
+    return check
+
+
+def compile_schema(schema: dict) -> Callable[[object], List[SchemaError]]:
+    """Compile `schema` into `validate(obj) -> list of SchemaError` (empty when valid)."""
+    root = _compile(schema or {})
+
+    def validate(obj) -> List[SchemaError]:
+        errors = []
+        root(obj, '', errors)
+        return errors
+    return validate
+
+
+def validate_batch(validate: Callable, items) -> tuple:
+    """Split `items` into `(valid, rejected)`; rejected is a list of `(item, errors)`."""
+    valid, rejected = [], []
+    for item in items:
+        errors = validate(item)
+        if errors:
+            rejected.append((item, errors))
+        else:
+            valid.append(item)
+    return valid, rejected
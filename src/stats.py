@@ -0,0 +1,49 @@
+"""
+Reporting from the rollup tables (see db.CREATE_ROLLUP_SQL).
+
+`python -m src stats` prints throughput per stage and hour, vendor match
+rates, reviewer turnaround and turnaround quantiles. The rollups are kept
+up to date by the writes themselves, so this reads a few small tables
+however long the audit history is; GET /stats serves the same dict.
+"""
+import argparse
+import json
+
+from src.store import open_store
+
+
+def print_stats(stats: dict):
+    print(f"Last {stats['hours']}h invoices per stage:")
+    for stage, invoices in stats['stage_invoices'].items():
+        print(f"  {stage:<18}{invoices:>8}")
+    if stats['vendors']:
+        print(f"{'vendor':<30}{'invoices':>10}{'match rate':>12}{'avg score':>11}")
+        for v in stats['vendors']:
+            print(f"{(v['vendor'] or '')[:29]:<30}{v['invoices']:>10}{v['match_rate']:>12.1%}{v['avg_score']:>11.3f}")
+    if stats['reviewers']:
+        print(f"{'reviewer':<20}{'decisions':>10}{'accepted':>10}{'mean s':>10}{'max s':>10}")
+        for r in stats['reviewers']:
+            print(f"{r['reviewer_id'][:19]:<20}{r['decisions']:>10}{r['accepted']:>10}"
+                  f"{r['mean_turnaround_s']:>10.1f}{r['max_turnaround_s']:>10.1f}")
+    t = stats['turnaround']
+    if t['decisions']:
+        print(f"Turnaround over {t['decisions']} decision(s): p50 ~{t['p50_s']:.1f}s, p90 ~{t['p90_s']:.1f}s")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m src stats', description='Throughput and decision analytics.')
+    ap.add_argument('--db', dest='db_path', default=None)
+    ap.add_argument('--hours', type=int, default=24, help='hourly throughput window')
+    ap.add_argument('--vendors', type=int, default=20, help='vendors listed, by invoice count')
+    ap.add_argument('--json', action='store_true', help='print the raw stats as JSON')
+    args = ap.parse_args(argv)
+    store = open_store(args.db_path)
+    try:
+        stats = store.read_stats(max(args.hours, 1), args.vendors)
+    finally:
+        store.close()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print_stats(stats)
+    return 0
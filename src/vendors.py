@@ -0,0 +1,214 @@
+"""
+Vendor master index with fuzzy name resolution.
+
+Every vendor is stored once with its normalized name (lowercase ASCII,
+punctuation and trailing legal suffixes removed) and the set of character
+trigrams of that name. Lookups go through:
+
+1. exact normalized name / alias / tax id -> dict hit
+2. trigram inverted index with prefix filtering: a vendor whose Jaccard
+   similarity with the query is >= threshold must contain one of the
+   query's rarest `len(q') - ceil(threshold * len(q)) + 1` indexed trigrams
+   (q' = query trigrams present in the index), so only those posting lists
+   (plus EXTRA_PREFIX more, to demand a second hit) are read. Surviving
+   candidates are then scored exactly;
+   numeric tokens ("Store 12" vs "Store 13") must match exactly.
+
+so resolution cost depends on the posting lists touched, not on the size
+of the master. `get_vendor_index()` returns the process-wide index, loaded
+from VENDOR_MASTER_PATH (JSON list of {vendor_id, name, tax_id, aliases})
+when that file exists.
+
+Vendor ids not given by the master are derived from the normalized name
+(vendor_id_for), so every process and every run agrees on them; they end
+up in vendor_profile and checkpoint state. Vendors that resolve to
+nothing (resolve_or_add) are remembered apart from the master, by exact
+normalized name only and at most `max_learned` of them: a misspelling
+seen first never becomes the canonical vendor others are fuzzy-matched
+to, and a stream of one-off names cannot grow the index without bound.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from itertools import chain
+from typing import NamedTuple, Optional
+
+VENDOR_MASTER_PATH = os.environ.get(
+    'VENDOR_MASTER_PATH', os.path.join(os.path.dirname(__file__), '..', 'vendor_master.json'))
+DEFAULT_THRESHOLD = 0.7
+# Posting lists read beyond the prefix filter (see VendorIndex.resolve)
+EXTRA_PREFIX = 1
+# Vendors outside the master remembered by resolve_or_add (least recently used dropped first)
+MAX_LEARNED = 10_000
+
+LEGAL_SUFFIXES = {'inc', 'incorporated', 'ltd', 'limited', 'llc', 'llp', 'corp', 'corporation', 'co',
+                  'company', 'pvt', 'private', 'plc', 'gmbh', 'ag', 'sa', 'bv'}
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_DIGITS = re.compile(r'\d+')
+
+
+def normalize_vendor(name) -> str:
+    """'Acme Corp.' / 'ACME  Corporation' / 'Acmé, Inc' -> 'acme'."""
+    text = unicodedata.normalize('NFKD', str(name or '')).encode('ascii', 'ignore').decode('ascii').lower()
+    tokens = _NON_ALNUM.sub(' ', text).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return ' '.join(tokens)
+
+
+def trigrams(normalized: str) -> frozenset:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def vendor_id_for(normalized: str) -> str:
+    """Stable id for a vendor without one in the master: 'V' + 10 hex digits of SHA-1 of its normalized name."""
+    return 'V' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:10].upper()
+
+
+class VendorMatch(NamedTuple):
+    vendor_id: str
+    name: str
+    tax_id: Optional[str]
+    score: float  # 1.0 for exact / alias / tax id hits, else trigram Jaccard
+
+
+class VendorIndex:
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_learned: int = MAX_LEARNED):
+        self.threshold = threshold
+        self.max_learned = max_learned
+        self._ids = []        # position -> vendor_id
+        self._names = []      # position -> display name
+        self._tax_ids = []    # position -> tax id
+        self._grams = []      # position -> frozenset of trigrams
+        self._numbers = []    # position -> tuple of numeric tokens
+        self._by_norm = {}    # normalized name or alias -> position
+        self._by_tax = {}     # tax id -> position
+        self._by_id = {}      # vendor_id -> position
+        self._postings = {}   # trigram -> [position, ...]
+        self._learned = OrderedDict()  # normalized name -> VendorMatch, outside the master
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, name: str, vendor_id: str = None, tax_id: str = None, aliases=()) -> str:
+        """Add a vendor (no-op if its normalized name is already known); returns its vendor_id."""
+        norm = normalize_vendor(name)
+        with self._lock:
+            pos = self._by_norm.get(norm)
+            if pos is not None:
+                return self._ids[pos]
+            pos = len(self._ids)
+            vendor_id = vendor_id or vendor_id_for(norm)
+            self._ids.append(vendor_id)
+            self._names.append(name.strip())
+            self._tax_ids.append(tax_id)
+            grams = trigrams(norm)
+            self._grams.append(grams)
+            self._numbers.append(tuple(_DIGITS.findall(norm)))
+            self._by_id[vendor_id] = pos
+            self._by_norm[norm] = pos
+            for alias in aliases or ():
+                self._by_norm.setdefault(normalize_vendor(alias), pos)
+            if tax_id:
+                self._by_tax.setdefault(tax_id, pos)
+            for g in grams:
+                self._postings.setdefault(g, []).append(pos)
+            return vendor_id
+
+    def _match(self, pos, score) -> VendorMatch:
+        return VendorMatch(self._ids[pos], self._names[pos], self._tax_ids[pos], score)
+
+    def get(self, vendor_id: str) -> Optional[VendorMatch]:
+        pos = self._by_id.get(vendor_id)
+        return None if pos is None else self._match(pos, 1.0)
+
+    def resolve(self, name: str, tax_id: str = None, threshold: float = None) -> Optional[VendorMatch]:
+        """Best vendor for `name` (or `tax_id`) with similarity >= threshold, else None."""
+        if tax_id and tax_id in self._by_tax:
+            return self._match(self._by_tax[tax_id], 1.0)
+        norm = normalize_vendor(name)
+        if not norm:
+            return None
+        pos = self._by_norm.get(norm)
+        if pos is not None:
+            return self._match(pos, 1.0)
+        threshold = self.threshold if threshold is None else threshold
+        query = trigrams(norm)
+        postings = self._postings
+        # A match needs >= threshold * |query| shared trigrams, all of them
+        # indexed ones, so it must hit one of the rarest `prefix` indexed grams.
+        ranked = sorted((g for g in query if g in postings), key=lambda g: len(postings[g]))
+        prefix = len(ranked) - math.ceil(threshold * len(query) - 1e-9) + 1
+        if prefix <= 0:
+            return None
+        lo, hi = threshold * len(query), (len(query) / threshold if threshold > 0 else math.inf)
+        # Reading `extra` more lists, a match must show up >= extra + 1 times;
+        # counting runs in C and leaves few candidates to score exactly.
+        extra = max(0, min(EXTRA_PREFIX, len(ranked) - prefix))
+        counts = Counter(chain.from_iterable(postings[g] for g in ranked[:prefix + extra]))
+        numbers = tuple(_DIGITS.findall(norm))
+        best_pos, best_score = None, 0.0
+        grams, cand_numbers = self._grams, self._numbers
+        for cand in ([c for c, hits in counts.items() if hits > extra] if extra else counts):
+            other = grams[cand]
+            if not lo <= len(other) <= hi or cand_numbers[cand] != numbers:
+                continue
+            inter = len(query & other)
+            score = inter / (len(query) + len(other) - inter)
+            if score > best_score:
+                best_pos, best_score = cand, score
+        if best_pos is None or best_score < threshold:
+            return None
+        return self._match(best_pos, round(best_score, 4))
+
+    def resolve_or_add(self, name: str, tax_id: str = None) -> VendorMatch:
+        """Resolve `name`; when nothing in the master is close enough, remember it as a learned vendor."""
+        match = self.resolve(name, tax_id)
+        if match:
+            return match
+        norm = normalize_vendor(name)
+        with self._lock:
+            match = self._learned.get(norm)
+            if match is not None:
+                self._learned.move_to_end(norm)
+                return match
+            match = VendorMatch(vendor_id_for(norm), str(name or '').strip(), tax_id, 1.0)
+            if self.max_learned > 0:
+                self._learned[norm] = match
+                while len(self._learned) > self.max_learned:
+                    self._learned.popitem(last=False)
+            return match
+
+    def learned_count(self) -> int:
+        return len(self._learned)
+
+    def load(self, path: str) -> int:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        for row in rows:
+            self.add(row['name'], row.get('vendor_id'), row.get('tax_id'), row.get('aliases') or ())
+        return len(rows)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vendor_index() -> VendorIndex:
+    """Process-wide vendor index, loaded from VENDOR_MASTER_PATH on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = VendorIndex()
+                if os.path.exists(VENDOR_MASTER_PATH):
+                    index.load(VENDOR_MASTER_PATH)
+                _index = index
+    return _index
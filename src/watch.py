@@ -0,0 +1,296 @@
+"""
+Spool-directory watcher.
+
+    python -m src watch /srv/invoices/incoming --workers 4
+
+A long-running process that keeps the workflow plan, vendor index and
+worker threads warm and picks up invoice files dropped into `<dir>`:
+
+- `*.json` files hold one invoice or a list of invoices. Attachments named
+  by bare filename (e.g. "INV-1.pdf") that sit in the spool are moved
+  straight to `<dir>/archive/` when their JSON file is claimed, and the
+  invoices point there: that path ends up in checkpoint state, so it must
+  stay valid after the run. PDFs without a JSON file are left alone.
+- A file is claimed by renaming it into `<dir>/.processing/`, which is
+  atomic on one filesystem, so several watchers can share a spool.
+  Files younger than `settle` seconds, and names starting with '.' or
+  ending in .tmp/.part, are skipped until the writer has finished.
+- When done, the JSON file moves to `<dir>/archive/`, or to `<dir>/error/`
+  if it could not be parsed or any invoice was quarantined or failed. One
+  result line per file is appended to `results.jsonl` in that directory.
+
+New files are noticed through watchdog (inotify/FSEvents/...) when that
+package is installed, otherwise by polling with os.scandir every
+`poll_interval` seconds. While a file is being processed its watcher
+touches it every `requeue_after / 4` seconds; claimed files left in
+.processing by a crashed watcher stop being touched and are returned to
+the spool once `requeue_after` seconds old.
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import metrics
+from src.ingest import Ingestor
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional: fall back to polling
+    Observer = None
+
+PROCESSING_DIR = '.processing'
+ARCHIVE_DIR = 'archive'
+ERROR_DIR = 'error'
+RESULTS_FILE = 'results.jsonl'
+TEMP_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload')
+
+
+def _is_candidate(name: str) -> bool:
+    return name.endswith('.json') and not name.startswith('.') and not name.endswith(TEMP_SUFFIXES)
+
+
+class SpoolWatcher:
+    def __init__(self, spool_dir: str, db_path=None, workers: int = 4, poll_interval: float = 1.0,
+                 settle: float = 1.0, requeue_after: float = 300.0, auto_decide: bool = True,
+                 decision_delay: float = 0.0, use_watchdog: bool = True):
+        self.spool = os.path.abspath(spool_dir)
+        self.processing = os.path.join(self.spool, PROCESSING_DIR)
+        self.archive = os.path.join(self.spool, ARCHIVE_DIR)
+        self.error = os.path.join(self.spool, ERROR_DIR)
+        for d in (self.processing, self.archive, self.error):
+            os.makedirs(d, exist_ok=True)
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.settle = settle
+        self.requeue_after = requeue_after
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.ingestor = Ingestor(db_path=db_path, auto_decide=auto_decide, decision_delay=decision_delay,
+                                 source='spool')
+        self.stats = {'archived': 0, 'error': 0}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # One slot per worker plus one queued, so idle watchers can claim the rest
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._lock = threading.Lock()
+        self._active = set()  # claimed files being worked on, touched by the heartbeat
+
+    # ---- claiming ----
+
+    def requeue_stale(self):
+        """Return files a crashed watcher left in .processing (no heartbeat for `requeue_after`) to the spool."""
+        now = time.time()
+        for entry in os.scandir(self.processing):
+            if entry.is_file() and now - entry.stat().st_mtime >= self.requeue_after:
+                with contextlib.suppress(OSError):
+                    os.rename(entry.path, os.path.join(self.spool, entry.name))
+
+    def _ready(self):
+        now = time.time()
+        entries = []
+        with os.scandir(self.spool) as it:
+            for entry in it:
+                if _is_candidate(entry.name) and entry.is_file():
+                    mtime = entry.stat().st_mtime
+                    if now - mtime >= self.settle:
+                        entries.append((mtime, entry.name))
+        return [name for _, name in sorted(entries)]
+
+    def _claim(self, name: str):
+        """Move `name` into .processing; None if another watcher got it first."""
+        dst = os.path.join(self.processing, name)
+        try:
+            os.rename(os.path.join(self.spool, name), dst)
+        except FileNotFoundError:
+            return None
+        os.utime(dst)  # claim time, for requeue_stale
+        with self._lock:
+            self._active.add(dst)
+        return dst
+
+    def heartbeat(self):
+        """Refresh the mtime of every claimed file still being processed, so requeue_stale leaves it alone."""
+        with self._lock:
+            active = list(self._active)
+        for path in active:
+            with contextlib.suppress(OSError):
+                os.utime(path)
+
+    def _heartbeat_loop(self, done: threading.Event):
+        interval = max(self.poll_interval, self.requeue_after / 4)
+        while not done.wait(interval):
+            self.heartbeat()
+
+    def _claim_attachments(self, invoices):
+        """Move bare-filename attachments found in the spool to archive/ and point the invoices there."""
+        moved = []
+        for inv in invoices:
+            if not isinstance(inv, dict):
+                continue
+            attachments = inv.get('attachments')
+            if not isinstance(attachments, list):
+                continue
+            for i, att in enumerate(attachments):
+                if not isinstance(att, str) or os.path.basename(att) != att:
+                    continue
+                src = os.path.join(self.spool, att)
+                dst = os.path.join(self.archive, att)
+                try:
+                    os.rename(src, dst)
+                except OSError:
+                    # Already archived by an earlier attempt at this file
+                    if not os.path.exists(dst):
+                        continue
+                if dst not in moved:
+                    moved.append(dst)
+                attachments[i] = dst
+        return moved
+
+    # ---- processing ----
+
+    def process_file(self, path: str) -> dict:
+        name = os.path.basename(path)
+        started = time.perf_counter()
+        result = {'file': name, 'results': []}
+        failed = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            try:
+                data = json.loads(text)
+            except ValueError as e:
+                result['results'].append(self.ingestor.quarantine_unparsable(text, e))
+                failed = True
+            else:
+                invoices = data if isinstance(data, list) else [data]
+                self._claim_attachments(invoices)
+                for inv in invoices:
+                    record = self.ingestor.process_invoice(inv)
+                    record.pop('final_payload', None)
+                    result['results'].append(record)
+                    failed = failed or record['status'] in ('QUARANTINED', 'FAILED')
+        except Exception as e:
+            result['error'] = f'{type(e).__name__}: {e}'
+            failed = True
+        outcome = 'error' if failed else 'archived'
+        dest = self.error if failed else self.archive
+        with contextlib.suppress(OSError):
+            os.replace(path, os.path.join(dest, name))
+        with self._lock:
+            self._active.discard(path)
+        result['outcome'] = outcome
+        result['duration_ms'] = round((time.perf_counter() - started) * 1e3, 3)
+        with self._lock:
+            with open(os.path.join(dest, RESULTS_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, default=str) + '\n')
+            self.stats[outcome] += 1
+        metrics.SPOOL_FILES.inc(outcome)
+        return result
+
+    def scan_once(self, pool) -> int:
+        """Claim and submit ready files while worker slots are free; returns how many were submitted."""
+        submitted = 0
+        for name in self._ready():
+            if self._stop.is_set() or not self._slots.acquire(blocking=False):
+                break
+            path = self._claim(name)
+            if path is None:
+                self._slots.release()
+                continue
+            future = pool.submit(self.process_file, path)
+            future.add_done_callback(lambda _f: self._slot_done())
+            submitted += 1
+        return submitted
+
+    def _slot_done(self):
+        self._slots.release()
+        self._wake.set()  # a slot freed up: look for more work
+
+    def _start_observer(self):
+        if not self.use_watchdog:
+            return None
+        wake = self._wake
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.spool, recursive=False)
+        observer.start()
+        return observer
+
+    def run(self, once: bool = False):
+        """Watch until stop() (or, with `once`, until the spool is drained)."""
+        self.requeue_stale()
+        observer = self._start_observer()
+        beat_done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat_loop, args=(beat_done,), name='spool-heartbeat', daemon=True)
+        beat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='spool-worker') as pool:
+                while not self._stop.is_set():
+                    self._wake.clear()
+                    submitted = self.scan_once(pool)
+                    if once and not submitted and self._slots_idle():
+                        break
+                    # Files still settling need a re-scan even without fs events
+                    self._wake.wait(self.poll_interval if not observer else max(self.poll_interval, self.settle))
+        finally:
+            beat_done.set()
+            beat.join()
+            if observer:
+                observer.stop()
+                observer.join()
+        return dict(self.stats)
+
+    def _slots_idle(self) -> bool:
+        # All slots free means nothing is queued or running
+        acquired = 0
+        try:
+            while self._slots.acquire(blocking=False):
+                acquired += 1
+            return acquired == self.workers * 2
+        finally:
+            for _ in range(acquired):
+                self._slots.release()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m src watch', description='Process invoice files dropped into a spool directory.')
+    ap.add_argument('spool', help='directory to watch')
+    ap.add_argument('--db', dest='db_path', default=None)
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--poll', type=float, default=1.0, help='scan interval in seconds (fallback without watchdog)')
+    ap.add_argument('--settle', type=float, default=1.0, help='ignore files modified within this many seconds')
+    ap.add_argument('--requeue-after', type=float, default=300.0,
+                    help='return claimed files not touched by their watcher for this long to the spool')
+    ap.add_argument('--no-auto', '--manual', dest='auto_decide', action='store_false')
+    ap.add_argument('--once', action='store_true', help='process what is there, then exit')
+    ap.add_argument('--verbose', action='store_true', help='keep per-stage workflow output')
+    args = ap.parse_args(argv)
+    watcher = SpoolWatcher(args.spool, db_path=args.db_path, workers=args.workers, poll_interval=args.poll,
+                           settle=args.settle, requeue_after=args.requeue_after, auto_decide=args.auto_decide)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: watcher.stop())
+    mode = 'watchdog' if watcher.use_watchdog else f'polling every {args.poll}s'
+    print(f"Watching {watcher.spool} ({mode}, {watcher.workers} workers); Ctrl+C to stop")
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        stats = watcher.run(once=args.once)
+    print(f"Stopped: {stats['archived']} file(s) archived, {stats['error']} moved to error/")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,386 @@
+"""
+Workflow compiler: turns workflow.json into an immutable, cached plan.
+
+`get_plan()` validates the workflow once, resolves every stage's agent to
+its node class, precompiles `trigger_condition` expressions into
+predicates over the run state and compiles the `inputs` schema into an
+invoice validator (see src/schema.py). The plan is cached per file and recompiled
+only when the file's mtime or size changes.
+
+Condition language (no eval):
+    expr       := or_expr
+    or_expr    := and_expr ('or' and_expr)*
+    and_expr   := not_expr ('and' not_expr)*
+    not_expr   := 'not' not_expr | comparison
+    comparison := operand (('<'|'<='|'>'|'>='|'=='|'!=') operand)?
+    operand    := number | 'string' | true | false | null | name.path | '(' expr ')'
+
+`config.<key>` names are folded to constants at compile time; any other
+dotted name is looked up in the state dict (`match_score`,
+`invoice.amount`, ...). Ordered comparisons against a missing value are
+False.
+
+Control flow: after a stage runs, its `routes` are tried in order and the
+first `{"when": <condition>, "goto": <stage id | "END">}` that holds picks
+the next stage; otherwise execution falls through to the next stage in
+the list. A stage reached with a false `trigger_condition` is skipped.
+"""
+import json
+import operator
+import os
+import re
+import threading
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Callable, Optional, Tuple
+
+from src.schema import compile_schema
+
+WORKFLOW_PATH = os.path.join(os.path.dirname(__file__), '..', 'workflow.json')
+END = 'END'
+
+
+class WorkflowCompileError(ValueError):
+    """workflow.json failed validation or a condition failed to parse."""
+
+
+# ============ Condition compiler ============
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<num>-?\d+(?:\.\d+)?)
+     |(?P<str>'[^']*'|"[^"]*")
+     |(?P<op><=|>=|==|!=|<|>|\(|\))
+     |(?P<name>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+    )""", re.VERBOSE)
+
+_COMPARATORS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne,
+}
+_KEYWORDS = {'and', 'or', 'not'}
+_LITERALS = {'true': True, 'false': False, 'null': None, 'None': None, 'True': True, 'False': False}
+_MISSING = object()
+
+
+def _tokenize(source: str):
+    tokens = []
+    pos = 0
+    source = source.rstrip()
+    while pos < len(source):
+        m = _TOKEN_RE.match(source, pos)
+        if not m or m.end() == pos:
+            raise WorkflowCompileError(f"Unexpected character at {pos} in condition {source!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+    return tokens
+
+
+def _state_getter(path: str) -> Callable:
+    keys = tuple(path.split('.'))
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda state: state.get(key, _MISSING)
+
+    def get(state):
+        cur = state
+        for k in keys:
+            if not isinstance(cur, dict) or k not in cur:
+                return _MISSING
+            cur = cur[k]
+        return cur
+    return get
+
+
+class _Parser:
+    def __init__(self, source: str, config: dict):
+        self.source = source
+        self.config = config
+        self.tokens = _tokenize(source)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        tok = self._peek()
+        self.pos += 1
+        return tok
+
+    def _error(self, msg):
+        return WorkflowCompileError(f"{msg} in condition {self.source!r}")
+
+    def parse(self) -> Callable:
+        fn = self._or()
+        if self.pos != len(self.tokens):
+            raise self._error(f"Unexpected token {self._peek()[1]!r}")
+        return fn
+
+    def _or(self):
+        parts = [self._and()]
+        while self._peek() == ('name', 'or'):
+            self._next()
+            parts.append(self._and())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda state: any(p(state) for p in parts)
+
+    def _and(self):
+        parts = [self._not()]
+        while self._peek() == ('name', 'and'):
+            self._next()
+            parts.append(self._not())
+        if len(parts) == 1:
+            return parts[0]
+        return lambda state: all(p(state) for p in parts)
+
+    def _not(self):
+        if self._peek() == ('name', 'not'):
+            self._next()
+            inner = self._not()
+            return lambda state: not inner(state)
+        return self._comparison()
+
+    def _comparison(self):
+        left = self._operand()
+        kind, value = self._peek()
+        if kind == 'op' and value in _COMPARATORS:
+            self._next()
+            right = self._operand()
+            return self._compare(_COMPARATORS[value], value in ('==', '!='), left, right)
+        # Bare operand: truthiness (missing -> False)
+        def truthy(state):
+            v = left(state)
+            return v is not _MISSING and bool(v)
+        return truthy
+
+    @staticmethod
+    def _compare(op, equality, left, right):
+        def cmp(state):
+            a, b = left(state), right(state)
+            if a is _MISSING or b is _MISSING:
+                return op is operator.ne if equality else False
+            try:
+                return op(a, b)
+            except TypeError:
+                return False
+        return cmp
+
+    def _operand(self):
+        kind, value = self._next()
+        if kind is None:
+            raise self._error('Unexpected end')
+        if kind == 'num':
+            const = float(value) if '.' in value else int(value)
+            return lambda state: const
+        if kind == 'str':
+            const = value[1:-1]
+            return lambda state: const
+        if kind == 'op' and value == '(':
+            inner = self._or()
+            if self._next() != ('op', ')'):
+                raise self._error("Expected ')'")
+            return inner
+        if kind == 'name':
+            if value in _KEYWORDS:
+                raise self._error(f"Unexpected keyword {value!r}")
+            if value in _LITERALS:
+                const = _LITERALS[value]
+                return lambda state: const
+            if value.startswith('config.'):
+                key = value[len('config.'):]
+                if key not in self.config:
+                    raise self._error(f"Unknown config key {key!r}")
+                const = self.config[key]
+                return lambda state: const
+            return _state_getter(value)
+        raise self._error(f"Unexpected token {value!r}")
+
+
+def compile_condition(source: str, config: dict) -> Callable[[dict], bool]:
+    """Compile a condition string into `predicate(state) -> bool`."""
+    return _Parser(source, config).parse()
+
+
+# ============ Plan ============
+
+@dataclass(frozen=True)
+class CompiledStage:
+    id: str
+    index: int
+    agent_name: str
+    agent_cls: type
+    mode: str
+    trigger_source: Optional[str] = None
+    trigger: Optional[Callable] = None
+    # ((predicate, target index, source), ...); target == len(stages) means END
+    routes: Tuple[Tuple[Callable, int, str], ...] = ()
+    default_next: int = 0
+    # 'inline', or 'process': run the node's cpu_task in src.cpu_pool
+    executor: str = 'inline'
+
+    def should_run(self, state: dict) -> bool:
+        return self.trigger is None or bool(self.trigger(state))
+
+    def next_index(self, state: dict) -> int:
+        for predicate, target, _ in self.routes:
+            if predicate(state):
+                return target
+        return self.default_next
+
+
+@dataclass(frozen=True)
+class WorkflowPlan:
+    name: str
+    version: str
+    config: MappingProxyType
+    stages: Tuple[CompiledStage, ...]
+    stage_index: MappingProxyType
+    inputs_schema: MappingProxyType
+    source_path: str
+    source_mtime_ns: int
+    # validate_input(invoice) -> [SchemaError, ...], compiled from `inputs`
+    validate_input: Callable = None
+
+    def stage(self, stage_id: str) -> CompiledStage:
+        return self.stages[self.stage_index[stage_id]]
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def compile_workflow(wf: dict, node_map: dict, source_path: str = '', source_mtime_ns: int = 0) -> WorkflowPlan:
+    """Validate a parsed workflow definition and compile it into a WorkflowPlan."""
+    if not isinstance(wf, dict):
+        raise WorkflowCompileError('Workflow definition must be a JSON object')
+    config = wf.get('config') or {}
+    if not isinstance(config, dict):
+        raise WorkflowCompileError("'config' must be an object")
+    try:
+        validate_input = compile_schema(wf.get('inputs') or {})
+    except ValueError as e:
+        raise WorkflowCompileError(f"'inputs': {e}") from e
+    raw_stages = wf.get('stages')
+    if not isinstance(raw_stages, list) or not raw_stages:
+        raise WorkflowCompileError("'stages' must be a non-empty list")
+
+    stages = []
+    seen = {}
+    raw_routes = []
+    for i, raw in enumerate(raw_stages):
+        if not isinstance(raw, dict):
+            raise WorkflowCompileError(f"Stage #{i} must be an object")
+        stage_id = raw.get('id')
+        agent_name = raw.get('agent')
+        if not isinstance(stage_id, str) or not stage_id:
+            raise WorkflowCompileError(f"Stage #{i} is missing 'id'")
+        if stage_id in seen:
+            raise WorkflowCompileError(f"Duplicate stage id {stage_id!r}")
+        if not isinstance(agent_name, str) or agent_name not in node_map:
+            raise WorkflowCompileError(f"Stage {stage_id!r}: unknown agent {agent_name!r}")
+        trigger_source = raw.get('trigger_condition')
+        trigger = None
+        if trigger_source is not None:
+            if not isinstance(trigger_source, str):
+                raise WorkflowCompileError(f"Stage {stage_id!r}: trigger_condition must be a string")
+            trigger = compile_condition(trigger_source, config)
+        executor = raw.get('executor', 'inline')
+        if executor not in ('inline', 'process'):
+            raise WorkflowCompileError(f"Stage {stage_id!r}: executor must be 'inline' or 'process'")
+        if executor == 'process' and getattr(node_map[agent_name], 'cpu_task', None) is None:
+            raise WorkflowCompileError(f"Stage {stage_id!r}: agent {agent_name!r} has no cpu_task for a process executor")
+        routes = raw.get('routes') or []
+        if not isinstance(routes, list):
+            raise WorkflowCompileError(f"Stage {stage_id!r}: routes must be a list")
+        seen[stage_id] = i
+        raw_routes.append(routes)
+        stages.append(CompiledStage(
+            id=stage_id, index=i, agent_name=agent_name, agent_cls=node_map[agent_name],
+            mode=raw.get('mode', 'deterministic'), trigger_source=trigger_source, trigger=trigger,
+            default_next=i + 1, executor=executor,
+        ))
+
+    # Routes are resolved after all ids are known so they can jump forward.
+    end_index = len(stages)
+    for i, routes in enumerate(raw_routes):
+        compiled = []
+        for route in routes:
+            if not isinstance(route, dict) or not isinstance(route.get('when'), str):
+                raise WorkflowCompileError(f"Stage {stages[i].id!r}: each route needs a 'when' condition")
+            goto = route.get('goto')
+            if goto == END:
+                target = end_index
+            elif goto in seen:
+                target = seen[goto]
+            else:
+                raise WorkflowCompileError(f"Stage {stages[i].id!r}: route target {goto!r} is not a stage")
+            if target <= i:
+                raise WorkflowCompileError(f"Stage {stages[i].id!r}: route to {goto!r} would loop")
+            compiled.append((compile_condition(route['when'], config), target, route['when']))
+        if compiled:
+            stages[i] = replace(stages[i], routes=tuple(compiled))
+
+    return WorkflowPlan(
+        name=wf.get('workflow_name', ''),
+        version=str(wf.get('version', '')),
+        config=MappingProxyType(dict(config)),
+        stages=tuple(stages),
+        stage_index=MappingProxyType(seen),
+        inputs_schema=_freeze(wf.get('inputs') or {}),
+        source_path=source_path,
+        source_mtime_ns=source_mtime_ns,
+        validate_input=validate_input,
+    )
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+_config_cache = {}
+
+
+def workflow_config(path: str = WORKFLOW_PATH) -> dict:
+    """The `config` section of `path` without compiling the plan (or importing the nodes); shared, do not modify."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _config_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            config = json.load(f).get('config') or {}
+        except json.JSONDecodeError as e:
+            raise WorkflowCompileError(f"{path}: {e}") from e
+    _config_cache[path] = (stamp, config)
+    return config
+
+
+def get_plan(path: str = WORKFLOW_PATH, node_map: dict = None) -> WorkflowPlan:
+    """Compiled plan for `path`, recompiled only when the file changes on disk."""
+    if node_map is None:
+        from src.runner import NODE_MAP as node_map
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = (path, id(node_map))
+    cached = _cache.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                wf = json.load(f)
+            except json.JSONDecodeError as e:
+                raise WorkflowCompileError(f"{path}: {e}") from e
+        plan = compile_workflow(wf, node_map, source_path=path, source_mtime_ns=st.st_mtime_ns)
+        _cache[key] = (stamp, plan)
+        return plan
@@ -0,0 +1,180 @@
+import gzip
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+
+from src.api import ReviewServer
+from src.store import open_store
+
+
+class TestReviewServer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'api.db')
+        self.server = ReviewServer(('127.0.0.1', 0), self.db_path, pool_size=2, log_requests=False)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.store = open_store(self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _conn(self):
+        return http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=5)
+
+    def _pause(self, n=1):
+        ids = []
+        for i in range(n):
+            cp = str(uuid.uuid4())
+            self.store.save_checkpoint(cp, f'API-{i}', {'invoice': {'invoice_id': f'API-{i}', 'vendor_name': 'x' * 100}})
+            ids.append(cp)
+        return ids
+
+    def _call(self, conn, method, path, body=None, headers=None):
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp, resp.read()
+
+    def test_keep_alive_connections_are_served_concurrently(self):
+        self._pause()
+        idle = self._conn()
+        resp, _ = self._call(idle, 'GET', '/human-review/pending')
+        self.assertEqual(resp.status, 200)
+        sock = idle.sock
+        # A second client is not stuck behind the first one's open connection
+        other = self._conn()
+        resp, body = self._call(other, 'GET', '/human-review/pending')
+        self.assertEqual(len(json.loads(body)['items']), 1)
+        resp, _ = self._call(idle, 'GET', '/metrics')
+        self.assertEqual(resp.status, 200)
+        self.assertIs(idle.sock, sock)
+        idle.close()
+        other.close()
+
+    def test_gzip_only_when_accepted(self):
+        self._pause(20)
+        conn = self._conn()
+        resp, plain = self._call(conn, 'GET', '/human-review/pending')
+        self.assertIsNone(resp.getheader('Content-Encoding'))
+        resp, packed = self._call(conn, 'GET', '/human-review/pending', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(resp.getheader('Content-Encoding'), 'gzip')
+        self.assertLess(len(packed), len(plain))
+        self.assertEqual(json.loads(gzip.decompress(packed)), json.loads(plain))
+        conn.close()
+
+    def test_decision_validation_and_pool_exhaustion(self):
+        cp, = self._pause()
+        conn = self._conn()
+        resp, _ = self._call(conn, 'POST', '/human-review/decision', body='{not json')
+        self.assertEqual(resp.status, 400)
+        resp, _ = self._call(conn, 'POST', '/human-review/decision', body=json.dumps({'checkpoint_id': cp}))
+        self.assertEqual(resp.status, 400)
+        resp, body = self._call(conn, 'POST', '/human-review/decision',
+                                body=json.dumps({'checkpoint_id': cp, 'decision': 'ACCEPT', 'reviewer_id': 'ann'}))
+        self.assertEqual((resp.status, json.loads(body)['resume_token']), (200, cp))
+        got = self.store.fetch_checkpoint(cp)
+        self.assertEqual((got['status'], got['decision'], got['reviewer_id']), ('COMPLETED', 'ACCEPT', 'ann'))
+
+        self.server.stores.acquire_timeout = 0.05
+        with self.server.stores.acquire(), self.server.stores.acquire():
+            resp, _ = self._call(conn, 'GET', '/human-review/pending')
+            self.assertEqual((resp.status, resp.getheader('Retry-After')), (503, '1'))
+        resp, _ = self._call(conn, 'GET', '/human-review/pending')
+        self.assertEqual(resp.status, 200)
+        conn.close()
+
+    def test_batch_decisions(self):
+        a, b = self._pause(2)
+        conn = self._conn()
+        body = {'reviewer_id': 'ann', 'decisions': [{'checkpoint_id': a, 'decision': 'ACCEPT'},
+                                                    {'checkpoint_id': b, 'decision': 'REJECT', 'reviewer_id': 'bo'},
+                                                    'junk', {'checkpoint_id': 'missing', 'decision': 'ACCEPT'}]}
+        resp, raw = self._call(conn, 'POST', '/human-review/decisions', body=json.dumps(body))
+        got = json.loads(raw)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(got['decided'], 2)
+        self.assertEqual([r['status'] for r in got['results']], ['decided', 'decided', 'invalid', 'not_found'])
+        self.assertEqual(self.store.fetch_checkpoint(b)['reviewer_id'], 'bo')
+        self.assertEqual(self.store.list_pending(), [])
+        resp, _ = self._call(conn, 'POST', '/human-review/decisions', body=json.dumps({'decisions': []}))
+        self.assertEqual(resp.status, 400)
+        conn.close()
+
+    def test_next_and_filters(self):
+        for inv_id, amount in (('SMALL', 10), ('BIG', 5000)):
+            self.store.save_checkpoint(str(uuid.uuid4()), inv_id, {'invoice': {'vendor_name': 'Acme', 'amount': amount}})
+        conn = self._conn()
+        resp, body = self._call(conn, 'GET', '/human-review/next')
+        self.assertEqual(json.loads(body)['item']['invoice_id'], 'BIG')
+        resp, body = self._call(conn, 'GET', '/human-review/pending?vendor=ACME%20Inc&max_amount=100')
+        self.assertEqual([it['invoice_id'] for it in json.loads(body)['items']], ['SMALL'])
+        resp, body = self._call(conn, 'GET', '/human-review/next?vendor=nobody')
+        self.assertIsNone(json.loads(body)['item'])
+        resp, _ = self._call(conn, 'GET', '/human-review/pending?min_amount=lots')
+        self.assertEqual(resp.status, 400)
+        conn.close()
+
+    def test_etag_and_long_poll(self):
+        self._pause()
+        conn = self._conn()
+        resp, body = self._call(conn, 'GET', '/human-review/pending')
+        etag, seq = resp.getheader('ETag'), json.loads(body)['seq']
+        resp, body = self._call(conn, 'GET', '/human-review/pending', headers={'If-None-Match': etag})
+        self.assertEqual((resp.status, body), (304, b''))
+
+        polled = []
+        poller = threading.Thread(target=lambda: polled.append(
+            self._call(self._conn(), 'GET', f'/human-review/changes?since={seq}&timeout=5')[1]))
+        poller.start()
+        cp, = self._pause()
+        poller.join()
+        got = json.loads(polled[0])
+        self.assertEqual([(c['event'], c['checkpoint_id']) for c in got['changes']], [('added', cp)])
+        self.assertEqual(got['changes'][0]['item']['summary']['vendor_name'], 'x' * 100)
+        resp, _ = self._call(conn, 'GET', '/human-review/pending', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status, 200)
+        # Nothing new: the poll times out empty
+        resp, body = self._call(conn, 'GET', f"/human-review/changes?since={got['seq']}&timeout=0.05")
+        self.assertEqual(json.loads(body)['changes'], [])
+        conn.close()
+
+    def test_event_stream_pushes_decisions(self):
+        cp, = self._pause()
+        seq = json.loads(self._call(self._conn(), 'GET', '/human-review/pending')[1])['seq']
+        stream = self._conn()
+        stream.request('GET', f'/human-review/events?since={seq}')
+        resp = stream.getresponse()
+        self.assertEqual(resp.getheader('Content-Type'), 'text/event-stream')
+        self.assertEqual(resp.readline(), b'retry: 3000\n')
+        resp.readline()
+        self._call(self._conn(), 'POST', '/human-review/decision', body=json.dumps({'checkpoint_id': cp, 'decision': 'REJECT'}))
+        lines = [resp.readline().decode().strip() for _ in range(8)]
+        self.assertEqual([line for line in lines if line.startswith('event:')], ['event: decided', 'event: completed'])
+        self.assertEqual(json.loads(lines[2][len('data: '):])['checkpoint_id'], cp)
+        stream.close()
+
+    def test_stats(self):
+        cp, = self._pause()
+        self.store.append_audit('API-0', 'INTAKE', 'logged')
+        conn = self._conn()
+        self._call(conn, 'POST', '/human-review/decision',
+                   body=json.dumps({'checkpoint_id': cp, 'decision': 'ACCEPT', 'reviewer_id': 'ann'}))
+        resp, body = self._call(conn, 'GET', '/stats?hours=2')
+        got = json.loads(body)
+        self.assertEqual((resp.status, got['hours'], got['stage_invoices']), (200, 2, {'INTAKE': 1}))
+        self.assertEqual([(r['reviewer_id'], r['accepted']) for r in got['reviewers']], [('ann', 1)])
+        resp, _ = self._call(conn, 'GET', '/stats?hours=many')
+        self.assertEqual(resp.status, 400)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import unittest
+
+from benchmarks.generator import write_scanned_pdf
+from src import attachments
+from src.attachments import Page
+from src.nodes import OcrNlpNode, ocr_and_parse
+from src.store import MemoryStore
+
+
+def _write_tiff(path, pages):
+    """Little-endian TIFF with `pages` one-entry IFDs."""
+    data = bytearray(b'II*\x00' + struct.pack('<I', 8))
+    for i in range(pages):
+        offset = len(data)
+        next_ifd = offset + 18 if i < pages - 1 else 0
+        data += struct.pack('<H', 1) + struct.pack('<HHII', 256, 4, 1, 100) + struct.pack('<I', next_ifd)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class TestAttachmentPages(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_pages_are_counted_per_format(self):
+        write_scanned_pdf(self._path('scan.pdf'), 12, page_kb=4)
+        _write_tiff(self._path('fax.tif'), 3)
+        with open(self._path('photo.png'), 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64)
+        open(self._path('empty.pdf'), 'wb').close()
+        self.assertEqual(attachments.inspect(self._path('scan.pdf')), ('pdf', 12))
+        self.assertEqual(attachments.inspect(self._path('fax.tif')), ('tiff', 3))
+        self.assertEqual(attachments.inspect(self._path('photo.png')), ('image', 1))
+        self.assertEqual(attachments.inspect(self._path('empty.pdf')), ('missing', 1))
+        self.assertEqual(attachments.inspect(self._path('nope.pdf')), ('missing', 1))
+
+    def test_pages_follow_attachment_order(self):
+        _write_tiff(self._path('a.tif'), 2)
+        pages = list(attachments.iter_pages([self._path('a.tif'), 'missing.pdf']))
+        self.assertEqual([(os.path.basename(p.path), p.number, p.count) for p in pages],
+                         [('a.tif', 1, 2), ('a.tif', 2, 2), ('missing.pdf', 1, 1)])
+
+    def test_concurrent_ocr_keeps_page_order_and_bounds_in_flight(self):
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def ocr_page(page):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            # Later pages finish first
+            time.sleep(0.002 * (40 - page.number) / 40)
+            with lock:
+                running[0] -= 1
+            return f'p{page.number}'
+
+        pages = [Page('doc.pdf', n, 40, 'pdf') for n in range(1, 41)]
+        self.assertEqual(attachments.ocr_pages(pages, ocr_page, workers=4, window=6),
+                         [f'p{n}' for n in range(1, 41)])
+        self.assertLessEqual(peak[0], 4)
+
+    def test_failing_page_raises(self):
+        def ocr_page(page):
+            if page.number == 3:
+                raise RuntimeError('bad page')
+            return 'ok'
+
+        with self.assertRaises(RuntimeError):
+            attachments.ocr_pages([Page('doc.pdf', n, 5, 'pdf') for n in range(1, 6)], ocr_page, workers=2)
+
+
+class TestOcrNode(unittest.TestCase):
+
+    def test_every_page_of_every_attachment_is_read(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            scan = os.path.join(temp_dir, 'scan.pdf')
+            write_scanned_pdf(scan, 3, page_kb=1)
+            result = ocr_and_parse({'attachments': [scan, 'cover.pdf'], 'page_workers': 2})
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        texts = result['invoice_text'].split(attachments.PAGE_SEPARATOR)
+        self.assertEqual(texts[:3], ['OCR via ATLAS (mock), page 1 of 3', 'OCR via ATLAS (mock), page 2 of 3',
+                                     'OCR via ATLAS (mock), page 3 of 3'])
+        self.assertEqual(len(texts), 4)
+
+    def test_invoice_without_attachments(self):
+        node = OcrNlpNode(MemoryStore(), {})
+        state = node.run({'invoice': {'invoice_id': 'NO-ATT', 'attachments': []}})
+        self.assertEqual(state['parsed_invoice']['invoice_text'], '')
+        self.assertTrue(state['parsed_invoice']['parsed_line_items'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from benchmarks.bench_pipeline import parse_latency, run_benchmark
+from benchmarks.generator import generate_invoices
+from src import mcp_clients
+
+
+class TestInvoiceGenerator(unittest.TestCase):
+
+    def test_generator_is_reproducible_and_schema_shaped(self):
+        a, po_a = generate_invoices(20, seed=7, vendors=5)
+        b, po_b = generate_invoices(20, seed=7, vendors=5)
+        self.assertEqual(a, b)
+        self.assertEqual(po_a, po_b)
+        for inv in a:
+            for key in ('invoice_id', 'vendor_name', 'amount', 'currency', 'line_items', 'attachments'):
+                self.assertIn(key, inv)
+            self.assertAlmostEqual(inv['amount'], sum(li['total'] for li in inv['line_items']), places=1)
+            self.assertIn(inv['vendor_name'], po_a)
+        self.assertEqual(sum(len(p) for p in po_a.values()), 20)
+
+    def test_match_rate_extremes(self):
+        invoices, po_book = generate_invoices(30, seed=1, vendors=3, match_rate=1.0)
+        mcp_clients.set_mock_purchase_orders(po_book)
+        try:
+            from src.mcp_clients import AtlasClient, compute_match_score
+            atlas = AtlasClient()
+            for inv in invoices:
+                self.assertGreaterEqual(compute_match_score(inv, atlas.fetch_pos(inv['vendor_name'])), 0.9)
+        finally:
+            mcp_clients.set_mock_purchase_orders({})
+
+
+class TestPipelineBenchmark(unittest.TestCase):
+
+    def test_small_run_reports_metrics(self):
+        result = run_benchmark(invoices=3, seed=3, vendors=2, latency=parse_latency('ocr=0.001'))
+        self.assertGreater(result['invoices_per_sec'], 0)
+        self.assertIn('UNDERSTAND', result['stage_latency_ms'])
+        self.assertEqual(set(result['stage_latency_ms']['UNDERSTAND']), {'p50', 'p95', 'p99', 'mean'})
+        self.assertGreater(result['db_size_bytes'], 0)
+        self.assertEqual(sum(result['outcomes'].values()), 3)
+        self.assertEqual(mcp_clients.MOCK_LATENCY, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
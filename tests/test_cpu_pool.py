@@ -0,0 +1,67 @@
+import contextlib
+import dataclasses
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from types import MappingProxyType
+
+from src import cpu_pool
+from src.nodes import OcrNlpNode, ocr_and_parse
+from src.runner import NODE_MAP, load_plan, run_workflow
+from src.store import MemoryStore
+from src.workflow_plan import WorkflowCompileError, compile_workflow
+
+
+def _invoice(invoice_id):
+    return {'invoice_id': invoice_id, 'vendor_name': 'Pool Vendor', 'amount': 12000.0, 'currency': 'USD',
+            'line_items': [], 'attachments': ['scan.pdf']}
+
+
+class TestCpuPool(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'pool.db')
+
+    def tearDown(self):
+        cpu_pool.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_process_executor_needs_cpu_task(self):
+        stage = {'id': 'A', 'agent': 'ApprovalNode', 'executor': 'process'}
+        with self.assertRaises(WorkflowCompileError):
+            compile_workflow({'stages': [stage]}, NODE_MAP)
+        plan = compile_workflow({'stages': [dict(stage, agent='OcrNlpNode')]}, NODE_MAP)
+        self.assertEqual(plan.stages[0].executor, 'process')
+
+    def test_only_stage_inputs_cross_the_boundary(self):
+        calls = []
+
+        def submit(fn, inputs):
+            calls.append((fn, inputs))
+            return fn(inputs)
+
+        node = OcrNlpNode(MemoryStore(), {})
+        state = node.run_in_pool({'invoice': _invoice('CPU-1'), 'large': 'x' * 10000}, submit)
+        self.assertEqual(calls, [(ocr_and_parse, {'attachments': ['scan.pdf'], 'page_workers': 4})])
+        self.assertEqual(set(state['parsed_invoice']), {'invoice_text', 'parsed_line_items'})
+
+    def test_workflow_runs_stage_in_warm_worker(self):
+        plan = load_plan()
+        pooled = dataclasses.replace(plan, config=MappingProxyType({**plan.config, 'cpu_pool_workers': 1}))
+        with contextlib.redirect_stdout(io.StringIO()):
+            inline = run_workflow(_invoice('CPU-2'), self.db_path, decision_delay=0, plan=plan)
+            first = run_workflow(_invoice('CPU-3'), self.db_path, decision_delay=0, plan=pooled)
+        self.assertEqual(first['parsed_invoice'], inline['parsed_invoice'])
+        self.assertEqual(first['final_payload']['status'], 'COMPLETED')
+        # The same worker process serves later tasks
+        pool = cpu_pool.get_pool(1)
+        pids = {pool.submit(os.getpid).result() for _ in range(3)}
+        self.assertEqual(len(pids), 1)
+        self.assertNotIn(os.getpid(), pids)
+
+
+if __name__ == '__main__':
+    unittest.main()
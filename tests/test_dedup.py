@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from src import db, metrics, nodes
+from src.dedup import BloomFilter, DedupIndex, dedup_key, normalize_vendor
+from src.runner import run_workflow
+
+
+def _invoice(**over):
+    inv = {'invoice_id': 'INV-1001', 'vendor_name': 'Acme Corp.', 'amount': 12000.0, 'currency': 'USD',
+           'invoice_date': '2025-03-01', 'line_items': [], 'attachments': ['inv.pdf']}
+    inv.update(over)
+    return inv
+
+
+class TestDedupKeys(unittest.TestCase):
+
+    def test_vendor_normalization(self):
+        for name in ('Acme Corp.', 'ACME  Corporation', 'Acmé, Inc', 'acme'):
+            self.assertEqual(normalize_vendor(name), 'acme', name)
+        self.assertEqual(normalize_vendor('Co Ltd'), 'co')
+
+    def test_key_ignores_formatting_but_not_amount(self):
+        self.assertEqual(dedup_key(_invoice()), dedup_key(_invoice(vendor_name='ACME Corporation', amount=12000)))
+        self.assertNotEqual(dedup_key(_invoice()), dedup_key(_invoice(amount=12000.5)))
+
+    def test_bloom_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f"k{i}" for i in range(1000)]
+        for k in keys:
+            bloom.add(k)
+        self.assertTrue(all(k in bloom for k in keys))
+        false_pos = sum(f"other{i}" in bloom for i in range(10000))
+        self.assertLess(false_pos, 300)
+
+
+class TestDedupIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'd.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_attachment_hash_catches_renamed_invoice(self):
+        path = os.path.join(self.temp_dir, 'scan.pdf')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4 same bytes')
+        conn = db.init_db(self.db_path)
+        index = DedupIndex(capacity=100)
+        self.assertIsNone(index.check_and_add(conn, _invoice(attachments=[path]), 'raw-1'))
+        db.confirm_invoice(conn, 'raw-1')
+        dup = index.check_and_add(conn, _invoice(invoice_id='INV-9', attachments=[path]), 'raw-2')
+        self.assertEqual(dup['raw_id'], 'raw-1')
+        # A fresh filter (new process) still finds it after warming from the table
+        self.assertEqual(DedupIndex(capacity=100).check_and_add(conn, _invoice(), 'raw-3')['raw_id'], 'raw-1')
+        conn.close()
+
+    def test_resubmitted_invoice_skips_pipeline(self):
+        before = metrics.DEDUP_LOOKUPS.value('duplicate')
+        first = run_workflow(_invoice(), self.db_path, decision_delay=0)
+        self.assertEqual(first['final_payload']['status'], 'COMPLETED')
+        second = run_workflow(_invoice(vendor_name='ACME Corporation'), self.db_path, decision_delay=0)
+        self.assertEqual(second['final_payload']['status'], 'DUPLICATE')
+        self.assertEqual(second['duplicate_of']['raw_id'], first['invoice']['raw_id'])
+        self.assertNotIn('parsed_invoice', second)
+        self.assertEqual(metrics.DEDUP_LOOKUPS.value('duplicate'), before + 1)
+
+    def test_retry_of_a_failed_run_is_not_its_own_duplicate(self):
+        ocr = nodes.OcrNlpNode.run
+        calls = []
+
+        def fail_once(node, state):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('OCR service down')
+            return ocr(node, state)
+
+        with mock.patch.object(nodes.OcrNlpNode, 'run', fail_once):
+            with self.assertRaises(RuntimeError):
+                run_workflow(_invoice(), self.db_path, decision_delay=0)
+            before = metrics.DEDUP_LOOKUPS.value('retry')
+            retry = run_workflow(_invoice(), self.db_path, decision_delay=0)
+        self.assertEqual(retry['final_payload']['status'], 'COMPLETED')
+        self.assertEqual(metrics.DEDUP_LOOKUPS.value('retry'), before + 1)
+        conn = db.init_db(self.db_path)
+        entry = db.find_indexed_invoice(conn, dedup_key(_invoice()))
+        conn.close()
+        self.assertEqual((entry['raw_id'], entry['status']), (retry['invoice']['raw_id'], 'done'))
+        # Once that run finished, a resubmission is a duplicate again
+        again = run_workflow(_invoice(), self.db_path, decision_delay=0)
+        self.assertEqual(again['final_payload']['status'], 'DUPLICATE')
+        self.assertEqual(again['duplicate_of']['raw_id'], retry['invoice']['raw_id'])
+
+
+if __name__ == '__main__':
+    unittest.main()
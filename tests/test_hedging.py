@@ -0,0 +1,104 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.hedging import Hedger, HedgeBudget, HedgeError, LatencyTracker
+from src.mcp_clients import AtlasClient
+
+
+def _hedger(ratio=1.0, burst=5, delay=0.02):
+    return Hedger(
+        tracker=LatencyTracker(min_samples=1000, default_delay=delay),
+        budget=HedgeBudget(ratio=ratio, burst=burst),
+        min_delay=0.001,
+        executor=ThreadPoolExecutor(max_workers=4),
+    )
+
+
+class TestHedger(unittest.TestCase):
+
+    def test_fast_primary_is_not_hedged(self):
+        hedger = _hedger()
+        calls = []
+
+        def fn(tool):
+            calls.append(tool)
+            return tool.upper()
+
+        self.assertEqual(hedger.call(['a', 'b', 'c'], fn), ('a', 'A'))
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(hedger.stats['hedges'], 0)
+
+    def test_slow_primary_is_hedged(self):
+        hedger = _hedger()
+
+        def fn(tool):
+            if tool == 'a':
+                time.sleep(0.5)
+            return tool
+
+        start = time.perf_counter()
+        tool, result = hedger.call(['a', 'b'], fn)
+        self.assertEqual(tool, 'b')
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertEqual(hedger.stats['hedges'], 1)
+        self.assertEqual(hedger.stats['hedge_wins'], 1)
+
+    def test_budget_caps_hedges(self):
+        hedger = _hedger(ratio=0.0, burst=1)
+
+        def fn(tool):
+            if tool == 'a':
+                time.sleep(0.1)
+            return tool
+
+        self.assertEqual(hedger.call(['a', 'b'], fn)[0], 'b')
+        # Budget exhausted: the slow primary is awaited instead of hedged.
+        self.assertEqual(hedger.call(['a', 'b'], fn)[0], 'a')
+        self.assertEqual(hedger.stats['hedges'], 1)
+
+    def test_failover_and_total_failure(self):
+        hedger = _hedger(ratio=0.0, burst=0)
+
+        def flaky(tool):
+            if tool == 'a':
+                raise RuntimeError('down')
+            return tool
+
+        self.assertEqual(hedger.call(['a', 'b'], flaky)[0], 'b')
+        self.assertEqual(hedger.stats['failovers'], 1)
+
+        def broken(tool):
+            raise RuntimeError(tool)
+
+        with self.assertRaises(HedgeError):
+            hedger.call(['a', 'b'], broken)
+
+    def test_tracker_p95(self):
+        tracker = LatencyTracker(min_samples=10, default_delay=9.0)
+        self.assertEqual(tracker.p95('x'), 9.0)
+        for i in range(100):
+            tracker.observe('x', i / 100.0)
+        self.assertAlmostEqual(tracker.p95('x'), 0.95)
+
+
+class TestAtlasHedging(unittest.TestCase):
+
+    def test_atlas_ocr_hedges_across_pool(self):
+        class SlowVisionClient(AtlasClient):
+            def _ocr_with(self, tool, attachment_path):
+                if tool == 'google_vision':
+                    time.sleep(1.5)
+                return f"{tool}:{attachment_path}"
+
+        client = SlowVisionClient(hedge=True)
+        self.assertEqual(client.ocr('inv.pdf'), 'tesseract:inv.pdf')
+
+    def test_atlas_falls_back_when_pool_fails(self):
+        # Stub adapters raise NotImplementedError, so the mock path answers.
+        client = AtlasClient(hedge=True)
+        self.assertTrue(client.enrich_vendor('Acme'))
+
+
+if __name__ == '__main__':
+    unittest.main()
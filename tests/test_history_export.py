@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src import db, history_export
+
+try:
+    import pyarrow.dataset as ds
+except ImportError:
+    ds = None
+
+
+@unittest.skipIf(ds is None, 'pyarrow not installed')
+class TestParquetExport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.conn = db.init_db(os.path.join(self.temp_dir, 'export.db'))
+        self.out = os.path.join(self.temp_dir, 'parquet')
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _read(self, table):
+        return ds.dataset(os.path.join(self.out, table), format='parquet', partitioning='hive').to_table()
+
+    def test_partitioned_typed_and_incremental(self):
+        for i in range(5):
+            db.append_audit(self.conn, f'INV-{i}', 'INTAKE' if i % 2 else 'MATCH_TWO_WAY', 'logged')
+        # Two days ago, so the rows land in another partition
+        self.conn.execute("UPDATE audit_log SET ts=ts-2*86400 WHERE id<=2")
+        self.conn.commit()
+        db.save_checkpoint(self.conn, 'cp-1', 'INV-1', {'invoice': {'vendor_name': 'Acme', 'amount': 120.5}})
+        db.save_decision(self.conn, 'cp-1', 'ann', 'ACCEPT')
+
+        self.assertEqual(history_export.export_parquet(self.conn, self.out, row_group_rows=2),
+                         {'audit_log': 5, 'decisions': 1})
+        self.assertEqual(len(os.listdir(os.path.join(self.out, 'audit_log'))), 2)
+        audit = self._read('audit_log')
+        self.assertEqual(str(audit.schema.field('stage').type), 'dictionary<values=string, indices=int32, ordered=0>')
+        self.assertEqual(sorted(audit.column('id').to_pylist()), [1, 2, 3, 4, 5])
+        decisions = self._read('decisions').to_pylist()
+        self.assertEqual([(d['checkpoint_id'], d['decision'], d['reviewer_id'], d['amount']) for d in decisions],
+                         [('cp-1', 'ACCEPT', 'ann', 120.5)])
+
+        before = {os.path.join(d, f): os.path.getmtime(os.path.join(d, f))
+                  for d, _, files in os.walk(self.out) for f in files if f.endswith('.parquet')}
+        time.sleep(0.01)
+        db.append_audit(self.conn, 'INV-9', 'INTAKE', 'later')
+        self.assertEqual(history_export.export_parquet(self.conn, self.out), {'audit_log': 1, 'decisions': 0})
+        self.assertEqual(len(self._read('audit_log')), 6)
+        # Earlier part files are left as they were
+        for path, mtime in before.items():
+            self.assertEqual(os.path.getmtime(path), mtime)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from src.ingest import Ingestor, ingest_file
+
+
+def _invoice(i):
+    return {'invoice_id': f'ING-{i:03d}', 'vendor_name': f'Vendor {i}', 'amount': 12000.0, 'currency': 'USD',
+            'line_items': [], 'attachments': ['inv.pdf']}
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.temp_dir, 'in.jsonl')
+        self.out = os.path.join(self.temp_dir, 'out.jsonl')
+        self.db_path = os.path.join(self.temp_dir, 'ingest.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _append(self, lines):
+        with open(self.src, 'a', encoding='utf-8') as f:
+            for line in lines:
+                f.write((line if isinstance(line, str) else json.dumps(line)) + '\n')
+
+    def _ingest(self):
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            return ingest_file(self.src, self.out, db_path=self.db_path, workers=3, queue_size=2, checkpoint_every=2)
+
+    def _results(self):
+        with open(self.out, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_results_in_order_and_resume_from_offset(self):
+        self._append([_invoice(1), '{broken', '', {'invoice_id': 'ING-BAD'}, _invoice(2)])
+        stats = self._ingest()
+        self.assertEqual((stats['processed'], stats['quarantined']), (2, 2))
+        self.assertEqual([(r['line'], r['status']) for r in self._results()],
+                         [(1, 'COMPLETED'), (2, 'QUARANTINED'), (4, 'QUARANTINED'), (5, 'COMPLETED')])
+
+        # Results written after the last checkpoint are dropped and redone
+        with open(self.out, 'a', encoding='utf-8') as f:
+            f.write('{"line": 99, "status": "PARTIAL"}\n')
+        self._append([_invoice(3)])
+        stats = self._ingest()
+        self.assertEqual(stats['processed'], 1)
+        results = self._results()
+        self.assertEqual([r['line'] for r in results], [1, 2, 4, 5, 6])
+        self.assertEqual(results[-1]['invoice_id'], 'ING-003')
+
+    def test_reader_is_bounded_by_queue(self):
+        read = []
+        done = []
+
+        class SlowIngestor(Ingestor):
+            def process_line(self, line_no, raw):
+                time.sleep(0.005)
+                done.append(line_no)
+                return {'line': line_no, 'status': 'OK'}
+
+        def stream():
+            for i in range(200):
+                read.append(i)
+                # reader may be ahead of the writer by queue_size + workers (+1 being handed over)
+                self.assertLessEqual(len(read) - len(done), 2 + 2 + 1 + 2)
+                yield b'{}\n'
+
+        ingestor = SlowIngestor(db_path=self.db_path, workers=2, queue_size=2)
+        out = io.StringIO()
+        stats = ingestor.run(stream(), out)
+        self.assertEqual(stats['lines'], 200)
+        self.assertEqual([json.loads(l)['line'] for l in out.getvalue().splitlines()], list(range(1, 201)))
+
+    def test_failed_quarantine_write_still_yields_a_result(self):
+        self._append([_invoice(1), '{broken', {'invoice_id': 'ING-BAD'}])
+        with mock.patch('src.ingest.nodes.quarantine_rejected', side_effect=OSError('disk full')):
+            stats = self._ingest()
+        self.assertEqual((stats['lines'], stats['processed'], stats['failed']), (3, 1, 2))
+        results = self._results()
+        self.assertEqual([r['status'] for r in results], ['COMPLETED', 'FAILED', 'FAILED'])
+        self.assertIn('disk full', results[1]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
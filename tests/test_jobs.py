@@ -0,0 +1,120 @@
+import contextlib
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from src import db
+from src.jobs import JobWorker, invoice_priority, submit_invoice
+from src.store import MemoryStore, as_store
+
+
+def _invoice(invoice_id, amount=12000.0, **extra):
+    inv = {'invoice_id': invoice_id, 'vendor_name': f'Vendor {invoice_id}', 'amount': amount, 'currency': 'USD',
+           'line_items': [], 'attachments': ['inv.pdf']}
+    inv.update(extra)
+    return inv
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'jobs.db')
+        self.conn = db.init_db(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_priority_order_and_single_claim(self):
+        today = datetime.date(2025, 1, 1)
+        small = invoice_priority({'amount': 100, 'due_date': '2025-01-31'}, today)
+        large = invoice_priority({'amount': 100000, 'due_date': '2025-01-31'}, today)
+        urgent = invoice_priority({'amount': 100, 'due_date': '2025-01-02'}, today)
+        self.assertGreater(large, small)
+        self.assertGreater(urgent, small)
+
+        for i, prio in enumerate([1, 5, 3] * 10):
+            db.enqueue_job(self.conn, 'q', 'invoice', {'n': i}, priority=prio)
+        claimed, lock = [], threading.Lock()
+
+        def claimer(name):
+            conn = db.init_db(self.db_path)
+            while True:
+                job = db.claim_job(conn, ['q'], name)
+                if not job:
+                    break
+                with lock:
+                    claimed.append((job['id'], job['priority']))
+            conn.close()
+
+        threads = [threading.Thread(target=claimer, args=(f'w{i}',)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ids = [job_id for job_id, _ in claimed]
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(len(set(ids)), 30)
+        self.assertEqual(db.job_counts(self.conn, 'q'), {'leased': 30})
+
+        db.enqueue_job(self.conn, 'p', 'invoice', {}, priority=1)
+        db.enqueue_job(self.conn, 'p', 'invoice', {}, priority=9)
+        self.assertEqual(db.claim_job(self.conn, 'p', 'w')['priority'], 9)
+
+    def test_lease_expiry_retry_and_ack(self):
+        job_id = db.enqueue_job(self.conn, 'q', 'invoice', {}, max_attempts=2)
+        job = db.claim_job(self.conn, 'q', 'dead-worker', lease_s=0.05)
+        self.assertIsNone(db.claim_job(self.conn, 'q', 'other'))
+        time.sleep(0.1)
+        # The first worker stopped heartbeating: its job is visible again
+        job = db.claim_job(self.conn, 'q', 'other')
+        self.assertEqual((job['id'], job['attempts']), (job_id, 2))
+        self.assertFalse(db.ack_job(self.conn, job_id, 'dead-worker', {}))
+        self.assertEqual(db.fail_job(self.conn, job_id, 'other', 'boom', retry_delay=0), 'failed')
+
+        job_id = db.enqueue_job(self.conn, 'q', 'invoice', {})
+        db.claim_job(self.conn, 'q', 'w')
+        self.assertEqual(db.fail_job(self.conn, job_id, 'w', 'boom', retry_delay=0), 'queued')
+        db.claim_job(self.conn, 'q', 'w')
+        self.assertTrue(db.ack_job(self.conn, job_id, 'w', {'status': 'COMPLETED'}))
+        self.assertEqual(db.fetch_job(self.conn, job_id)['result'], {'status': 'COMPLETED'})
+
+    def test_worker_parks_at_checkpoint_and_resumes_after_decision(self):
+        submit_invoice(self.conn, _invoice('JOB-001'))
+        parked_id = submit_invoice(self.conn, _invoice('JOB-002', amount=500.0))
+        worker = JobWorker(self.db_path, poll_interval=0.01)
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = worker.run(until_idle=True)
+        self.assertEqual((stats['done'], stats['parked']), (1, 1))
+        job = db.fetch_job(self.conn, parked_id)
+        self.assertEqual((job['status'], job['queue']), ('waiting', worker.review_queue))
+
+        db.save_decision(self.conn, job['checkpoint_id'], 'alice', 'ACCEPT')
+        self.assertEqual(db.fetch_job(self.conn, parked_id)['status'], 'queued')
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = JobWorker(self.db_path).run(until_idle=True)
+        self.assertEqual(stats['done'], 1)
+        job = db.fetch_job(self.conn, parked_id)
+        self.assertEqual((job['status'], job['kind']), ('done', 'resume'))
+        self.assertEqual(job['result']['status'], 'COMPLETED')
+
+    def test_decision_saved_before_the_park_is_not_lost(self):
+        for store in (as_store(self.conn), MemoryStore()):
+            job_id = store.enqueue_job('q', 'invoice', {})
+            store.claim_job('q', 'w')
+            # The run checkpointed and a reviewer decided before the worker parked the job
+            store.save_checkpoint('cp-early', 'JOB-003', {'invoice': _invoice('JOB-003')})
+            store.save_decision('cp-early', 'alice', 'ACCEPT')
+            self.assertTrue(store.park_job(job_id, 'w', 'cp-early', {'paused_at': 'CHECKPOINT_HITL'}, 'review'))
+            job = store.fetch_job(job_id)
+            self.assertEqual((job['status'], job['kind'], job['queue']), ('queued', 'resume', 'review'), store)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from src import attachments, local_ocr
+from src.attachments import Page
+
+
+class _FakeApi:
+    """Stands in for one warm engine: records how many run at once."""
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def image_to_string(self, image, lang, config):
+        with _FakeApi.lock:
+            _FakeApi.running += 1
+            _FakeApi.peak = max(_FakeApi.peak, _FakeApi.running)
+        time.sleep(0.005)
+        with _FakeApi.lock:
+            _FakeApi.running -= 1
+        return f'{image}:{config}'
+
+
+class TestEnginePool(unittest.TestCase):
+
+    def test_engines_are_reused_and_bounded(self):
+        created = []
+
+        class Engine(local_ocr.TesseractEngine):
+            def _new_api(self):
+                created.append(1)
+                return _FakeApi()
+
+        engine = Engine(workers=2, kind='pytesseract')
+        pages = [Page('scan.tif', n, 12, 'tiff') for n in range(1, 13)]
+        texts = attachments.ocr_pages(pages, lambda page: engine.recognize(page.number, dpi=300), workers=6)
+        self.assertEqual(texts, [f'{n}:--psm 6 --dpi 300' for n in range(1, 13)])
+        self.assertEqual(len(created), 2)
+        self.assertLessEqual(_FakeApi.peak, 2)
+
+
+@unittest.skipIf(local_ocr.Image is None, 'Pillow not installed')
+class TestPreprocessing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks.generator import write_sample_scans
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.temp_dir, 'scans.tif')
+        cls.angles = write_sample_scans(cls.path, 3, dpi=200, max_skew=3.0, seed=5)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def test_otsu_splits_a_bimodal_histogram(self):
+        histogram = [0] * 256
+        histogram[30], histogram[220] = 100, 900
+        self.assertTrue(30 <= local_ocr.otsu_threshold(histogram) < 220)
+
+    def test_pages_render_one_frame_at_a_time(self):
+        pages = list(attachments.iter_pages([self.path]))
+        self.assertEqual([p.kind for p in pages], ['tiff'] * 3)
+        image, dpi = local_ocr.render_page(pages[2])
+        self.assertEqual(image.size, (1700, 2200))
+        self.assertEqual(dpi, 200)
+
+    def test_deskew_recovers_the_tilt(self):
+        for page, angle in zip(attachments.iter_pages([self.path]), self.angles):
+            image, _ = local_ocr.render_page(page)
+            self.assertAlmostEqual(local_ocr.estimate_skew(image.convert('L')), -angle, delta=0.6)
+
+    def test_preprocess_downscales_and_binarizes(self):
+        image, dpi = local_ocr.render_page(Page(self.path, 1, 3, 'tiff'))
+        out = local_ocr.preprocess(image, dpi, dpi=100, straighten=False)
+        self.assertEqual(out.size, (850, 1100))
+        self.assertEqual(set(out.histogram()[1:255]), {0})
+        # Never upscaled
+        self.assertEqual(local_ocr.preprocess(image, dpi, dpi=300, straighten=False).size, image.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import logging_utils
+from src.logging_utils import EventSink, WorkflowLogger, setup_logging
+
+
+class TestWorkflowLogger(unittest.TestCase):
+
+    def test_ring_buffer_is_bounded(self):
+        wlog = WorkflowLogger('INV-1', max_events=5)
+        for i in range(20):
+            wlog.log_stage_start('Node', f'S{i}')
+        events = wlog.events
+        self.assertEqual(len(events), 5)
+        self.assertEqual(events[0]['details']['stage_id'], 'S15')
+        self.assertEqual(events[-1]['invoice_id'], 'INV-1')
+        self.assertIn('T', events[-1]['timestamp'])
+        self.assertEqual(len(json.loads(wlog.export_events())), 5)
+
+
+class TestEventSink(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_sink_streams_jsonl_and_rotates(self):
+        path = os.path.join(self.temp_dir, 'events.jsonl')
+        sink = EventSink(path, max_bytes=2000, backup_count=2).start()
+        try:
+            wlog = WorkflowLogger('INV-2')
+            for i in range(50):
+                wlog.log_tool_selection('ocr', 'tesseract', {'i': i})
+        finally:
+            sink.stop()
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertTrue(lines)
+        self.assertEqual(lines[-1]['details']['context'], {'i': 49})
+        self.assertTrue(os.path.exists(path + '.1'))
+        self.assertEqual(sink.dropped, 0)
+        # Once stopped, events stay in memory only.
+        self.assertFalse(logging.getLogger(logging_utils.EVENTS_LOGGER).handlers)
+
+    def test_setup_logging_is_idempotent(self):
+        root = logging.getLogger()
+        before = list(root.handlers)
+        log_file = os.path.join(self.temp_dir, 'wf.log')
+        try:
+            setup_logging(log_file)
+            setup_logging(log_file)
+            self.assertEqual(len(root.handlers), len(before) + 2)
+        finally:
+            for h in list(logging_utils._installed_handlers):
+                root.removeHandler(h)
+                h.close()
+            logging_utils._installed_handlers.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import urllib.request
+from http.server import HTTPServer
+
+from src import metrics
+from src.api import Handler
+from src.runner import run_workflow
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_stage_timer_splits_external_time(self):
+        @metrics.timed_call('test')
+        def slow_call():
+            time.sleep(0.02)
+
+        before = metrics.STAGE_EXTERNAL.stats('TEST_STAGE')['count']
+        with metrics.stage_timer('TEST_STAGE'):
+            slow_call()
+        ext = metrics.STAGE_EXTERNAL.stats('TEST_STAGE')
+        wall = metrics.STAGE_WALL.stats('TEST_STAGE')
+        self.assertEqual(ext['count'], before + 1)
+        self.assertGreaterEqual(ext['p99'], 0.02)
+        self.assertGreaterEqual(wall['p99'], ext['p99'])
+        self.assertGreaterEqual(metrics.ADAPTER_CALLS.stats('test', 'slow_call')['count'], 1)
+
+    def test_prometheus_rendering(self):
+        h = metrics.Histogram('x_seconds', 'help', ('stage',), buckets=(0.1, 1.0))
+        h.observe(0.05, 'A')
+        h.observe(0.5, 'A')
+        lines = h.render()
+        self.assertIn('# TYPE x_seconds histogram', lines)
+        self.assertIn('x_seconds_bucket{stage="A",le="0.1"} 1', lines)
+        self.assertIn('x_seconds_bucket{stage="A",le="1.0"} 2', lines)
+        self.assertIn('x_seconds_bucket{stage="A",le="+Inf"} 2', lines)
+        self.assertIn('x_seconds_count{stage="A"} 2', lines)
+
+    def test_workflow_records_every_stage(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            inv = {'invoice_id': 'MET-001', 'vendor_name': 'V', 'amount': 100.0, 'currency': 'USD',
+                   'line_items': [], 'attachments': ['inv.pdf']}
+            run_workflow(inv, os.path.join(temp_dir, 'm.db'), auto_decide=True, decision_delay=0)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        stages = {labels[0] for labels in metrics.STAGE_WALL.labelsets()}
+        self.assertTrue({'INTAKE', 'UNDERSTAND', 'COMPLETE'} <= stages)
+        self.assertIn('UNDERSTAND', metrics.summary())
+
+    def test_metrics_endpoint(self):
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        t = threading.Thread(target=server.serve_forever, daemon=True)
+        t.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+            with urllib.request.urlopen(url) as resp:
+                body = resp.read().decode('utf-8')
+                self.assertTrue(resp.headers['Content-Type'].startswith('text/plain'))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('# TYPE invoice_stage_wall_seconds histogram', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
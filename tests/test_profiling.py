@@ -0,0 +1,48 @@
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+from src.profiling import WorkflowProfiler
+from src.runner import run_workflow
+
+
+class TestWorkflowProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.out_dir = os.path.join(self.temp_dir, 'profiles')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _invoice(self):
+        return {'invoice_id': 'PROF-001', 'vendor_name': 'V', 'amount': 100.0, 'currency': 'USD',
+                'line_items': [], 'attachments': ['inv.pdf']}
+
+    def test_profile_and_memory_written_per_stage(self):
+        profiler = WorkflowProfiler(profile=True, trace_memory=True, out_dir=self.out_dir)
+        run_workflow(self._invoice(), os.path.join(self.temp_dir, 'p.db'), decision_delay=0, profiler=profiler)
+        runs = os.listdir(self.out_dir)
+        self.assertEqual(len(runs), 1)
+        files = os.listdir(os.path.join(self.out_dir, runs[0]))
+        self.assertIn('summary.txt', files)
+        self.assertIn('memory.txt', files)
+        self.assertIn('01_SETUP.prof', files)
+        self.assertTrue(any(f.endswith('_UNDERSTAND.prof') for f in files))
+        with open(os.path.join(self.out_dir, runs[0], 'memory.txt'), encoding='utf-8') as f:
+            self.assertIn('===== INTAKE =====', f.read())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_sampling_skips_unsampled_runs(self):
+        profiler = WorkflowProfiler(sample_rate=0.0, out_dir=self.out_dir)
+        self.assertIsNone(profiler.begin('X'))
+        profiler = WorkflowProfiler(sample_rate=0.5, out_dir=self.out_dir, rng=random.Random(7))
+        sampled = sum(1 for _ in range(200) if profiler.begin('X') is not None)
+        self.assertTrue(50 < sampled < 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
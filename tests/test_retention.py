@@ -0,0 +1,104 @@
+import contextlib
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src import db, retention
+
+
+class TestRetention(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'ret.db')
+        self.archive_dir = os.path.join(self.temp_dir, 'archive')
+        self.conn = db.init_db(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _age(self, table, column, days, where='1=1'):
+        self.conn.execute(f"UPDATE {table} SET {column}={column}-? WHERE {where}", (days * 86400,))
+        self.conn.commit()
+
+    def test_archives_old_rows_in_batches_and_keeps_recent(self):
+        for i in range(25):
+            db.append_audit(self.conn, f'OLD-{i}', 'INTAKE', 'old')
+        self._age('audit_log', 'ts', 100)
+        db.append_audit(self.conn, 'NEW', 'INTAKE', 'new')
+        purged = retention.apply_retention(self.conn, {'audit_log': 90}, self.archive_dir, batch_size=10)
+        self.assertEqual(purged, {'audit_log': 25})
+        self.assertEqual(self.conn.execute("SELECT invoice_id FROM audit_log").fetchall(), [('NEW',)])
+        archived = []
+        for month in os.listdir(os.path.join(self.archive_dir, 'audit_log')):
+            with gzip.open(os.path.join(self.archive_dir, 'audit_log', month), 'rt') as f:
+                archived.extend(json.loads(line) for line in f)
+        self.assertEqual(sorted(r['invoice_id'] for r in archived), sorted(f'OLD-{i}' for i in range(25)))
+        # The rollups keep counting purged history
+        self.assertEqual(db.read_stats(self.conn, hours=24 * 120)['stage_invoices'], {'INTAKE': 26})
+
+    def test_paused_checkpoints_and_live_jobs_are_kept(self):
+        for cp in ('paused', 'done'):
+            db.save_checkpoint(self.conn, cp, 'INV-' + cp, {'invoice': {}})
+        db.save_decision(self.conn, 'done', 'ann', 'ACCEPT')
+        db.mark_completed(self.conn, 'done')
+        queued = db.enqueue_job(self.conn, 'q', 'invoice', {})
+        self._age('checkpoints', 'updated_at', 365)
+        self._age('jobs', 'updated_at', 365)
+        purged = retention.apply_retention(self.conn, {'checkpoints': 180, 'jobs': 30}, archive_dir=None)
+        self.assertEqual(purged, {'checkpoints': 1, 'jobs': 0})
+        self.assertIsNone(db.fetch_checkpoint(self.conn, 'done'))
+        self.assertEqual(db.fetch_checkpoint(self.conn, 'paused')['status'], 'PAUSED')
+        self.assertIsNotNone(db.fetch_job(self.conn, queued))
+
+    def test_decisions_not_yet_exported_are_kept(self):
+        for cp in ('cp-1', 'cp-2'):
+            db.save_checkpoint(self.conn, cp, 'INV-' + cp, {'invoice': {}})
+            db.save_decision(self.conn, cp, 'ann', 'ACCEPT')
+        first_decided = self.conn.execute(
+            "SELECT seq FROM checkpoint_changes WHERE checkpoint_id='cp-1' AND event='decided'").fetchone()[0]
+        db.save_export_mark(self.conn, 'decisions:/exports', first_decided)
+        self._age('checkpoint_changes', 'ts', 30)
+        purged = retention.apply_retention(self.conn, {'checkpoint_changes': 7}, archive_dir=None)
+        self.assertEqual(purged, {'checkpoint_changes': 3})
+        self.assertEqual(self.conn.execute("SELECT checkpoint_id, event FROM checkpoint_changes").fetchall(),
+                         [('cp-2', 'decided')])
+        # Once exported it can go too
+        db.save_export_mark(self.conn, 'decisions:/exports', first_decided + 10)
+        self.assertEqual(retention.apply_retention(self.conn, {'checkpoint_changes': 7}, archive_dir=None),
+                         {'checkpoint_changes': 1})
+
+    def test_incremental_vacuum_shrinks_new_databases(self):
+        self.assertEqual(self.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        for i in range(3000):
+            self.conn.execute("INSERT INTO audit_log (invoice_id, stage, message, ts) VALUES (?,?,?,?)",
+                              (f'INV-{i}', 'INTAKE', 'x' * 500, time.time() - 200 * 86400))
+        self.conn.commit()
+        pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        retention.apply_retention(self.conn, {'audit_log': 90})
+        self.assertEqual(self.conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+        self.assertLess(self.conn.execute("PRAGMA page_count").fetchone()[0], pages / 4)
+
+    def test_cli_dry_run_and_overrides(self):
+        db.append_audit(self.conn, 'OLD', 'INTAKE', 'old')
+        self._age('audit_log', 'ts', 40)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            retention.main(['--db', self.db_path, '--days', 'audit_log=30', '--only', 'audit_log', '--dry-run'])
+        self.assertIn('1 row(s) older than 30 day(s)', out.getvalue())
+        with contextlib.redirect_stdout(io.StringIO()):
+            retention.main(['--db', self.db_path, '--days', 'audit_log=keep', '--no-archive'])
+            self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0], 1)
+            retention.main(['--db', self.db_path, '--days', 'audit_log=30', '--archive-dir', self.archive_dir])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0], 0)
+        self.assertTrue(os.listdir(os.path.join(self.archive_dir, 'audit_log')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import dataclasses
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import db, metrics
+from src.runner import load_plan, run_batch, run_workflow
+from src.schema import compile_schema, validate_batch
+
+
+def _invoice(**over):
+    inv = {'invoice_id': 'S-001', 'vendor_name': 'V', 'amount': 100.0, 'currency': 'USD',
+           'invoice_date': '2025-03-01', 'line_items': [{'desc': 'x', 'qty': 1, 'unit_price': 1, 'total': 1}],
+           'attachments': ['inv.pdf']}
+    inv.update(over)
+    return inv
+
+
+class TestSchemaCompiler(unittest.TestCase):
+
+    def setUp(self):
+        self.validate = load_plan().validate_input
+
+    def test_valid_invoice_has_no_errors(self):
+        self.assertEqual(self.validate(_invoice()), [])
+
+    def test_errors_carry_path_and_reason(self):
+        inv = _invoice(amount='100', invoice_date='2025-13-40', line_items=[{'desc': 'x', 'qty': True}])
+        del inv['vendor_name']
+        errors = {(e.path, e.reason) for e in self.validate(inv)}
+        self.assertEqual(errors, {('vendor_name', 'required'), ('amount', 'type'), ('invoice_date', 'format'),
+                                  ('line_items[0].qty', 'type'), ('line_items[0].unit_price', 'required'),
+                                  ('line_items[0].total', 'required')})
+
+    def test_keywords_and_batch_split(self):
+        validate = compile_schema({'type': ['string', 'null'], 'enum': ['A', None]})
+        self.assertEqual(validate('A'), [])
+        self.assertEqual(validate(None), [])
+        self.assertEqual([e.reason for e in validate('B')], ['enum'])
+        self.assertEqual([e.reason for e in validate(1)], ['type'])
+        valid, rejected = validate_batch(validate, ['A', 'B', None])
+        self.assertEqual(valid, ['A', None])
+        self.assertEqual(rejected[0][0], 'B')
+        with self.assertRaises(ValueError):
+            compile_schema({'type': 'decimal'})
+
+
+class TestIntakeQuarantine(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'q.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_invalid_invoice_quarantined_at_intake(self):
+        before = metrics.INPUTS_REJECTED.value('intake', 'required')
+        inv = _invoice(invoice_id='S-BAD')
+        del inv['currency']
+        state = run_workflow(inv, self.db_path, decision_delay=0)
+        self.assertEqual(state['final_payload']['status'], 'QUARANTINED')
+        self.assertNotIn('parsed_invoice', state)
+        self.assertEqual(metrics.INPUTS_REJECTED.value('intake', 'required'), before + 1)
+        conn = db.init_db(self.db_path)
+        rows = db.list_quarantine(conn)
+        conn.close()
+        self.assertEqual(rows[0]['invoice_id'], 'S-BAD')
+        self.assertEqual(rows[0]['source'], 'intake')
+        self.assertIn('currency: is required', rows[0]['errors'])
+
+    def test_intake_uses_the_plan_passed_to_the_run(self):
+        plan = load_plan()
+        strict = dataclasses.replace(plan, validate_input=compile_schema(
+            {'type': 'object', 'required': ['po_number'], 'properties': {'po_number': {'type': 'string'}}}))
+        state = run_workflow(_invoice(invoice_id='S-PLAN', amount=12000.0), self.db_path, decision_delay=0, plan=strict)
+        self.assertEqual(state['final_payload']['status'], 'QUARANTINED')
+        self.assertIn('po_number: is required', state['validation_errors'])
+        state = run_workflow(_invoice(invoice_id='S-PLAN2', amount=12000.0), self.db_path, decision_delay=0, plan=plan)
+        self.assertEqual(state['final_payload']['status'], 'COMPLETED')
+
+    def test_batch_validates_up_front(self):
+        bad = _invoice(invoice_id='S-B2', amount=None)
+        results = run_batch([_invoice(invoice_id='S-B1', amount=12000.0), bad], self.db_path)
+        self.assertEqual([r['final_payload']['status'] for r in results], ['COMPLETED', 'QUARANTINED'])
+        conn = db.init_db(self.db_path)
+        rows = db.list_quarantine(conn)
+        conn.close()
+        self.assertEqual([(r['invoice_id'], r['source']) for r in rows], [('S-B2', 'batch')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import unittest
+
+from benchmarks.bench_startup import HEAVY_MODULES, best_import_ms, import_profile
+from src import adapters, bigtool
+
+# Entry points that must start without the heavy dependencies
+LIGHT_MODULES = ('src.__main__', 'src.store', 'src.stats', 'src.retention', 'src.jobs')
+# Generous budgets (best of 3, ms) so slow CI machines still pass; they
+# catch an eager import of PyYAML, multiprocessing or the runner creeping back
+LIGHT_BUDGET_MS = 150
+RUNNER_BUDGET_MS = 250
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_light_entry_points_skip_heavy_imports(self):
+        for module in LIGHT_MODULES:
+            loaded = import_profile(module)['modules']
+            self.assertEqual([m for m in HEAVY_MODULES if m in loaded], [], module)
+
+    def test_import_budget(self):
+        for module in LIGHT_MODULES:
+            self.assertLess(best_import_ms(module, 3), LIGHT_BUDGET_MS, module)
+        self.assertLess(best_import_ms('src.runner', 3), RUNNER_BUDGET_MS)
+
+
+class TestConfigAndAdapterReuse(unittest.TestCase):
+
+    def test_tools_config_is_parsed_once_until_the_file_changes(self):
+        first = bigtool.load_tools_config()
+        self.assertIs(bigtool.load_tools_config(), first)
+        st = os.stat(bigtool.TOOLS_YAML)
+        os.utime(bigtool.TOOLS_YAML, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        try:
+            reloaded = bigtool.load_tools_config()
+            self.assertIsNot(reloaded, first)
+            self.assertEqual(reloaded, first)
+        finally:
+            os.utime(bigtool.TOOLS_YAML, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def test_shared_adapter_is_built_once_per_config(self):
+        a = adapters.shared_adapter('google_vision', {'api_key': 'k1'})
+        self.assertIs(adapters.shared_adapter('google_vision', {'api_key': 'k1'}), a)
+        self.assertIsNot(adapters.shared_adapter('google_vision', {'api_key': 'k2'}), a)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.bench_vendors import master_names
+from src import mcp_clients
+from src.mcp_clients import AtlasClient, CommonClient
+from src.vendors import VendorIndex, normalize_vendor, trigrams, vendor_id_for
+
+
+class TestVendorIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = VendorIndex()
+        self.acme = self.index.add('Acme Supplies Corp.', tax_id='GST001')
+        self.index.add('Acme Systems Inc')
+        self.index.add('Globex Supplies Ltd')
+
+    def test_variants_resolve_to_one_vendor(self):
+        for name in ('ACME Supplies Corporation', 'acme supplies', 'Acme Suplies', 'Acme, Supplies Inc.'):
+            self.assertEqual(self.index.resolve(name).vendor_id, self.acme, name)
+        self.assertEqual(self.index.resolve('Unknown', tax_id='GST001').vendor_id, self.acme)
+        self.assertIsNone(self.index.resolve('Initech Foods'))
+        self.assertIsNone(self.index.resolve(''))
+
+    def test_numeric_tokens_must_match(self):
+        store = self.index.add('Vandelay Store 12')
+        self.assertEqual(self.index.resolve('Vandelay Stores 12').vendor_id, store)
+        self.assertIsNone(self.index.resolve('Vandelay Store 13'))
+
+    def test_resolve_or_add_learns_new_vendor_outside_the_master(self):
+        match = self.index.resolve_or_add('Initech Foods LLC')
+        self.assertEqual((len(self.index), self.index.learned_count()), (3, 1))
+        self.assertEqual(self.index.resolve_or_add('INITECH FOODS').vendor_id, match.vendor_id)
+        # Ids come from the name, not from the order vendors were seen in
+        self.assertEqual(match.vendor_id, vendor_id_for('initech foods'))
+        self.assertEqual(VendorIndex().resolve_or_add('Initech Foods').vendor_id, match.vendor_id)
+        # A learned name is never the fuzzy target for others
+        self.assertIsNone(self.index.resolve('Initech Food'))
+        self.assertNotEqual(self.index.resolve_or_add('Initech Food').vendor_id, match.vendor_id)
+
+    def test_learned_vendors_are_bounded(self):
+        index = VendorIndex(max_learned=2)
+        first = index.resolve_or_add('Alpha Traders')
+        index.resolve_or_add('Bravo Traders')
+        index.resolve_or_add('Charlie Traders')
+        self.assertEqual(index.learned_count(), 2)
+        self.assertEqual(index.resolve_or_add('alpha traders').vendor_id, first.vendor_id)
+
+    def test_index_agrees_with_linear_scan(self):
+        rng = random.Random(7)
+        names = master_names(2000, rng)
+        index = VendorIndex()
+        for n in names:
+            index.add(n)
+        grams = [trigrams(normalize_vendor(n)) for n in names]
+        for name in rng.sample(names, 200):
+            query = name[:-3] + name[-2:] if rng.random() < 0.5 else name.upper().replace(' ', '  ')
+            q = trigrams(normalize_vendor(query))
+            scores = [len(q & g) / len(q | g) for g in grams]
+            best = max(scores)
+            match = index.resolve(query)
+            if best < index.threshold:
+                self.assertIsNone(match, query)
+            else:
+                self.assertAlmostEqual(match.score, round(best, 4), msg=query)
+
+    def test_load_master_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'vendors.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([{'vendor_id': 'ACME-1', 'name': 'Acme Corp', 'aliases': ['Acme Holdings']}], f)
+            index = VendorIndex()
+            self.assertEqual(index.load(path), 1)
+            self.assertEqual(index.resolve('acme holdings inc').vendor_id, 'ACME-1')
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TestVendorClients(unittest.TestCase):
+
+    def tearDown(self):
+        mcp_clients.set_mock_purchase_orders({})
+
+    def test_po_lookup_uses_canonical_vendor(self):
+        mcp_clients.set_mock_purchase_orders({'Hooli Labs GmbH': [{'po_id': 'PO-H1', 'amount': 10}]})
+        norm = CommonClient().normalize_vendor('HOOLI LABS')
+        self.assertEqual(norm['normalized_name'], 'Hooli Labs GmbH')
+        self.assertEqual(AtlasClient(hedge=False).fetch_pos('Hoolli Labs')[0]['po_id'], 'PO-H1')
+
+
+if __name__ == '__main__':
+    unittest.main()
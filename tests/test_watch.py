@@ -0,0 +1,118 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.watch import SpoolWatcher
+
+
+def _invoice(i, **extra):
+    inv = {'invoice_id': f'SPL-{i:03d}', 'vendor_name': f'Spool Vendor {i}', 'amount': 9000.0, 'currency': 'USD',
+           'line_items': [], 'attachments': ['scan.pdf']}
+    inv.update(extra)
+    return inv
+
+
+class TestSpoolWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.spool = os.path.join(self.temp_dir, 'spool')
+        os.makedirs(self.spool)
+        self.db_path = os.path.join(self.temp_dir, 'watch.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _drop(self, name, content):
+        with open(os.path.join(self.spool, name), 'w', encoding='utf-8') as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+
+    def _watcher(self, **kwargs):
+        return SpoolWatcher(self.spool, db_path=self.db_path, workers=2, poll_interval=0.05, settle=0,
+                            use_watchdog=False, **kwargs)
+
+    def _run(self, watcher):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return watcher.run(once=True)
+
+    def test_files_move_to_archive_or_error(self):
+        self._drop('a.json', _invoice(1, attachments=['a.pdf']))
+        self._drop('a.pdf', '%PDF-1.4 fake')
+        self._drop('batch.json', [_invoice(2), _invoice(3)])
+        self._drop('bad.json', '{not json')
+        self._drop('invalid.json', {'invoice_id': 'SPL-X'})
+        self._drop('upload.json.part', '{')
+        self._drop('orphan.pdf', '%PDF-1.4')
+
+        stats = self._run(self._watcher())
+        self.assertEqual(stats, {'archived': 2, 'error': 2})
+        self.assertEqual(sorted(os.listdir(os.path.join(self.spool, 'archive'))),
+                         ['a.json', 'a.pdf', 'batch.json', 'results.jsonl'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.spool, 'error'))),
+                         ['bad.json', 'invalid.json', 'results.jsonl'])
+        # In-progress uploads and unreferenced PDFs stay in the spool
+        self.assertEqual(sorted(n for n in os.listdir(self.spool) if os.path.isfile(os.path.join(self.spool, n))),
+                         ['orphan.pdf', 'upload.json.part'])
+        self.assertEqual(os.listdir(os.path.join(self.spool, '.processing')), [])
+
+        with open(os.path.join(self.spool, 'archive', 'results.jsonl'), encoding='utf-8') as f:
+            results = {r['file']: r for r in map(json.loads, f)}
+        self.assertEqual([r['status'] for r in results['batch.json']['results']], ['COMPLETED', 'COMPLETED'])
+        self.assertEqual(results['a.json']['results'][0]['invoice_id'], 'SPL-001')
+
+    def test_attachments_point_at_their_final_location(self):
+        self._drop('a.json', _invoice(1, attachments=['a.pdf']))
+        self._drop('a.pdf', '%PDF-1.4 fake')
+        watcher = self._watcher()
+        seen = []
+        process_invoice = watcher.ingestor.process_invoice
+
+        def record(inv, record=None):
+            seen.append(inv['attachments'][0])
+            return process_invoice(inv, record)
+
+        watcher.ingestor.process_invoice = record
+        self._run(watcher)
+        # The path the run saw (and checkpointed) still exists once the file is archived
+        self.assertEqual(seen, [os.path.join(self.spool, 'archive', 'a.pdf')])
+        self.assertTrue(os.path.exists(seen[0]))
+
+    def test_claimed_file_is_skipped_and_stale_claims_requeued(self):
+        self._drop('a.json', _invoice(1))
+        watcher = self._watcher(requeue_after=3600)
+        # Another watcher claimed it first: the rename fails quietly
+        self.assertIsNotNone(watcher._claim('a.json'))
+        self.assertIsNone(watcher._claim('a.json'))
+        self.assertEqual(self._run(watcher), {'archived': 0, 'error': 0})
+
+        # After `requeue_after` the claim is considered abandoned
+        stats = self._run(self._watcher(requeue_after=0))
+        self.assertEqual(stats, {'archived': 1, 'error': 0})
+        self.assertTrue(os.path.exists(os.path.join(self.spool, 'archive', 'a.json')))
+
+    def test_heartbeat_keeps_a_live_claim(self):
+        self._drop('a.json', _invoice(1))
+        watcher = self._watcher()
+        path = watcher._claim('a.json')
+        old = time.time() - 600
+        os.utime(path, (old, old))
+        # Still being worked on: the heartbeat refreshes the claim before another watcher looks
+        watcher.heartbeat()
+        self._watcher(requeue_after=300).requeue_stale()
+        self.assertTrue(os.path.exists(path))
+        # Finished or crashed: no more heartbeats, and the claim goes stale
+        with watcher._lock:
+            watcher._active.clear()
+        os.utime(path, (old, old))
+        watcher.heartbeat()
+        self._watcher(requeue_after=300).requeue_stale()
+        self.assertTrue(os.path.exists(os.path.join(self.spool, 'a.json')))
+
+
+if __name__ == '__main__':
+    unittest.main()
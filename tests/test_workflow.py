@@ -1,8 +1,10 @@
 import unittest
+import datetime
 import json
 import os
 import tempfile
 import shutil
+import sqlite3
 from src.runner import run_workflow
 from src import db
 from src.nodes import *
@@ -230,8 +232,52 @@ class TestCheckpointAndResume(unittest.TestCase):
         
         pending = db.list_pending(conn)
         self.assertEqual(len(pending), 2)
-        self.assertEqual(pending[0]['checkpoint_id'], 'CP1')
-        self.assertEqual(pending[1]['checkpoint_id'], 'CP2')
+        # Most urgent first: same (default) due date, so the larger amount leads
+        self.assertEqual(pending[0]['checkpoint_id'], 'CP2')
+        self.assertEqual(pending[1]['checkpoint_id'], 'CP1')
+        self.assertEqual(pending[0]['amount'], 200)
+
+    def test_pending_ordered_by_due_date_and_amount_with_filters(self):
+        conn = db.init_db(self.db_path)
+        # Relative to today: undated invoices are ranked from the save date
+        today = datetime.date.today()
+        soon = (today + datetime.timedelta(days=120)).isoformat()
+        late = (today + datetime.timedelta(days=480)).isoformat()
+        invoices = {
+            'LATE-SMALL': ('Acme Corp', 50.0, late),
+            'SOON-SMALL': ('ACME Corporation', 50.0, soon),
+            'SOON-BIG': ('Globex', 50000.0, soon),
+            'NO-DUE': ('Initech', 10.0, None),
+        }
+        for inv_id, (vendor, amount, due) in invoices.items():
+            db.save_checkpoint(conn, 'CP-' + inv_id, inv_id, {
+                'invoice': {'invoice_id': inv_id, 'vendor_name': vendor, 'amount': amount, 'due_date': due},
+                'match_score': 0.5, 'flags': {'risk_score': 0.3}})
+        order = [p['invoice_id'] for p in db.list_pending(conn)]
+        # Undated invoices count as due in 30 days, so they come before the 120-day ones
+        self.assertEqual(order, ['NO-DUE', 'SOON-BIG', 'SOON-SMALL', 'LATE-SMALL'])
+        self.assertEqual([p['invoice_id'] for p in db.list_pending(conn, vendor='acme inc.')], ['SOON-SMALL', 'LATE-SMALL'])
+        self.assertEqual([p['invoice_id'] for p in db.list_pending(conn, min_amount=20, max_amount=1000)],
+                         ['SOON-SMALL', 'LATE-SMALL'])
+        top, = db.list_pending(conn, min_amount=1000, limit=1)
+        self.assertEqual((top['invoice_id'], top['due_date'], top['risk_score']), ('SOON-BIG', soon, 0.3))
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM checkpoints WHERE status='PAUSED' "
+                            "ORDER BY priority DESC, created_at LIMIT 1").fetchall()
+        self.assertIn('idx_checkpoints_review', str(plan))
+        self.assertNotIn('TEMP B-TREE', str(plan))
+
+    def test_review_columns_added_to_old_database(self):
+        old = sqlite3.connect(self.db_path)
+        old.execute("CREATE TABLE checkpoints (id TEXT PRIMARY KEY, invoice_id TEXT, state_blob TEXT, status TEXT, "
+                    "created_at REAL, updated_at REAL, reviewer_id TEXT, decision TEXT)")
+        old.execute("INSERT INTO checkpoints VALUES ('OLD', 'INV-OLD', ?, 'PAUSED', 1.0, 1.0, NULL, NULL)",
+                    (json.dumps({'invoice': {'vendor_name': 'Old Vendor', 'amount': 75, 'due_date': '2026-01-01'}}),))
+        old.commit()
+        old.close()
+        conn = db.init_db(self.db_path)
+        item, = db.list_pending(conn, vendor='old vendor')
+        self.assertEqual((item['amount'], item['due_date']), (75, '2026-01-01'))
+        self.assertIsNotNone(item['priority'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import threading
+import unittest
+
+from src import db
+from src.runner import NODE_MAP, run_workflow
+from src.workflow_plan import END, WorkflowCompileError, compile_condition, compile_workflow, get_plan
+
+
+class TestConditionCompiler(unittest.TestCase):
+
+    def test_config_and_state_lookup(self):
+        pred = compile_condition('match_score < config.match_threshold', {'match_threshold': 0.9})
+        self.assertTrue(pred({'match_score': 0.3}))
+        self.assertFalse(pred({'match_score': 0.95}))
+        # Missing value never satisfies an ordered comparison
+        self.assertFalse(pred({}))
+
+    def test_boolean_operators_and_paths(self):
+        pred = compile_condition(
+            "invoice.amount >= 10000 and not (match_result == 'MATCHED' or flags.risk_score > 0.5)", {})
+        self.assertTrue(pred({'invoice': {'amount': 20000}, 'match_result': 'FAILED', 'flags': {'risk_score': 0.1}}))
+        self.assertFalse(pred({'invoice': {'amount': 20000}, 'match_result': 'MATCHED'}))
+        self.assertFalse(pred({'invoice': {'amount': 5}, 'match_result': 'FAILED'}))
+
+    def test_invalid_conditions_fail_at_compile_time(self):
+        for bad in ('match_score <', 'config.nope > 1', 'a $ b', '(a == 1', 'a == 1 b'):
+            with self.assertRaises(WorkflowCompileError, msg=bad):
+                compile_condition(bad, {})
+
+
+class TestWorkflowPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, wf):
+        path = os.path.join(self.temp_dir, 'workflow.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(wf, f)
+        return path
+
+    def test_repo_workflow_compiles(self):
+        plan = get_plan(node_map=NODE_MAP)
+        self.assertEqual(plan.stages[0].id, 'INTAKE')
+        self.assertIsNotNone(plan.stage('CHECKPOINT_HITL').trigger)
+        self.assertIs(plan, get_plan(node_map=NODE_MAP))
+        with self.assertRaises(TypeError):
+            plan.config['match_threshold'] = 0
+
+    def test_validation_errors(self):
+        ok = {'id': 'A', 'agent': 'IngestNode'}
+        for wf in ({'stages': []},
+                   {'stages': [ok, ok]},
+                   {'stages': [{'id': 'B', 'agent': 'NoSuchNode'}]},
+                   {'stages': [dict(ok, trigger_condition='x <')]}):
+            with self.assertRaises(WorkflowCompileError):
+                compile_workflow(wf, NODE_MAP)
+
+    def test_plan_reloads_when_file_changes(self):
+        path = self._write({'config': {'t': 1}, 'stages': [{'id': 'A', 'agent': 'IngestNode'}]})
+        first = get_plan(path, NODE_MAP)
+        self.assertIs(first, get_plan(path, NODE_MAP))
+        time.sleep(0.01)
+        self._write({'config': {'t': 2}, 'stages': [{'id': 'A', 'agent': 'IngestNode'},
+                                                    {'id': 'B', 'agent': 'CompleteNode'}]})
+        os.utime(path, ns=(first.source_mtime_ns + 10**9, first.source_mtime_ns + 10**9))
+        second = get_plan(path, NODE_MAP)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.config['t'], 2)
+        self.assertEqual(len(second.stages), 2)
+
+    def test_checkpoint_skipped_for_matched_invoice(self):
+        inv = {'invoice_id': 'PLAN-001', 'vendor_name': 'V', 'amount': 12000.0, 'currency': 'USD',
+               'line_items': [], 'attachments': ['inv.pdf']}
+        state = run_workflow(inv, os.path.join(self.temp_dir, 'p.db'), auto_decide=True, decision_delay=0)
+        self.assertEqual(state['match_result'], 'MATCHED')
+        self.assertNotIn('checkpoint_id', state)
+        self.assertEqual(state['final_payload']['status'], 'COMPLETED')
+
+
+    def test_routes_resolve_forward_and_reject_loops(self):
+        stages = [{'id': 'A', 'agent': 'IngestNode',
+                   'routes': [{'when': "flag == 'end'", 'goto': END}, {'when': 'flag', 'goto': 'C'}]},
+                  {'id': 'B', 'agent': 'OcrNlpNode'},
+                  {'id': 'C', 'agent': 'CompleteNode'}]
+        plan = compile_workflow({'stages': stages}, NODE_MAP)
+        a = plan.stage('A')
+        self.assertEqual(a.next_index({}), 1)
+        self.assertEqual(a.next_index({'flag': 'skip'}), 2)
+        self.assertEqual(a.next_index({'flag': 'end'}), len(plan.stages))
+        for routes in ([{'when': 'x', 'goto': 'A'}], [{'when': 'x', 'goto': 'NOPE'}], [{'goto': 'C'}]):
+            bad = [dict(stages[0], routes=routes)] + stages[1:]
+            with self.assertRaises(WorkflowCompileError):
+                compile_workflow({'stages': bad}, NODE_MAP)
+
+    def test_manual_reject_ends_workflow(self):
+        db_path = os.path.join(self.temp_dir, 'r.db')
+        inv = {'invoice_id': 'PLAN-002', 'vendor_name': 'V', 'amount': 500.0, 'currency': 'USD',
+               'line_items': [], 'attachments': ['inv.pdf']}
+        result = {}
+        worker = threading.Thread(target=lambda: result.update(
+            run_workflow(inv, db_path, auto_decide=False)), daemon=True)
+        worker.start()
+        conn = None
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            if os.path.exists(db_path):
+                conn = conn or db.init_db(db_path)
+                pending = db.list_pending(conn)
+                if pending:
+                    db.save_decision(conn, pending[0]['checkpoint_id'], 'alice', 'REJECT')
+                    break
+            time.sleep(0.05)
+        worker.join(timeout=10)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(result['human_decision'], 'REJECT')
+        self.assertEqual(result['final_payload']['status'], 'REQUIRES_MANUAL_HANDLING')
+        self.assertNotIn('posted', result)
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()